@@ -2,6 +2,7 @@
 import re
 import clr
 from pyrevit import revit, DB, forms
+from lf_revit import get_schema_cache
 
 # Importações necessárias para ObservableCollection
 clr.AddReference('System')
@@ -259,6 +260,7 @@ class RenameWindow(forms.WPFWindow):
         # Amostra até 20 itens para performance
         sample_size = min(20, self.preview_items.Count)
         has_text_notes = False
+        elements_to_check = []
 
         for i in range(sample_size):
             item = self.preview_items[i]
@@ -268,14 +270,15 @@ class RenameWindow(forms.WPFWindow):
                 params.add("Text")
                 continue
 
-            elements_to_check = [item.element]
+            elements_to_check.append(item.element)
             if not item.is_itemized and item.instances:
                 elements_to_check.append(item.instances[0])
 
-            for el in elements_to_check:
-                for p in el.Parameters:
-                    if not p.IsReadOnly and p.StorageType == DB.StorageType.String:
-                        params.add(p.Definition.Name)
+        # Parâmetros do próprio elemento (não do tipo), por (categoria, tipo) em cache
+        params.update(get_schema_cache(revit.doc).names(
+            elements_to_check,
+            lambda info: (not info.is_type and not info.read_only
+                          and info.storage_type == DB.StorageType.String)))
 
         # Atualiza ComboBox de Alvo
         if hasattr(self, 'param_cb'):
@@ -28,6 +28,8 @@ from Autodesk.Revit.UI.Selection import ObjectType, ISelectionFilter
 from Autodesk.Revit.Exceptions import OperationCanceledException
 from pyrevit import forms
 
+from lf_revit import ViewHighlighter, highlight_overrides, get_electrical_catalog
+
 doc   = __revit__.ActiveUIDocument.Document
 uidoc = __revit__.ActiveUIDocument
 
@@ -301,25 +303,7 @@ def _rebuild_circuit(circuit, desired_elements):
 
 def _find_matching_dist_sys(target_voltage_volts):
     """Encontra o DistributionSysType cujo range de tensão cobre target_voltage_volts."""
-    v_internal = float(target_voltage_volts) * 10.7639104167
-    for s in FilteredElementCollector(doc).OfClass(DistributionSysType).ToElements():
-        for bip in [BuiltInParameter.RBS_ELEC_DISTRIBUTION_SYS_VOLTAGE_L_G_PARAM,
-                    BuiltInParameter.RBS_ELEC_DISTRIBUTION_SYS_VOLTAGE_L_L_PARAM]:
-            vp = s.get_Parameter(bip)
-            if not vp or not vp.HasValue:
-                continue
-            vid = vp.AsElementId()
-            if vid == ElementId.InvalidElementId:
-                continue
-            vtype = doc.GetElement(vid)
-            if not vtype:
-                continue
-            min_p = vtype.get_Parameter(BuiltInParameter.RBS_ELEC_VOLTAGE_MIN_PARAM)
-            max_p = vtype.get_Parameter(BuiltInParameter.RBS_ELEC_VOLTAGE_MAX_PARAM)
-            if min_p and max_p:
-                if (min_p.AsDouble() - 55) <= v_internal <= (max_p.AsDouble() + 55):
-                    return s.Id
-    return None
+    return get_electrical_catalog(doc).dist_sys_for_voltage(target_voltage_volts)
 
 
 def _set_param_value(p, value=None, value_string=None):
@@ -749,35 +733,10 @@ def _remove_elements(circuit, elems_to_rem):
 #  HIGHLIGHT
 # ─────────────────────────────────────────────────────────────────────────────
 
-def _solid_fill_id():
-    for fp in FilteredElementCollector(doc).OfClass(FillPatternElement):
-        try:
-            if fp.GetFillPattern().IsSolidFill: return fp.Id
-        except Exception: continue
-    return ElementId.InvalidElementId
-
-_FILL_ID = None
-
-def _apply_highlight(view, eids, apply=True):
-    global _FILL_ID
-    if _FILL_ID is None: _FILL_ID = _solid_fill_id()
-    if apply:
-        ogs = OverrideGraphicSettings()
-        red = Color(220, 50, 50)
-        ogs.SetProjectionLineColor(red)
-        try: ogs.SetProjectionLineWeight(6)
-        except Exception: pass
-        if _FILL_ID != ElementId.InvalidElementId:
-            try:
-                ogs.SetSurfaceForegroundPatternId(_FILL_ID)
-                ogs.SetSurfaceForegroundPatternColor(red)
-                ogs.SetSurfaceForegroundPatternVisible(True)
-            except Exception: pass
-    else:
-        ogs = OverrideGraphicSettings()
-    for eid in eids:
-        try: view.SetElementOverrides(eid, ogs)
-        except Exception: pass
+def _make_highlighter(view):
+    """Destaque dos membros do circuito: filtro de seleção na vista para circuitos
+    grandes, override por elemento para os pequenos (ver lf_revit.ViewHighlighter)."""
+    return ViewHighlighter(doc, view, highlight_overrides(doc, Color(220, 50, 50), 6))
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -864,7 +823,7 @@ def manage_circuit():
         return
 
     view = doc.ActiveView
-    highlighted = []
+    highlighter = _make_highlighter(view)
 
     try:
         while True:
@@ -877,11 +836,8 @@ def manage_circuit():
             # Atualiza highlight
             with Transaction(doc, u"Highlight Circuito") as t:
                 t.Start()
-                to_clear = [eid for eid in highlighted if eid not in member_ids]
-                _apply_highlight(view, to_clear, apply=False)
-                _apply_highlight(view, member_ids, apply=True)
+                highlighter.show(member_ids)
                 t.Commit()
-            highlighted = list(member_ids)
 
             circ_num = u"?"
             try: circ_num = circuit.CircuitNumber or u"?"
@@ -951,12 +907,11 @@ def manage_circuit():
                     continue
                 with Transaction(doc, u"Deletar Circuito") as t:
                     t.Start()
-                    _apply_highlight(view, highlighted, apply=False)
                     try:
                         doc.Delete(circuit.Id)
+                        highlighter.clear()
                         t.Commit()
                         forms.toast(u"✅ Circuito {} deletado!".format(circ_num))
-                        highlighted = []
                         circuit = None
                         break
                     except Exception as ex:
@@ -964,13 +919,14 @@ def manage_circuit():
                         forms.alert(u"Erro ao deletar:\n{}".format(ex), title=u"Erro")
 
     finally:
-        try:
-            with Transaction(doc, u"Limpar Highlight") as t:
-                t.Start()
-                _apply_highlight(view, list(set(highlighted)), apply=False)
-                t.Commit()
-        except Exception:
-            pass
+        if highlighter.active:
+            try:
+                with Transaction(doc, u"Limpar Highlight") as t:
+                    t.Start()
+                    highlighter.clear()
+                    t.Commit()
+            except Exception:
+                pass
 
 
 if __name__ == "__main__":
@@ -2,6 +2,7 @@
 """Sincronizar Circuitos
 Selecione o quadro e o script dimensiona automaticamente
 Disjuntor, Cabo e sincroniza a Distância de todos os circuitos.
+No modo Projeto inteiro, só circuitos com entradas alteradas são regravados.
 """
 __title__ = "Sincronizar\nCircuitos"
 __author__ = "LF Tools"
@@ -11,14 +12,22 @@ clr.AddReference("RevitAPI")
 clr.AddReference("RevitAPIUI")
 clr.AddReference("System")
 
+import os
 import re
 import math
+import hashlib
 
 from Autodesk.Revit.DB import *
 from Autodesk.Revit.DB.Electrical import *
 from Autodesk.Revit.UI.Selection import ObjectType, ISelectionFilter
 from pyrevit import forms, script
 
+from lf_utils import read_json, write_json, safe_filename
+from lf_revit import get_electrical_catalog, get_electrical_network
+from QuedaTensao.queda_acumulada import (
+    QuedaAcumuladaEngine, LIMITE_QUEDA_TOTAL, queda_trecho as calculate_vd
+)
+
 doc = __revit__.ActiveUIDocument.Document
 uidoc = __revit__.ActiveUIDocument
 output = script.get_output()
@@ -35,6 +44,10 @@ PANEL_MIN_BREAKER = 32
 PANEL_MIN_SECTION = 6.0
 EPR_90_WIRE_TYPE_NAME = "[Cu/EPR-XLPE/0,6-1kV/90°]-Un-D-3Cc"
 
+# Mudar ao alterar as tabelas/regras abaixo: invalida os fingerprints salvos
+SIZING_RULES_VERSION = 1
+FINGERPRINT_DIR = os.path.join(os.getenv('APPDATA') or '', 'pyRevit', 'Extensions', 'LFTools', 'sync_circuitos')
+
 # Ampacidade (Iz) NBR 5410 - Método B1, 2 condutores, PVC 70°C
 AMPACITIES = {
     1.5: 17.5, 2.5: 24.0, 4.0: 32.0, 6.0: 41.0, 10.0: 57.0, 16.0: 76.0,
@@ -193,6 +206,13 @@ def get_circuit_label(circuit):
 
 
 def is_panel_feeder(circuit):
+    # Topologia primeiro: o circuito alimenta um quadro que tem circuitos próprios
+    try:
+        if get_electrical_network(doc).feeds_panel(circuit):
+            return True
+    except:
+        pass
+
     circuit_number = normalize_text(circuit.CircuitNumber or "")
     load_name = normalize_text(get_circuit_label(circuit))
     prefix = normalize_text(get_param_text(circuit, names=["Préfixo Circuito", "Prefixo Circuito", "Circuit Prefix"]))
@@ -226,14 +246,13 @@ def find_epr_90_wire_type():
     exact = None
     fallback = None
     try:
-        for wt in FilteredElementCollector(doc).OfClass(WireType):
-            name = get_element_name(wt)
-            if name == EPR_90_WIRE_TYPE_NAME:
-                exact = wt
-                break
-            n = normalize_text(name)
-            if "EPR" in n and "90" in n:
-                fallback = wt
+        wire_types = get_electrical_catalog(doc).wire_types()
+        exact = wire_types.get(EPR_90_WIRE_TYPE_NAME)
+        if exact is None:
+            for name, wt in wire_types.items():
+                n = normalize_text(name)
+                if "EPR" in n and "90" in n:
+                    fallback = wt
         return exact or fallback
     except:
         return None
@@ -314,25 +333,96 @@ def write_breaker(circuit, rating):
     return wrote, actual, debug
 
 
-def calculate_vd(length_m, current, voltage, section_mm2, phases=1):
-    if section_mm2 <= 0 or voltage <= 0:
-        return 0.0
-    factor = 2.0 if phases <= 2 else math.sqrt(3)
-    vd_v = (factor * length_m * current) / (56.0 * section_mm2)
-    return (vd_v * 100.0) / voltage
+def circuit_segment_vd(c):
+    """Queda (%) do próprio trecho do circuito com o cabo já gravado."""
+    dist_m = float(math.ceil(c.Length * 0.3048)) if c.Length > 0 else 0.0
+    i_proj = (c.ApparentLoad / c.Voltage) if c.Voltage > 0 else 0.0
+    v_nominal = get_param_double(
+        c,
+        builtin=BuiltInParameter.RBS_ELEC_VOLTAGE,
+        names=["Tensão", "TensÃ£o", "Voltage"],
+        default=127.0
+    )
+    section = get_param_double(c, names=["Seção do Condutor Adotado (mm²)", "Condutor Adotado"])
+    return calculate_vd(dist_m, i_proj, v_nominal, section, phases=c.PolesNumber)
+
+
+def build_vd_tree(circuits=None):
+    """Árvore quadro → sub-quadro → circuito de todo o projeto (uma coleta, um percurso)."""
+    if circuits is None:
+        circuits = get_all_circuits()
+    return QuedaAcumuladaEngine.de_circuitos(circuits, circuit_segment_vd, is_panel_feeder)
+
+
+def read_factors(c):
+    """FCA e FCT do circuito (1.0 quando ausentes ou inválidos)."""
+    fca, fct = 1.0, 1.0
+    try:
+        pf = c.LookupParameter("FCA")
+        if pf and pf.HasValue:
+            fca = float(str(pf.AsValueString() or pf.AsDouble()).replace(",", "."))
+        pf = c.LookupParameter("FCT")
+        if pf and pf.HasValue:
+            fct = float(str(pf.AsValueString() or pf.AsDouble()).replace(",", "."))
+    except:
+        pass
+    if fca <= 0: fca = 1.0
+    if fct <= 0: fct = 1.0
+    return fca, fct
+
+
+# ================================================================
+# FINGERPRINT (detecção de alteração entre execuções)
+# ================================================================
+
+def circuit_fingerprint(c):
+    """Hash curto das entradas do dimensionamento: comprimento, carga aparente,
+    tensão, polos, FCA, FCT (+ alimentador e versão das regras).
+    Inclui também disjuntor e cabo gravados, para que Desfazer ou edição manual
+    desses valores force a ressincronização."""
+    fca, fct = read_factors(c)
+    rating = get_param_double(c, builtin=BuiltInParameter.RBS_ELEC_CIRCUIT_RATING_PARAM,
+                              names=["Proteção do circuito"])
+    section = get_param_double(c, names=["Seção do Condutor Adotado (mm²)", "Condutor Adotado"])
+    raw = "{:.4f}|{:.2f}|{:.2f}|{}|{:.4f}|{:.4f}|{}|{}|{:.1f}|{:.1f}".format(
+        c.Length, c.ApparentLoad, c.Voltage, c.PolesNumber, fca, fct,
+        int(is_panel_feeder(c)), SIZING_RULES_VERSION, rating, section)
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def fingerprint_path():
+    key = doc.PathName or doc.Title
+    digest = hashlib.md5(key.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(FINGERPRINT_DIR, "{}_{}.json".format(safe_filename(doc.Title), digest))
+
+
+def load_fingerprints():
+    return read_json(fingerprint_path(), default={})
+
+
+def save_fingerprints(fingerprints):
+    write_json(fingerprint_path(), fingerprints, indent=0)
 
 
 # ================================================================
 # SELEÇÃO DO PAINEL
 # ================================================================
 
-def pick_panel():
-    """Usa seleção atual ou pede para clicar no quadro."""
+def selected_panel():
+    """Primeiro quadro da seleção atual (ou None)."""
     for sid in list(uidoc.Selection.GetElementIds()):
         el = doc.GetElement(sid)
         if (el and el.Category and
                 el.Category.Id.IntegerValue == int(BuiltInCategory.OST_ElectricalEquipment)):
             return el
+    return None
+
+
+def pick_panel():
+    """Usa seleção atual ou pede para clicar no quadro."""
+    panel = selected_panel()
+    if panel:
+        return panel
     try:
         ref = uidoc.Selection.PickObject(
             ObjectType.Element, PanelFilter(), "Selecione o QUADRO"
@@ -344,37 +434,144 @@ def pick_panel():
 
 def get_circuits(panel):
     try:
-        if hasattr(panel, "MEPModel") and panel.MEPModel:
-            systems = list(panel.MEPModel.GetAssignedElectricalSystems())
-        else:
-            systems = list(panel.GetAssignedElectricalSystems())
+        systems = get_electrical_network(doc).circuits_from(panel)
     except:
         return []
 
-    def sort_key(s):
+    systems.sort(key=circuit_sort_key)
+    return systems
+
+
+def circuit_sort_key(s):
+    try:
+        d = re.sub(r'\D', '', s.CircuitNumber or '')
+        return int(d) if d else 9999
+    except:
+        return 9999
+
+
+def get_all_circuits():
+    """Circuitos de força ligados a quadro, de todos os quadros do projeto
+    (uma única coleta), ordenados por quadro e número."""
+    circuits = []
+    for c in FilteredElementCollector(doc).OfClass(ElectricalSystem):
         try:
-            d = re.sub(r'\D', '', s.CircuitNumber or '')
-            return int(d) if d else 9999
+            if c.SystemType == ElectricalSystemType.PowerCircuit and c.BaseEquipment:
+                circuits.append(c)
         except:
-            return 9999
-
-    systems.sort(key=sort_key)
-    return systems
+            continue
+    circuits.sort(key=lambda s: (s.PanelName or "", circuit_sort_key(s)))
+    return circuits
 
 
 # ================================================================
 # SINCRONIZAÇÃO
 # ================================================================
 
-def sync_circuits(circuits):
+def sync_one(c, epr_90_wire_type):
     """
-    Para cada circuito:
+    Dimensiona e grava um circuito:
       1. Distância: Length da API → metros (teto) → grava em L Considerado
       2. Disjuntor: próximo padrão ≥ I_corr (sem margem adicional)
       3. Cabo: par mínimo do disjuntor → sobe SEÇÃO enquanto VD > 3% ou Iz < In
+    Retorna (updated, err) — listas de textos para o relatório.
+    """
+    updated = []
+    err = []
+    panel_feeder = is_panel_feeder(c)
+    if panel_feeder:
+        updated.append("Alimentador")
+
+    # 1. DISTÂNCIA
+    dist_m = 0.0
+    try:
+        raw_ft = c.Length
+        if raw_ft > 0:
+            dist_m = float(math.ceil(raw_ft * 0.3048))
+            if write_param(c, names=["L Considerado", "L Considerado (m)"], value=dist_m):
+                updated.append("Dist: {}m".format(int(dist_m)))
+    except Exception as ex:
+        err.append("Dist: " + str(ex))
+
+    # 2. CORRENTE E TENSÃO
+    try:
+        i_proj = (c.ApparentLoad / c.Voltage) if c.Voltage > 0 else 0.0
+        v_nominal = get_param_double(
+            c,
+            builtin=BuiltInParameter.RBS_ELEC_VOLTAGE,
+            names=["Tensão", "TensÃ£o", "Voltage"],
+            default=127.0
+        )
+        poles = c.PolesNumber
+
+        fca, fct = read_factors(c)
+
+        i_corr = i_proj / (fca * fct)
+    except Exception as ex:
+        err.append("Corrente: " + str(ex))
+        i_proj, v_nominal, poles, i_corr = 0.0, 127.0, 1, 0.0
+
+    # 3. DIMENSIONAMENTO
+    try:
+        rating = get_standard_breaker(i_corr)
+        if panel_feeder:
+            rating = get_standard_breaker(i_corr * PANEL_BREAKER_FACTOR)
+            rating = max(rating, get_next_standard_breaker(get_standard_breaker(i_corr)))
+            rating = max(rating, PANEL_MIN_BREAKER)
+        section = PAIRED_SECTIONS.get(rating, 2.5)
+        if panel_feeder:
+            section = max(section, PANEL_MIN_SECTION)
+
+        for _ in range(len(SECTIONS)):
+            vd = calculate_vd(dist_m, i_proj, v_nominal, section, phases=poles)
+            iz = AMPACITIES.get(section, 0.0) * fca * fct
+            if (vd <= 3.0 or dist_m <= 0) and iz >= rating:
+                break
+            idx = next((i for i, s in enumerate(SECTIONS) if s == section), -1)
+            if idx == -1 or idx + 1 >= len(SECTIONS):
+                break
+            section = SECTIONS[idx + 1]
+
+        breaker_written, actual_rating, breaker_debug = write_breaker(c, rating)
+        debug_str = " [{}]".format(", ".join(breaker_debug)) if breaker_debug else ""
+        if breaker_written:
+            if actual_rating and abs(actual_rating - rating) > 0.1:
+                updated.append("Disj pedido: {}A (ficou {}A){}".format(
+                    int(rating), int(round(actual_rating)), debug_str))
+            else:
+                updated.append("Disj: {}A".format(int(rating)))
+        else:
+            err.append("Disjuntor: nao gravado{}".format(debug_str))
+        if write_param(c, names=["Seção do Condutor Adotado (mm²)", "Condutor Adotado"], value=section):
+            updated.append("Cabo: {}mm²".format(section))
+        if panel_feeder:
+            if write_wire_type(c, epr_90_wire_type):
+                updated.append("Tipo: EPR 90")
+            elif epr_90_wire_type:
+                err.append("Tipo de fiacao: parametro bloqueado")
+            else:
+                err.append("Tipo de fiacao: EPR 90 nao encontrado no projeto")
+    except Exception as ex:
+        err.append("Dimensionamento: " + str(ex))
+
+    return updated, err
+
+
+def sync_circuits(circuits, fingerprints=None, progress=None, show_panel=False):
+    """
+    Sincroniza os circuitos em uma única transação.
+    fingerprints: dict UniqueId -> fingerprint (modo projeto). Circuitos com o
+    fingerprint inalterado são pulados; os sincronizados sem erro recebem o
+    fingerprint já com os valores gravados, só se a transação for confirmada.
+    progress: função(i, total) opcional; retornar True cancela o restante.
+    Retorna (ok, erros, pulados).
     """
     ok, erros = [], []
+    synced = []         # números dos circuitos alterados (para o caso de rollback)
+    new_fps = {}        # UniqueId -> fingerprint, aplicados só após o Commit
+    skipped = 0
     epr_90_wire_type = find_epr_90_wire_type()
+    total = len(circuits)
 
     with Transaction(doc, "Sincronizar Circuitos") as t:
         t.Start()
@@ -382,119 +579,90 @@ def sync_circuits(circuits):
         opts.SetFailuresPreprocessor(WarningSwallower())
         t.SetFailureHandlingOptions(opts)
 
-        for c in circuits:
+        for i, c in enumerate(circuits):
+            if progress and progress(i, total):
+                break
             num = c.CircuitNumber or "?"
-            updated = []
-            err = []
-            panel_feeder = is_panel_feeder(c)
-            if panel_feeder:
-                updated.append("Alimentador")
-
-            # 1. DISTÂNCIA
-            dist_m = 0.0
-            try:
-                raw_ft = c.Length
-                if raw_ft > 0:
-                    dist_m = float(math.ceil(raw_ft * 0.3048))
-                    if write_param(c, names=["L Considerado", "L Considerado (m)"], value=dist_m):
-                        updated.append("Dist: {}m".format(int(dist_m)))
-            except Exception as ex:
-                err.append("Dist: " + str(ex))
-
-            # 2. CORRENTE E TENSÃO
-            try:
-                i_proj = (c.ApparentLoad / c.Voltage) if c.Voltage > 0 else 0.0
-                v_nominal = get_param_double(
-                    c,
-                    builtin=BuiltInParameter.RBS_ELEC_VOLTAGE,
-                    names=["Tensão", "TensÃ£o", "Voltage"],
-                    default=127.0
-                )
-                poles = c.PolesNumber
-
-                fca, fct = 1.0, 1.0
+            if show_panel:
+                num = "{} / {}".format(c.PanelName or "?", num)
+
+            uid = None
+            if fingerprints is not None:
                 try:
-                    pf = c.LookupParameter("FCA")
-                    if pf and pf.HasValue:
-                        fca = float(str(pf.AsValueString() or pf.AsDouble()).replace(",", "."))
-                    pf = c.LookupParameter("FCT")
-                    if pf and pf.HasValue:
-                        fct = float(str(pf.AsValueString() or pf.AsDouble()).replace(",", "."))
-                except:
+                    uid = c.UniqueId
+                    if fingerprints.get(uid) == circuit_fingerprint(c):
+                        skipped += 1
+                        continue
+                except Exception:
                     pass
-                if fca <= 0: fca = 1.0
-                if fct <= 0: fct = 1.0
 
-                i_corr = i_proj / (fca * fct)
-            except Exception as ex:
-                err.append("Corrente: " + str(ex))
-                i_proj, v_nominal, poles, i_corr = 0.0, 127.0, 1, 0.0
+            updated, err = sync_one(c, epr_90_wire_type)
 
-            # 3. DIMENSIONAMENTO
-            try:
-                rating = get_standard_breaker(i_corr)
-                if panel_feeder:
-                    rating = get_standard_breaker(i_corr * PANEL_BREAKER_FACTOR)
-                    rating = max(rating, get_next_standard_breaker(get_standard_breaker(i_corr)))
-                    rating = max(rating, PANEL_MIN_BREAKER)
-                section = PAIRED_SECTIONS.get(rating, 2.5)
-                if panel_feeder:
-                    section = max(section, PANEL_MIN_SECTION)
-
-                for _ in range(len(SECTIONS)):
-                    vd = calculate_vd(dist_m, i_proj, v_nominal, section, phases=poles)
-                    iz = AMPACITIES.get(section, 0.0) * fca * fct
-                    if (vd <= 3.0 or dist_m <= 0) and iz >= rating:
-                        break
-                    idx = next((i for i, s in enumerate(SECTIONS) if s == section), -1)
-                    if idx == -1 or idx + 1 >= len(SECTIONS):
-                        break
-                    section = SECTIONS[idx + 1]
-
-                breaker_written, actual_rating, breaker_debug = write_breaker(c, rating)
-                debug_str = " [{}]".format(", ".join(breaker_debug)) if breaker_debug else ""
-                if breaker_written:
-                    if actual_rating and abs(actual_rating - rating) > 0.1:
-                        updated.append("Disj pedido: {}A (ficou {}A){}".format(
-                            int(rating), int(round(actual_rating)), debug_str))
-                    else:
-                        updated.append("Disj: {}A".format(int(rating)))
-                else:
-                    err.append("Disjuntor: nao gravado{}".format(debug_str))
-                if write_param(c, names=["Seção do Condutor Adotado (mm²)", "Condutor Adotado"], value=section):
-                    updated.append("Cabo: {}mm²".format(section))
-                if panel_feeder:
-                    if write_wire_type(c, epr_90_wire_type):
-                        updated.append("Tipo: EPR 90")
-                    elif epr_90_wire_type:
-                        err.append("Tipo de fiacao: parametro bloqueado")
-                    else:
-                        err.append("Tipo de fiacao: EPR 90 nao encontrado no projeto")
-            except Exception as ex:
-                err.append("Dimensionamento: " + str(ex))
+            if uid and not err:
+                try:
+                    new_fps[uid] = circuit_fingerprint(c)
+                except Exception:
+                    new_fps[uid] = None
 
             if updated:
                 line = "| {} | {} |".format(num, ", ".join(updated))
                 if err:
                     line += " ⚠️ " + "; ".join(err)
                 ok.append(line)
+                synced.append(num)
             elif err:
                 erros.append("| {} | ❌ {} |".format(num, "; ".join(err)))
 
-        t.Commit()
+        status = t.Commit()
+
+    if status != TransactionStatus.Committed:
+        # Erro (não aviso) no Commit: o Revit reverte sem exceção. Nada foi gravado,
+        # então os fingerprints ficam como estavam e os circuitos voltam na próxima.
+        erros.extend("| {} | ❌ transação revertida ({}) |".format(num, status) for num in synced)
+        return [], erros, skipped
 
-    return ok, erros
+    if fingerprints is not None:
+        for uid, fp in new_fps.items():
+            if fp is None:
+                fingerprints.pop(uid, None)
+            else:
+                fingerprints[uid] = fp
+    return ok, erros, skipped
+
+
+def print_accumulated_vd(panel, circuits):
+    """Queda acumulada desde a origem (alimentadores a montante + trecho)."""
+    try:
+        tree = build_vd_tree()
+    except Exception as ex:
+        output.print_md("⚠️ Queda acumulada indisponível: {}".format(ex))
+        return
+
+    upstream = tree.queda_no_quadro(panel.Id.IntegerValue)
+    output.print_md("### 📉 Queda acumulada (origem → circuito)")
+    output.print_md("Queda no barramento de {}: **{:.2f}%**".format(get_panel_name(panel), upstream))
+    output.print_md("| Circuito | Trecho | Acumulada |")
+    output.print_md("|---|---|---|")
+    for c in circuits:
+        cid = c.Id.IntegerValue
+        total = tree.queda_acumulada(cid)
+        if total is None:
+            continue
+        flag = " ❌" if total > LIMITE_QUEDA_TOTAL else ""
+        output.print_md("| {} | {:.2f}% | {:.2f}%{} |".format(
+            c.CircuitNumber or "?", tree.queda_trecho(cid, 0.0), total, flag))
 
 
 # ================================================================
 # MAIN
 # ================================================================
 
-def main():
-    panel = pick_panel()
-    if not panel:
-        return
+MODE_PANEL = "Quadro selecionado"
+MODE_PROJECT = "Projeto inteiro (somente alterados)"
+MODE_PROJECT_ALL = "Projeto inteiro (recalcular todos)"
 
+
+def run_panel_sync(panel):
     circuits = get_circuits(panel)
     if not circuits:
         forms.alert("Nenhum circuito encontrado no quadro '{}'.".format(get_panel_name(panel)))
@@ -511,7 +679,7 @@ def main():
     if not confirm:
         return
 
-    ok_lines, err_lines = sync_circuits(circuits)
+    ok_lines, err_lines, _ = sync_circuits(circuits)
 
     output.print_md("## ⚡ Sincronização — {}".format(panel_name))
     output.print_md("| Circuito | Resultado |")
@@ -524,8 +692,84 @@ def main():
     output.print_md("\n✅ **{} sincronizado(s)** | ❌ **{} erro(s)**".format(
         len(ok_lines), len(err_lines)))
 
+    print_accumulated_vd(panel, circuits)
+
     forms.toast("✅ {} circuito(s) sincronizado(s)".format(len(ok_lines)))
 
 
+def run_project_sync(force=False):
+    circuits = get_all_circuits()
+    if not circuits:
+        forms.alert("Nenhum circuito ligado a quadro encontrado no projeto.")
+        return
+
+    fingerprints = {} if force else load_fingerprints()
+    current = set(c.UniqueId for c in circuits)
+    fingerprints = dict((k, v) for k, v in fingerprints.items() if k in current)
+
+    with forms.ProgressBar(title="Sincronizando circuitos ({value} de {max_value})",
+                           cancellable=True) as pb:
+        def progress(i, total):
+            if i % 20 == 0:
+                pb.update_progress(i, total)
+            return pb.cancelled
+
+        ok_lines, err_lines, skipped = sync_circuits(
+            circuits, fingerprints, progress, show_panel=True)
+
+    save_fingerprints(fingerprints)
+
+    # Relatório montado de uma vez: print_md por linha fica lento com milhares de circuitos
+    report = ["## ⚡ Sincronização — Projeto inteiro",
+              "| Quadro / Circuito | Resultado |",
+              "|---|---|"]
+    report.extend(ok_lines)
+    report.extend(err_lines)
+    report.append("\n✅ **{} sincronizado(s)** | ⏭️ **{} sem alteração** | ❌ **{} erro(s)**".format(
+        len(ok_lines), skipped, len(err_lines)))
+
+    try:
+        tree = build_vd_tree(circuits)
+        by_id = dict((c.Id.IntegerValue, c) for c in circuits)
+        over = sorted(tree.excedentes(), key=lambda x: -x[1])
+        if over:
+            report.append("### 📉 Queda acumulada acima de {:.0f}%".format(LIMITE_QUEDA_TOTAL))
+            report.append("| Quadro / Circuito | Acumulada |")
+            report.append("|---|---|")
+            for cid, total in over:
+                c = by_id.get(cid)
+                if c:
+                    report.append("| {} / {} | {:.2f}% ❌ |".format(
+                        c.PanelName or "?", c.CircuitNumber or "?", total))
+    except Exception as ex:
+        report.append("⚠️ Queda acumulada indisponível: {}".format(ex))
+
+    output.print_md("\n".join(report))
+
+    forms.toast("✅ {} sincronizado(s), {} sem alteração".format(len(ok_lines), skipped))
+
+
+def main():
+    panel = selected_panel()
+    if panel:
+        run_panel_sync(panel)
+        return
+
+    mode = forms.CommandSwitchWindow.show(
+        [MODE_PANEL, MODE_PROJECT, MODE_PROJECT_ALL],
+        message="Sincronizar circuitos de:",
+        title="Sincronizar Circuitos"
+    )
+    if not mode:
+        return
+
+    if mode == MODE_PANEL:
+        panel = pick_panel()
+        if panel:
+            run_panel_sync(panel)
+    else:
+        run_project_sync(force=(mode == MODE_PROJECT_ALL))
+
+
 if __name__ == '__main__':
     main()
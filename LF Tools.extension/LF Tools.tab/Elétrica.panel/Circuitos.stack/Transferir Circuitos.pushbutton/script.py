@@ -31,13 +31,14 @@ from System.Collections.Generic import List
 
 from Autodesk.Revit.DB import (
     FilteredElementCollector, BuiltInCategory, BuiltInParameter,
-    Transaction, TransactionStatus, ElementSet, ElementId, StorageType, Domain,
+    Transaction, TransactionGroup, TransactionStatus, ElementSet, ElementId, StorageType, Domain,
     IFailuresPreprocessor, FailureSeverity, FailureProcessingResult
 )
-from Autodesk.Revit.DB.Electrical import ElectricalSystem, ElectricalSystemType, DistributionSysType
+from Autodesk.Revit.DB.Electrical import ElectricalSystem, ElectricalSystemType
 
 from pyrevit import forms, script
 from lf_utils import DebugLogger, make_warning_swallower
+from lf_revit import get_electrical_catalog, get_electrical_network
 
 # ══════════════════════════════════════════════════════════════
 #  INIT
@@ -225,40 +226,20 @@ def get_electrical_panels():
 
 def get_circuits_from_panel(panel_element):
     """Pega os circuitos onde panel_element atua como painel (BaseEquipment)."""
-    circuits = []
     try:
-        mep = panel_element.MEPModel
-        if mep is None:
-            return circuits
-        systems = mep.GetElectricalSystems()
-        if systems:
-            for sys in systems:
-                try:
-                    base_eq = sys.BaseEquipment
-                    if base_eq and base_eq.Id == panel_element.Id:
-                        circuits.append(sys)
-                except Exception:
-                    pass
+        return get_electrical_network(doc).circuits_from(panel_element)
     except Exception as e:
         dbg.error("get_circuits_from_panel: {}".format(e))
-    return circuits
+    return []
 
 
 def get_unassigned_circuits():
     """Retorna circuitos (PowerCircuit) sem quadro atribuído."""
-    circuits = []
     try:
-        all_sys = FilteredElementCollector(doc).OfClass(ElectricalSystem).ToElements()
-        for sys in all_sys:
-            try:
-                if sys.SystemType == ElectricalSystemType.PowerCircuit:
-                    if not sys.BaseEquipment:
-                        circuits.append(sys)
-            except Exception:
-                pass
+        return get_electrical_network(doc).unassigned_circuits()
     except Exception as e:
         dbg.error("get_unassigned_circuits: {}".format(e))
-    return circuits
+    return []
 
 
 def _get_circuit_number(circ):
@@ -857,10 +838,12 @@ def _configure_elec(elem, target_voltage, target_poles, dist_id):
     # DistributionSysType do painel (instância)
     _apply_dist_to(elem, dist_id)
 
-def _force_circuit_voltage_and_poles(circuit, panel, target_voltage, target_poles):
-    """Forca DistributionSysType/Poles no circuito recriado antes do SelectPanel."""
+def _force_circuit_voltage_and_poles(circuit, panel, target_voltage, target_poles, dist_id=None):
+    """Forca DistributionSysType/Poles no circuito recriado antes do SelectPanel.
+    dist_id já resolvido pelo chamador evita reler o painel a cada chamada."""
     changed = False
-    dist_id = _get_panel_dist_id(panel)
+    if not dist_id:
+        dist_id = _get_panel_dist_id(panel)
     if not dist_id and target_voltage is not None:
         dist_id = _find_matching_dist_sys(target_voltage)
 
@@ -902,31 +885,10 @@ def _force_circuit_voltage_and_poles(circuit, panel, target_voltage, target_pole
 
 def _find_matching_dist_sys(target_voltage_volts):
     """Encontra DistributionSysType cujo range de tensão cobre target_voltage_volts."""
-    v_internal = float(target_voltage_volts) * _VOLT_CONV
     try:
-        for s in FilteredElementCollector(doc).OfClass(DistributionSysType).ToElements():
-            for bip in [BuiltInParameter.RBS_ELEC_DISTRIBUTION_SYS_VOLTAGE_L_G_PARAM,
-                        BuiltInParameter.RBS_ELEC_DISTRIBUTION_SYS_VOLTAGE_L_L_PARAM]:
-                try:
-                    vp = s.get_Parameter(bip)
-                    if not vp or not vp.HasValue:
-                        continue
-                    vid = vp.AsElementId()
-                    if vid == ElementId.InvalidElementId:
-                        continue
-                    vtype = doc.GetElement(vid)
-                    if not vtype:
-                        continue
-                    min_p = vtype.get_Parameter(BuiltInParameter.RBS_ELEC_VOLTAGE_MIN_PARAM)
-                    max_p = vtype.get_Parameter(BuiltInParameter.RBS_ELEC_VOLTAGE_MAX_PARAM)
-                    if min_p and max_p:
-                        if (min_p.AsDouble() - 55) <= v_internal <= (max_p.AsDouble() + 55):
-                            return s.Id
-                except Exception:
-                    pass
+        return get_electrical_catalog(doc).dist_sys_for_voltage(target_voltage_volts)
     except Exception:
-        pass
-    return None
+        return None
 
 
 def _set_voltage_value(elem, target_voltage):
@@ -1514,7 +1476,76 @@ def _debug_member_dist(circ_num, member, label):
         pass
 
 
-def transfer_one_circuit(circ, dest_panel, target_poles, target_voltage=None):
+def _panel_max_poles(panel):
+    """Nº máximo de polos do quadro (instância ou tipo), ou None."""
+    try:
+        targets = [panel, doc.GetElement(panel.GetTypeId())]
+    except Exception:
+        targets = [panel]
+    for el in targets:
+        try:
+            p = el.get_Parameter(BuiltInParameter.RBS_ELEC_MAX_POLE_BREAKERS) if el else None
+            if p and p.HasValue and p.AsInteger() > 0:
+                return p.AsInteger()
+        except Exception:
+            pass
+    return None
+
+
+class PanelTarget(object):
+    """Quadro destino de um lote de transferências.
+
+    Sistema de distribuição, tensões e posições livres são resolvidos uma
+    vez por lote em vez de a cada circuito. free_slots conta só circuitos de
+    força (reservas e espaços incluídos) e é None quando o quadro não informa
+    o máximo de polos (sem verificação de espaço).
+    """
+
+    def __init__(self, panel):
+        self.panel = panel
+        self.name = _safe_name(panel)
+        self.dist_id = _get_panel_dist_id(panel)
+        self.dist_name = _get_dist_name(self.dist_id)
+        entry = get_electrical_catalog(doc).dist_system(self.dist_id) if self.dist_id else None
+        self.voltage_lg = entry.lg.volts if entry and entry.lg else None
+        self.voltage_ll = entry.ll.volts if entry and entry.ll else None
+        self.free_slots = None
+        max_poles = _panel_max_poles(panel)
+        if max_poles is not None:
+            used = 0
+            for c in get_circuits_from_panel(panel):
+                try:
+                    if c.SystemType != ElectricalSystemType.PowerCircuit:
+                        continue    # dados, alarme etc. não ocupam posição de disjuntor
+                except Exception:
+                    pass
+                try:
+                    used += int(c.PolesNumber)
+                except Exception:
+                    used += 1
+            self.free_slots = max(0, max_poles - used)
+
+    def dist_for(self, voltage):
+        """DistributionSysType do quadro ou, sem ele, o que cobre a tensão."""
+        if self.dist_id or voltage is None:
+            return self.dist_id
+        return _find_matching_dist_sys(voltage)
+
+    def has_room(self, poles):
+        return self.free_slots is None or self.free_slots >= poles
+
+    def reserve(self, poles):
+        if self.free_slots is not None:
+            self.free_slots = max(0, self.free_slots - poles)
+
+    def describe(self):
+        volts = u"/".join(u"{}V".format(v) for v in (self.voltage_ll, self.voltage_lg) if v)
+        slots = u"?" if self.free_slots is None else self.free_slots
+        return u"{} — sistema '{}' {} — {} posição(ões) livre(s)".format(
+            self.name, self.dist_name or u"?", volts, slots)
+
+
+def transfer_one_circuit(circ, dest_panel, target_poles, target_voltage=None, target=None):
     """Transfere um circuito para dest_panel.
 
     Estratégia:
@@ -1522,6 +1553,9 @@ def transfer_one_circuit(circ, dest_panel, target_poles, target_voltage=None):
       2. Recriar: configura membros ANTES de deletar (igual Gerenciar Circuito),
          depois delete → create → SelectPanel.
 
+    target: PanelTarget já resolvido para dest_panel (lote); sem ele o
+    sistema de distribuição é lido do painel nesta chamada.
+
     Retorna (sucesso, mensagem).
     """
     circ_num = ""
@@ -1542,13 +1576,13 @@ def transfer_one_circuit(circ, dest_panel, target_poles, target_voltage=None):
         effective_voltage = circ_voltage_v
 
     # DistributionSysType do painel destino
-    dist_id = _get_panel_dist_id(dest_panel)
+    dist_id = target.dist_id if target is not None else _get_panel_dist_id(dest_panel)
     dbg.info("C{}: dist_id do painel = {}  tensao_circ={:.0f}V  target={}V".format(
         circ_num, dist_id,
         circ_voltage_v if circ_voltage_v else 0,
         effective_voltage if effective_voltage else "?"))
     if not dist_id and effective_voltage:
-        dist_id = _find_matching_dist_sys(effective_voltage)
+        dist_id = target.dist_for(effective_voltage) if target is not None else _find_matching_dist_sys(effective_voltage)
         dbg.debug("C{}: dist_id fallback por tensao = {}".format(circ_num, dist_id))
     if not dist_id:
         dbg.warn("C{}: nenhum DistributionSysType encontrado".format(circ_num))
@@ -1653,7 +1687,7 @@ def transfer_one_circuit(circ, dest_panel, target_poles, target_voltage=None):
     if new_circ is None:
         return False, u"ElectricalSystem.Create retornou None"
 
-    _force_circuit_voltage_and_poles(new_circ, dest_panel, effective_voltage, target_poles)
+    _force_circuit_voltage_and_poles(new_circ, dest_panel, effective_voltage, target_poles, dist_id)
 
     try:
         doc.Regenerate()
@@ -1701,10 +1735,10 @@ def transfer_one_circuit(circ, dest_panel, target_poles, target_voltage=None):
         dbg.debug("C{}: --- END ALL params ---".format(circ_num))
 
     restore_circuit(new_circ, snap)
-    _force_circuit_voltage_and_poles(new_circ, dest_panel, effective_voltage, target_poles)
+    _force_circuit_voltage_and_poles(new_circ, dest_panel, effective_voltage, target_poles, dist_id)
 
     try:
-        _force_circuit_voltage_and_poles(new_circ, dest_panel, effective_voltage, target_poles)
+        _force_circuit_voltage_and_poles(new_circ, dest_panel, effective_voltage, target_poles, dist_id)
         new_circ.SelectPanel(dest_panel)
         doc.Regenerate()
         if not _verify_circuit_on_panel(new_circ, dest_panel):
@@ -2128,6 +2162,71 @@ class TransferCircuitsWindow(forms.WPFWindow):
 
     # ── Transferir ──
 
+    def _record_failure(self, circ, circ_num, status_lbl, cb, msg):
+        _set_row_status(status_lbl, cb, "error", msg)
+        hkey = _history_key(self._source_panel_name, circ)
+        prev = self._history.get(hkey, {})
+        self._history[hkey] = {"error": msg[:200], "count": prev.get("count", 0) + 1}
+        dbg.error(u"C{}: {}".format(circ_num, msg))
+
+    def _transfer_row(self, circ, circ_num, target_poles, target_voltage, status_lbl, cb, target,
+                      check_room=False):
+        """Transfere um circuito numa Transaction própria. Retorna True se confirmou.
+
+        check_room (modo lote): recusa antes de abrir a Transaction quando o
+        destino já não tem posições livres; fora do lote o Revit decide.
+        """
+        if check_room and not target.has_room(target_poles):
+            self._record_failure(circ, circ_num, status_lbl, cb, (
+                u"Quadro destino sem posições livres ({} livre(s), {} polo(s) necessário(s))"
+            ).format(target.free_slots, target_poles))
+            return False
+
+        failure_logger = TransferFailureLogger()
+        t = Transaction(doc, u"Transferir C{}".format(circ_num))
+        opts = t.GetFailureHandlingOptions()
+        opts.SetFailuresPreprocessor(failure_logger)
+        t.SetFailureHandlingOptions(opts)
+        t.Start()
+
+        ok = False
+        msg = u""
+        try:
+            ok, msg = transfer_one_circuit(circ, target.panel, target_poles, target_voltage, target)
+        except Exception as e:
+            ok, msg = False, str(e)
+
+        if not ok:
+            try:
+                if t.GetStatus() == TransactionStatus.Started:
+                    t.RollBack()
+            except Exception:
+                pass
+            self._record_failure(circ, circ_num, status_lbl, cb, msg)
+            return False
+
+        try:
+            doc.Regenerate()
+        except Exception:
+            pass
+        status = t.Commit()
+        if status != TransactionStatus.Committed:
+            try:
+                t.RollBack()
+            except Exception:
+                pass
+            fail_msg = (u" | ".join(failure_logger.messages[:2])
+                        if failure_logger.messages
+                        else u"Revit rejeitou (status {})".format(status))
+            self._record_failure(circ, circ_num, status_lbl, cb, u"commit rejeitado — " + fail_msg)
+            return False
+
+        target.reserve(target_poles)
+        _set_row_status(status_lbl, cb, "ok", u"")
+        self._history.pop(_history_key(self._source_panel_name, circ), None)
+        dbg.info(u"C{}: OK".format(circ_num))
+        return True
+
     def _on_transfer(self, sender, args):
         s_idx = self.cb_SourcePanel.SelectedIndex
         d_idx = self.cb_DestPanel.SelectedIndex
@@ -2176,79 +2275,49 @@ class TransferCircuitsWindow(forms.WPFWindow):
         if not confirma:
             return
 
-        # ── Uma Transaction por circuito ──
+        # ── Uma Transaction por circuito (em lote: todas dentro de um TransactionGroup) ──
         dbg.section(u"Transferir Circuitos")
-        dbg.info(u"Destino: {} ({} circuitos)".format(dest_name, len(selected)))
+        target = PanelTarget(dest_panel)
+        dbg.info(u"Destino: {} ({} circuitos)".format(target.describe(), len(selected)))
+        batch = bool(self.cb_Batch.IsChecked) if hasattr(self, "cb_Batch") else False
 
         self.btn_Transfer.IsEnabled = False
         sucessos = 0
         n_erros = 0
 
-        for i, (circ, target_poles, target_voltage, status_lbl, cb) in enumerate(selected):
-            circ_num = u""
-            try:
-                circ_num = circ.CircuitNumber
-            except Exception:
-                pass
-
-            self.lbl_Info.Text = u"Transferindo C{}… ({}/{})".format(
-                circ_num, i + 1, len(selected))
-            _pump_dispatcher()
-
-            failure_logger = TransferFailureLogger()
-            t = Transaction(doc, u"Transferir C{}".format(circ_num))
-            opts = t.GetFailureHandlingOptions()
-            opts.SetFailuresPreprocessor(failure_logger)
-            t.SetFailureHandlingOptions(opts)
-            t.Start()
-
-            ok = False
-            msg = u""
-            try:
-                ok, msg = transfer_one_circuit(circ, dest_panel, target_poles, target_voltage)
-            except Exception as e:
-                ok, msg = False, str(e)
-
-            if ok:
+        tg = None
+        if batch:
+            tg = TransactionGroup(doc, u"Transferir {} circuito(s) para {}".format(len(selected), dest_name))
+            tg.Start()
+        try:
+            for i, (circ, target_poles, target_voltage, status_lbl, cb) in enumerate(selected):
+                circ_num = u""
                 try:
-                    doc.Regenerate()
+                    circ_num = circ.CircuitNumber
                 except Exception:
                     pass
-                status = t.Commit()
-                if status == TransactionStatus.Committed:
+
+                self.lbl_Info.Text = u"Transferindo C{}… ({}/{})".format(
+                    circ_num, i + 1, len(selected))
+                _pump_dispatcher()
+
+                if self._transfer_row(circ, circ_num, target_poles, target_voltage,
+                                      status_lbl, cb, target, check_room=batch):
                     sucessos += 1
-                    _set_row_status(status_lbl, cb, "ok", u"")
-                    self._history.pop(_history_key(self._source_panel_name, circ), None)
-                    dbg.info(u"C{}: OK".format(circ_num))
                 else:
-                    try:
-                        t.RollBack()
-                    except Exception:
-                        pass
-                    fail_msg = (u" | ".join(failure_logger.messages[:2])
-                                if failure_logger.messages
-                                else u"Revit rejeitou (status {})".format(status))
                     n_erros += 1
-                    _set_row_status(status_lbl, cb, "error", fail_msg)
-                    hkey = _history_key(self._source_panel_name, circ)
-                    prev = self._history.get(hkey, {})
-                    self._history[hkey] = {"error": fail_msg[:200], "count": prev.get("count", 0) + 1}
-                    dbg.error(u"C{}: commit rejeitado — {}".format(circ_num, fail_msg))
-            else:
-                try:
-                    if t.GetStatus() == TransactionStatus.Started:
-                        t.RollBack()
-                except Exception:
-                    pass
-                n_erros += 1
-                _set_row_status(status_lbl, cb, "error", msg)
-                hkey = _history_key(self._source_panel_name, circ)
-                prev = self._history.get(hkey, {})
-                self._history[hkey] = {"error": msg[:200], "count": prev.get("count", 0) + 1}
-                dbg.error(u"C{}: {}".format(circ_num, msg))
-
-            _save_history(self._history)
-            _pump_dispatcher()
+
+                if not batch:
+                    _save_history(self._history)
+                    _pump_dispatcher()
+        finally:
+            if tg is not None:
+                # Sub-transações já confirmadas viram um único passo de desfazer
+                if sucessos:
+                    tg.Assimilate()
+                else:
+                    tg.RollBack()
+                _save_history(self._history)
 
         # ── Resumo inline (janela permanece aberta) ──
         dbg.section(u"Resultado")
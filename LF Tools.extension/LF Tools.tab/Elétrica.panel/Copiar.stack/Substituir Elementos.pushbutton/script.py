@@ -509,7 +509,7 @@ def restore_physical_connections(new_elem, connections, logs):
 def find_circuit(elem):
     """
     Encontra o ElectricalSystem associado a um FamilyInstance.
-    Tenta MEPModel → Connectores → busca global (fallback lento).
+    Tenta MEPModel → Connectores → grafo da rede elétrica (lf_revit).
     Retorna o primeiro ElectricalSystem encontrado ou None.
     """
     # Método 1 - MEPModel.ElectricalSystems
@@ -550,9 +550,11 @@ def find_circuit(elem):
     except Exception:
         pass
 
-    # Método 3 - Busca global (fallback)
+    # Método 3 - Grafo da rede elétrica (sem varrer todos os circuitos).
+    # Confere a participação atual: o grafo só enxerga mudanças já confirmadas.
     try:
-        for es in FilteredElementCollector(doc).OfClass(ElectricalSystem).ToElements():
+        from lf_revit import get_electrical_network
+        for es in get_electrical_network(doc).circuits_of(elem):
             try:
                 if es.Elements:
                     for member in es.Elements:
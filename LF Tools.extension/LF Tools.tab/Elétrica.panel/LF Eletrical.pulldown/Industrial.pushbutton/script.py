@@ -32,7 +32,7 @@ from lf_electrical_core import (
     is_element_connected_to_panel, ensure_element_is_free, get_room_name, get_family_name,
     configure_panel, PanelFilter, CategoryFilter, call_queda_tensao,
     VALID_SWITCH_LETTERS, _get_switch_label, load_config, dbg,
-    suppress_elec_dialog
+    suppress_elec_dialog, get_electrical_catalog
 )
 
 VOLTAGE_FACTOR = 10.7639104167
@@ -145,43 +145,10 @@ def _get_voltage_value_from_dist_system(system, bip_name):
         pass
     return None
 
-def _get_voltage_type_value(vtype):
-    param_ids = []
-    for bip_name in ['RBS_ELEC_VOLTAGE_VALUE', 'RBS_ELEC_VOLTAGE_MIN_PARAM', 'RBS_ELEC_VOLTAGE_MAX_PARAM']:
-        try:
-            param_ids.append(getattr(BuiltInParameter, bip_name))
-        except AttributeError:
-            pass
-    for param_id in param_ids:
-        try:
-            p = vtype.get_Parameter(param_id)
-            if p and p.HasValue:
-                return int(round(p.AsDouble() / VOLTAGE_FACTOR))
-        except Exception:
-            pass
-    # Fallback: extrair tensao do nome do VoltageType (ex: "220 V", "220V", "Fase-Neutro 220V")
-    try:
-        m = re.search(r'\b(\d{2,3})\b', vtype.Name or '')
-        if m:
-            return int(m.group(1))
-    except Exception:
-        pass
-    return None
-
 def _find_voltage_type(voltage):
     target = int(round(float(voltage)))
     try:
-        for vtype in FilteredElementCollector(doc).OfClass(VoltageType).ToElements():
-            val = _get_voltage_type_value(vtype)
-            if val and abs(val - target) <= 2:
-                return vtype
-            try:
-                name_nums = [int(x) for x in re.findall(r"\d+", vtype.Name or "")]
-                if any(abs(n - target) <= 2 for n in name_nums):
-                    dbg.step('VoltageType {}V encontrado por nome: {}'.format(target, vtype.Name))
-                    return vtype
-            except Exception:
-                pass
+        return get_electrical_catalog().voltage_type(target)
     except Exception as ex:
         dbg.warn('Falha ao buscar VoltageType {}V: {}'.format(target, ex))
     return None
@@ -245,7 +212,7 @@ def _dist_system_matches_rule(system, rule):
     return True
 
 def _collect_industrial_distribution_options_for_rule(rule):
-    systems = list(FilteredElementCollector(doc).OfClass(DistributionSysType).ToElements())
+    systems = [entry.element for entry in get_electrical_catalog().dist_systems()]
     options = OrderedDict()
     matches = []
     for system in systems:
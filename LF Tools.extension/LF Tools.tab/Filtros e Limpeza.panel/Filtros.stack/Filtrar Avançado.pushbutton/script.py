@@ -22,13 +22,16 @@ except ImportError:
     revit = _RevitProxy()
 from Autodesk.Revit.DB import (
     FilteredElementCollector, BuiltInCategory, ElementId, StorageType,
-    BuiltInParameter, Element, UnitUtils, UnitTypeId
+    BuiltInParameter, Element, UnitUtils, UnitTypeId,
+    ElementFilter, ElementParameterFilter, FilterRule, ParameterFilterRuleFactory,
+    LogicalAndFilter, LogicalOrFilter, ParameterElement, SharedParameterElement
 )
 try:
     from Autodesk.Revit import DB
 except Exception:
     DB = None
 from System.Collections.Generic import List
+from lf_revit import get_schema_cache
 import io
 import traceback
 import os
@@ -474,6 +477,461 @@ def smart_parameter_compare(param, condition, user_text, text_compare_func):
     return text_compare_func(param_txt, condition, user_text)
 
 
+# ==================== COMPILAÇÃO EM FILTRO NATIVO ====================
+# Condições que o Revit consegue avaliar sozinho viram ElementParameterFilter e
+# entram no FilteredElementCollector (WherePasses): o Python só vê quem passou.
+# Só compila quando a regra nativa dá o mesmo resultado de smart_parameter_compare;
+# parâmetros virtuais, "Corresponde ao Padrão", texto com número (comparado
+# numericamente pelo check_condition) e parâmetros de tipo ficam no avaliar().
+
+NATIVE_SAMPLE_SIZE = 50
+NUMERIC_TOLERANCE = 0.01   # mesma tolerância (unidade de exibição) de smart_parameter_compare
+
+# condição -> (método da ParameterFilterRuleFactory, exige HasValue)
+# As regras "negativas" levam HasValue junto: no Python parâmetro vazio nunca passa.
+_STRING_RULES = {
+    u"Igual a": ("CreateEqualsRule", False),
+    u"Diferente de": ("CreateNotEqualsRule", True),
+    u"Contém": ("CreateContainsRule", False),
+    u"Não Contém": ("CreateNotContainsRule", True),
+    u"Começa com": ("CreateBeginsWithRule", False),
+    u"Termina com": ("CreateEndsWithRule", False),
+}
+
+# condição -> (método da ParameterFilterRuleFactory, usa tolerância)
+# Maior/Menor são estritos no Python, então vão sem tolerância.
+_NUMERIC_RULES = {
+    u"Igual a": ("CreateEqualsRule", True),
+    u"Diferente de": ("CreateNotEqualsRule", True),
+    u"Maior que": ("CreateGreaterRule", False),
+    u"Menor que": ("CreateLessRule", False),
+    u"Maior ou igual": ("CreateGreaterOrEqualRule", True),
+    u"Menor ou igual": ("CreateLessOrEqualRule", True),
+}
+
+
+def _string_rule(method, param_id, value):
+    factory = getattr(ParameterFilterRuleFactory, method)
+    try:
+        return factory(param_id, value)          # Revit 2023+ (sempre sem diferenciar maiúsculas)
+    except:
+        return factory(param_id, value, False)   # Revit 2022-
+
+
+def _parameter_filter(rules):
+    rule_list = List[FilterRule]()
+    for r in rules:
+        rule_list.Add(r)
+    return ElementParameterFilter(rule_list)
+
+
+def is_document_wide_parameter(el, p):
+    """
+    True se o Id do parâmetro vale para o documento inteiro: BuiltInParameter,
+    parâmetro compartilhado ou parâmetro de projeto vinculado à categoria do
+    elemento. Parâmetro de família comum tem Id próprio em cada família, então
+    uma regra montada com o Id da amostra ignoraria as outras famílias.
+    """
+    pid = get_id_value(p.Id)
+    if pid is None:
+        return False
+    if pid < 0:
+        return True
+    el_doc = get_element_document(el)
+    pe = el_doc.GetElement(p.Id)
+    if isinstance(pe, SharedParameterElement):
+        return True
+    if not isinstance(pe, ParameterElement) or el.Category is None:
+        return False
+    binding = el_doc.ParameterBindings.get_Item(pe.GetDefinition())
+    return binding is not None and binding.Categories.Contains(el.Category)
+
+
+def resolve_native_parameter(elements, param_name):
+    """
+    Parâmetro de instância comum às amostras: (Id, StorageType, Parameter) ou None.
+    None se nenhuma amostra tem o parâmetro, se ele aparece no tipo (a regra nativa
+    só olha a instância), se Id/StorageType divergem entre elementos ou se o Id não
+    é global ao documento (ver is_document_wide_parameter): a amostra não garante
+    que elementos fora dela usem o mesmo Id.
+    """
+    found = None
+    for el in elements:
+        try:
+            p = el.LookupParameter(param_name)
+            if p is None:
+                type_id = el.GetTypeId()
+                if type_id != ElementId.InvalidElementId:
+                    type_elem = get_element_document(el).GetElement(type_id)
+                    if type_elem is not None and type_elem.LookupParameter(param_name):
+                        return None
+                continue
+            if found is None:
+                if not is_document_wide_parameter(el, p):
+                    return None
+                found = (p.Id, p.StorageType, p)
+            elif get_id_value(p.Id) != get_id_value(found[0]) or p.StorageType != found[1]:
+                return None
+        except:
+            return None
+    return found
+
+
+def compile_condition(elements, param_name, condition, user_text):
+    """ElementParameterFilter equivalente à condição, ou None se ela precisa do avaliar()."""
+    if not param_name or param_name.startswith(u"[VIRTUAL]"):
+        return None
+    resolved = resolve_native_parameter(elements, param_name)
+    if resolved is None:
+        return None
+    param_id, storage, sample = resolved
+    value = (user_text or u"").strip()
+
+    try:
+        if condition in (u"Em branco", u"Não em branco"):
+            method = "CreateHasNoValueParameterRule" if condition == u"Em branco" else "CreateHasValueParameterRule"
+            factory = getattr(ParameterFilterRuleFactory, method, None)   # Revit 2022+
+            if factory is None:
+                return None
+            return _parameter_filter([factory(param_id)])
+
+        user_val = parse_float_smart(value)
+
+        if storage == StorageType.String:
+            # check_condition compara numericamente quando o valor tem número
+            if condition not in _STRING_RULES or not value or user_val is not None:
+                return None
+            method, needs_value = _STRING_RULES[condition]
+            rules = [_string_rule(method, param_id, value)]
+            if needs_value:
+                rules.insert(0, ParameterFilterRuleFactory.CreateHasValueParameterRule(param_id))
+            return _parameter_filter(rules)
+
+        if condition not in _NUMERIC_RULES or user_val is None:
+            return None
+        method, use_tol = _NUMERIC_RULES[condition]
+        factory = getattr(ParameterFilterRuleFactory, method)
+
+        if storage == StorageType.Integer:
+            if user_val != int(user_val):
+                return None
+            return _parameter_filter([factory(param_id, int(user_val))])
+
+        if storage == StorageType.Double:
+            # Valor digitado está na unidade de exibição do parâmetro (ex.: metros)
+            unit_id = sample.GetUnitTypeId()
+            internal = UnitUtils.ConvertToInternalUnits(user_val, unit_id)
+            if use_tol:
+                eps = abs(UnitUtils.ConvertToInternalUnits(user_val + NUMERIC_TOLERANCE, unit_id) - internal)
+            else:
+                eps = 1e-9
+            return _parameter_filter([factory(param_id, float(internal), eps)])
+    except:
+        return None
+    return None
+
+
+def combine_filters(filters, use_and=True):
+    filters = [f for f in filters if f is not None]
+    if not filters:
+        return None
+    if len(filters) == 1:
+        return filters[0]
+    filter_list = List[ElementFilter]()
+    for f in filters:
+        filter_list.Add(f)
+    return LogicalAndFilter(filter_list) if use_and else LogicalOrFilter(filter_list)
+
+
+def parameter_location(elements, param_name):
+    """"instance", "type" ou None conforme onde o parâmetro aparece nas amostras."""
+    on_type = False
+    for el in elements:
+        try:
+            if el.LookupParameter(param_name):
+                return "instance"
+            type_id = el.GetTypeId()
+            if type_id != ElementId.InvalidElementId:
+                type_elem = get_element_document(el).GetElement(type_id)
+                if type_elem is not None and type_elem.LookupParameter(param_name):
+                    on_type = True
+        except:
+            pass
+    return "type" if on_type else None
+
+
+# ==================== CONSULTA E / OU / NÃO ====================
+# Árvore de condições salva nos presets ("Query"):
+#   {"param": "Comentários", "cond": "Contém", "value": "QD"}
+#   {"op": "AND" | "OR", "children": [...]}
+#   {"op": "NOT", "child": {...}}
+# A UI edita até duas condições; presets com mais que isso são aplicados como
+# consulta avançada (ver FiltroAvancadoWindow._query_avancada).
+
+class QueryCondition(object):
+    def __init__(self, param, condition, value=u""):
+        self.param = param or u""
+        self.condition = condition or u""
+        self.value = value or u""
+
+    def to_dict(self):
+        return {"param": self.param, "cond": self.condition, "value": self.value}
+
+    def describe(self):
+        return u"{} {} {}".format(self.param, self.condition, self.value).strip()
+
+    def count(self):
+        return 1
+
+
+class QueryGroup(object):
+    def __init__(self, op, children):
+        self.op = "OR" if op == "OR" else "AND"
+        self.children = list(children)
+
+    def to_dict(self):
+        return {"op": self.op, "children": [c.to_dict() for c in self.children]}
+
+    def describe(self):
+        sep = u" E " if self.op == "AND" else u" OU "
+        return u"(" + sep.join(c.describe() for c in self.children) + u")"
+
+    def count(self):
+        return sum(c.count() for c in self.children)
+
+
+class QueryNot(object):
+    def __init__(self, child):
+        self.child = child
+
+    def to_dict(self):
+        return {"op": "NOT", "child": self.child.to_dict()}
+
+    def describe(self):
+        return u"NÃO " + self.child.describe()
+
+    def count(self):
+        return self.child.count()
+
+
+def query_from_dict(data):
+    """Reconstrói a árvore salva por to_dict(); levanta ValueError se malformada."""
+    if not isinstance(data, dict):
+        raise ValueError(u"Consulta inválida: {!r}".format(data))
+    op = data.get("op")
+    if op in ("AND", "OR"):
+        children = [query_from_dict(c) for c in data.get("children") or []]
+        if not children:
+            raise ValueError(u"Grupo {} sem condições".format(op))
+        return children[0] if len(children) == 1 else QueryGroup(op, children)
+    if op == "NOT":
+        return QueryNot(query_from_dict(data.get("child")))
+    if "param" in data:
+        return QueryCondition(data.get("param"), data.get("cond"), data.get("value"))
+    raise ValueError(u"Consulta inválida: {!r}".format(data))
+
+
+def query_from_fields(p1, c1, v1, use_f2=False, p2=None, c2=None, v2=u"", use_and=True):
+    """Consulta equivalente aos campos da UI (uma ou duas condições)."""
+    first = QueryCondition(p1, c1, v1)
+    if not use_f2:
+        return first
+    return QueryGroup("AND" if use_and else "OR", [first, QueryCondition(p2, c2, v2)])
+
+
+def query_from_preset(preset):
+    """Árvore do preset: a chave "Query" ou, em presets antigos, Param1/Cond1/... ."""
+    if preset.get("Query"):
+        return query_from_dict(preset["Query"])
+    return query_from_fields(
+        preset.get("Param1"), preset.get("Cond1"), preset.get("Val1"),
+        preset.get("UseF2", False), preset.get("Param2"), preset.get("Cond2"),
+        preset.get("Val2"), preset.get("Logic", "AND") == "AND")
+
+
+def query_to_fields(query):
+    """Campos da UI (formato dos presets antigos) ou None se a consulta não cabe nela."""
+    if isinstance(query, QueryCondition):
+        return {"Param1": query.param, "Cond1": query.condition, "Val1": query.value,
+                "UseF2": False, "Logic": "AND"}
+    if (isinstance(query, QueryGroup) and len(query.children) == 2
+            and all(isinstance(c, QueryCondition) for c in query.children)):
+        c1, c2 = query.children
+        return {"Param1": c1.param, "Cond1": c1.condition, "Val1": c1.value,
+                "UseF2": True, "Param2": c2.param, "Cond2": c2.condition, "Val2": c2.value,
+                "Logic": query.op}
+    return None
+
+
+# Probabilidade aproximada de uma condição ser verdadeira (para ordenar o curto-circuito)
+_CONDITION_SELECTIVITY = {
+    u"Igual a": 0.1, u"Começa com": 0.2, u"Termina com": 0.2, u"Contém": 0.3,
+    u"Corresponde ao Padrão": 0.3, u"Em branco": 0.3, u"Maior que": 0.5, u"Menor que": 0.5,
+    u"Maior ou igual": 0.5, u"Menor ou igual": 0.5, u"Não em branco": 0.7,
+    u"Diferente de": 0.8, u"Não Contém": 0.8,
+}
+
+# Custo relativo por elemento de cada tipo de predicado
+COST_NATIVE = 1        # ElementFilter.PassesFilter
+COST_TYPE = 2          # parâmetro de tipo, avaliado uma vez por tipo
+COST_INSTANCE = 4      # LookupParameter + comparação em Python
+COST_GEOMETRY = 10     # Location / BoundingBox (Elevação Z)
+COST_PATTERN = 2       # extra da regex de "Corresponde ao Padrão"
+
+
+class _Plan(object):
+    __slots__ = ("cost", "p_true", "fn")
+
+    def __init__(self, cost, p_true, fn):
+        self.cost = cost
+        self.p_true = min(max(p_true, 0.01), 0.99)
+        self.fn = fn
+
+
+def _and_plan(plans):
+    # Primeiro os baratos que mais reprovam: custo / P(falso)
+    plans = sorted(plans, key=lambda pl: pl.cost / (1.0 - pl.p_true))
+
+    def fn(el):
+        for pl in plans:
+            if not pl.fn(el):
+                return False
+        return True
+    p_true = 1.0
+    for pl in plans:
+        p_true *= pl.p_true
+    return _Plan(sum(pl.cost for pl in plans), p_true, fn)
+
+
+def _or_plan(plans):
+    # Primeiro os baratos que mais aprovam: custo / P(verdadeiro)
+    plans = sorted(plans, key=lambda pl: pl.cost / pl.p_true)
+
+    def fn(el):
+        for pl in plans:
+            if pl.fn(el):
+                return True
+        return False
+    p_false = 1.0
+    for pl in plans:
+        p_false *= 1.0 - pl.p_true
+    return _Plan(sum(pl.cost for pl in plans), 1.0 - p_false, fn)
+
+
+class QueryEvaluator(object):
+    """
+    Executa uma consulta sobre os elementos de um documento.
+
+    prepare(amostra) compila o que dá em filtro nativo e devolve o filtro para o
+    coletor; o resto vira um plano em Python ordenado por custo/seletividade
+    (nativo via PassesFilter, parâmetro de tipo em cache, parâmetro de instância,
+    geometria) com curto-circuito. evaluate(el) roda esse plano.
+
+        ev = QueryEvaluator(query, avaliar_condicao)
+        f = ev.prepare(amostra)
+        col = col.WherePasses(f) if f else col
+        [el for el in col if ev.evaluate(el)]
+
+    leaf_fn(el, param, condição, valor) é a comparação elemento a elemento.
+    """
+
+    def __init__(self, query, leaf_fn):
+        self.query = query
+        self.leaf_fn = leaf_fn
+        self.native_count = 0
+        self._native = True
+        self._plan = None
+
+    def prepare(self, sample, pushdown=True, native=True):
+        """
+        Filtro nativo para o coletor (None se nada compilou ou pushdown=False).
+        native=False deixa tudo em Python (elementos de documentos diferentes).
+        """
+        self.native_count = 0
+        self._native = native
+        query = self.query
+        if pushdown and isinstance(query, QueryGroup) and query.op == "AND":
+            built = [self._build(c, sample) for c in query.children]
+            pushed = [f for f, _ in built if f is not None]
+            rest = [pl for f, pl in built if f is None]
+            self._plan = _and_plan(rest) if rest else None
+            return combine_filters(pushed, True)
+
+        native, plan = self._build(query, sample)
+        if pushdown and native is not None:
+            self._plan = None
+            return native
+        self._plan = plan
+        return None
+
+    def evaluate(self, el):
+        if self._plan is None:
+            return True
+        try:
+            return bool(self._plan.fn(el))
+        except:
+            return False
+
+    # -- montagem -------------------------------------------------------------
+
+    def _build(self, node, sample):
+        """(filtro nativo equivalente ao nó ou None, plano Python do nó)"""
+        if isinstance(node, QueryCondition):
+            native = None
+            if self._native:
+                native = compile_condition(sample, node.param, node.condition, node.value)
+            p_true = _CONDITION_SELECTIVITY.get(node.condition, 0.5)
+            if native is not None:
+                self.native_count += 1
+                return native, _Plan(COST_NATIVE, p_true, native.PassesFilter)
+            return None, self._leaf_plan(node, sample, p_true)
+
+        if isinstance(node, QueryNot):
+            _, plan = self._build(node.child, sample)
+            return None, _Plan(plan.cost, 1.0 - plan.p_true, lambda el: not plan.fn(el))
+
+        built = [self._build(c, sample) for c in node.children]
+        use_and = node.op == "AND"
+        native = None
+        if all(f is not None for f, _ in built):
+            native = combine_filters([f for f, _ in built], use_and)
+        plans = [pl for _, pl in built]
+        return native, (_and_plan(plans) if use_and else _or_plan(plans))
+
+    def _leaf_plan(self, node, sample, p_true):
+        leaf_fn = self.leaf_fn
+        param, condition, value = node.param, node.condition, node.value
+
+        def direct(el):
+            return leaf_fn(el, param, condition, value)
+
+        extra = COST_PATTERN if condition == u"Corresponde ao Padrão" else 0
+        if param == u"[VIRTUAL] Elevação Z (m)":
+            return _Plan(COST_GEOMETRY + extra, p_true, direct)
+        if param.startswith(u"[VIRTUAL]") or parameter_location(sample, param) != "type":
+            return _Plan(COST_INSTANCE + extra, p_true, direct)
+
+        # Parâmetro de tipo: o resultado vale para todas as instâncias do tipo.
+        # A chave leva o documento: na seleção há elementos de vínculos, e o
+        # mesmo Id de tipo aponta para tipos diferentes em cada documento.
+        cache = {}
+
+        def by_type(el):
+            try:
+                type_int = get_id_value(el.GetTypeId())
+                el_doc = get_element_document(el)
+                key = (el_doc.PathName or el_doc.Title, type_int)
+            except:
+                type_int = key = None
+            if key is None or type_int is None or type_int < 0:
+                return direct(el)
+            result = cache.get(key)
+            if result is None:
+                result = cache[key] = bool(direct(el))
+            return result
+        return _Plan(COST_TYPE + extra, p_true, by_type)
+
+
 class FiltroAvancadoWindow(_WPFWindowCPy):
     def __init__(self):
         try:
@@ -486,6 +944,9 @@ class FiltroAvancadoWindow(_WPFWindowCPy):
             # Cache de parâmetros para evitar recalcular
             self._parametros_cache = {}
             
+            # Consulta de preset/histórico com mais condições do que a tela mostra
+            self._query_avancada = None
+            
             # Configurações iniciais
             self.categoria_opcoes = {
                 u"Conduítes e Curvas": {
@@ -655,6 +1116,18 @@ class FiltroAvancadoWindow(_WPFWindowCPy):
             self.Button_AplicarFiltro.Click += self.aplicar_filtro_click
             self.Button_Fechar.Click += self.fechar_click
             
+            # Editar qualquer condição descarta a consulta avançada carregada
+            try:
+                for combo in (self.ComboBox_Parametro1, self.ComboBox_Condicao1,
+                              self.ComboBox_Parametro2, self.ComboBox_Condicao2):
+                    combo.SelectionChanged += self.consulta_editada
+                for txt in (self.TextBox_Valor1, self.TextBox_Valor2):
+                    txt.TextChanged += self.consulta_editada
+                for chk in (self.CheckBox_UsarSegundoFiltro, self.Radio_And, self.Radio_Or):
+                    chk.Checked += self.consulta_editada
+                    chk.Unchecked += self.consulta_editada
+            except: pass
+            
             # --- Sets de Filtros ---
             self.ComboBox_FiltrosSalvos.SelectionChanged += self.preset_selecionado
             self.Button_SalvarFiltro.Click += self.salvar_preset_click
@@ -784,29 +1257,15 @@ class FiltroAvancadoWindow(_WPFWindowCPy):
         return expanded
     
     def get_available_parameters(self, elements):
-        """Coleta parâmetros de instância E de tipo - OTIMIZADO"""
+        """Parâmetros de instância E de tipo, pelo esquema em cache de cada (categoria, tipo)"""
+        # Seleção pode misturar hospedeiro e vínculos: um esquema por documento
+        por_doc = {}
+        for el in elements:
+            el_doc = get_element_document(el)
+            por_doc.setdefault(el_doc.PathName or el_doc.Title, (el_doc, []))[1].append(el)
         param_set = set()
-        
-        # ⚡ OTIMIZAÇÃO: Reduzir amostra para 20 elementos (mais rápido)
-        amostra = elements[:20] if len(elements) > 20 else elements
-        
-        for el in amostra:
-            # Parâmetros de Instância
-            for param in el.Parameters:
-                if param.Definition:
-                    param_set.add(param.Definition.Name)
-            
-            # Parâmetros de Tipo
-            try:
-                type_id = el.GetTypeId()
-                if type_id != ElementId.InvalidElementId:
-                    type_elem = get_element_document(el).GetElement(type_id)
-                    if type_elem:
-                        for param in type_elem.Parameters:
-                            if param.Definition:
-                                param_set.add(param.Definition.Name)
-            except:
-                pass
+        for el_doc, doc_elements in por_doc.values():
+            param_set.update(get_schema_cache(el_doc).names(doc_elements))
 
         # Injetar Parâmetros Virtuais no topo da lista (ordenados via colchetes)
         param_set.add(u"[VIRTUAL] Elevação Z (m)")
@@ -1071,11 +1530,36 @@ class FiltroAvancadoWindow(_WPFWindowCPy):
         except:
             return ""
     
+    def consulta_editada(self, sender, args):
+        if self._query_avancada is not None:
+            self._query_avancada = None
+            self.atualizar_status(u"Consulta avançada descartada: usando as condições da tela.")
+
+    def _definir_consulta_avancada(self, consulta):
+        self._query_avancada = consulta
+        self.atualizar_status(u"Consulta avançada ({} condições): {}".format(consulta.count(), consulta.describe()))
+
+    def _consulta_atual(self):
+        """Consulta avançada carregada, ou a montada a partir dos campos da tela."""
+        if self._query_avancada is not None:
+            return self._query_avancada
+        return query_from_fields(
+            self._combo_text(self.ComboBox_Parametro1),
+            self._combo_text(self.ComboBox_Condicao1),
+            self.TextBox_Valor1.Text,
+            bool(self.CheckBox_UsarSegundoFiltro.IsChecked),
+            self._combo_text(self.ComboBox_Parametro2),
+            self._combo_text(self.ComboBox_Condicao2),
+            self.TextBox_Valor2.Text,
+            bool(self.Radio_And.IsChecked))
+
     def validar_campos(self):
         try:
             if not self._combo_text(self.ComboBox_Categoria):
                 forms.alert("Selecione uma categoria.")
                 return False
+            if self._query_avancada is not None:
+                return True
             if not self._combo_text(self.ComboBox_Parametro1):
                 forms.alert("Selecione o parâmetro 1.")
                 return False
@@ -1128,7 +1612,22 @@ class FiltroAvancadoWindow(_WPFWindowCPy):
             ids_selecionados = []
             self.atualizar_status(u"Processando elementos...")
             
+            consulta = self._consulta_atual()
+
+            def avaliar_condicao(el, p_nome, cond, valor):
+                param = self.find_parameter(el, p_nome)
+                if param is None:
+                    return False
+                # Se foi Virtual Parameter, ele volta como STRING do find_parameter()
+                if isinstance(param, str):
+                    # Rotear para Text Compare diretamente sem passar pelo tratador de Double do Parameter
+                    return self.check_condition(param, cond, valor)
+                return smart_parameter_compare(param, cond, valor, self.check_condition)
+
+            avaliador = QueryEvaluator(consulta, avaliar_condicao)
+
             def avaliar(el):
+                """Exclusões da categoria + o que não virou filtro nativo no coletor."""
                 try:
                     
                     # Logica Avancada de Exclusao (Parametros Reais)
@@ -1167,26 +1666,7 @@ class FiltroAvancadoWindow(_WPFWindowCPy):
                                 if "caixa" in nome or "condulete" in nome:
                                     return False
 
-                    res1 = False
-                    param1 = self.find_parameter(el, p1_nome)
-                    # Se foi Virtual Parameter, ele volta como STRING do find_parameter()
-                    if param1 is not None:
-                        if isinstance(param1, str):
-                             # Rotear para Text Compare diretamente sem passar pelo tratador de Double do Parameter
-                             res1 = self.check_condition(param1, c1, v1)
-                        else:
-                             res1 = smart_parameter_compare(param1, c1, v1, self.check_condition)
-
-                    res2 = False
-                    if usar_f2:
-                        param2 = self.find_parameter(el, p2_nome)
-                        if param2 is not None:
-                            if isinstance(param2, str):
-                                 res2 = self.check_condition(param2, c2, v2)
-                            else:
-                                 res2 = smart_parameter_compare(param2, c2, v2, self.check_condition)
-                    
-                    return res1 if not usar_f2 else ((res1 and res2) if operador_e else (res1 or res2))
+                    return avaliador.evaluate(el)
                 except Exception as eval_err:
                     return False
             
@@ -1202,6 +1682,13 @@ class FiltroAvancadoWindow(_WPFWindowCPy):
                         pass
                 if incluir_aninhadas:
                     pool = self.expand_nested_families(pool)
+                # Seleção pode misturar hospedeiro e vínculos: Ids de parâmetro só valem num documento
+                docs_pool = set()
+                for el in pool:
+                    el_doc = get_element_document(el)
+                    docs_pool.add(el_doc.PathName or el_doc.Title)
+                passo = max(1, len(pool) // NATIVE_SAMPLE_SIZE)
+                avaliador.prepare(pool[::passo], pushdown=False, native=len(docs_pool) <= 1)
                 for el in pool:
                     if avaliar(el):
                         ids_selecionados.append(el.Id)
@@ -1237,19 +1724,29 @@ class FiltroAvancadoWindow(_WPFWindowCPy):
                     requires_param_absent = config.get("requires_param_absent") if config else None
                 
                 t_doc = getattr(self, '_target_doc', doc)
-                for cat in todas_categorias_analisar:
-                    if usar_vista_atual and t_doc.Equals(doc) and not t_doc.IsFamilyDocument:
+                usa_vista = usar_vista_atual and t_doc.Equals(doc) and not t_doc.IsFamilyDocument
+
+                def coletor(cat):
+                    if usa_vista:
                         col = FilteredElementCollector(t_doc, revit.active_view.Id)
                     else:
                         col = FilteredElementCollector(t_doc)
-                    
                     if isinstance(cat, BuiltInCategory):
-                        col = col.OfCategory(cat).WhereElementIsNotElementType()
-                    else:
-                        if isinstance(cat, int):
-                            cat = ElementId(cat)
-                        col = col.OfCategoryId(cat).WhereElementIsNotElementType()
-                    
+                        return col.OfCategory(cat).WhereElementIsNotElementType()
+                    if isinstance(cat, int):
+                        cat = ElementId(cat)
+                    return col.OfCategoryId(cat).WhereElementIsNotElementType()
+
+                n_nativas = 0
+                for cat in todas_categorias_analisar:
+                    col = coletor(cat)
+                    if not incluir_aninhadas:
+                        # Condições compiladas rodam dentro do Revit; o Python só vê quem passou
+                        nativo = avaliador.prepare(self._amostra_coletor(coletor(cat)))
+                        if nativo is not None:
+                            col = col.WherePasses(nativo)
+                        n_nativas = max(n_nativas, avaliador.native_count)
+
                     pool = []
                     for el in col:
                         try:
@@ -1275,10 +1772,17 @@ class FiltroAvancadoWindow(_WPFWindowCPy):
                     
                     if incluir_aninhadas:
                         pool = self.expand_nested_families(pool)
+                        # Sub-componentes não estão no coletor: filtro nativo via PassesFilter
+                        passo = max(1, len(pool) // NATIVE_SAMPLE_SIZE)
+                        avaliador.prepare(pool[::passo], pushdown=False)
+                        n_nativas = max(n_nativas, avaliador.native_count)
                     
                     for el in pool:
                         if avaliar(el):
                             ids_selecionados.append(el.Id)
+
+                if n_nativas:
+                    logger.debug("Filtro nativo: {} de {} condições".format(n_nativas, consulta.count()))
             
             # --- SELEÇÃO FINAL ---
             # pool elements are collected as ElementId in ids_selecionados.
@@ -1310,14 +1814,13 @@ class FiltroAvancadoWindow(_WPFWindowCPy):
                 p1_name_history = str(p1_nome) if p1_nome else str(self.ComboBox_Parametro1.Text)
                 p2_name_history = str(p2_nome) if p2_nome else (str(self.ComboBox_Parametro2.Text) if usar_f2 else "")
 
-                desc = "{} {} {}".format(p1_name_history, c1, v1)
-                if usar_f2:
-                    desc += " ({} {} {} {})".format("E" if operador_e else "OU", p2_name_history, c2, v2)
+                desc = consulta.describe()
 
                 state = {
                     'p1': p1_name_history, 'c1': str(c1) if c1 else "", 'v1': str(v1),
                     'usar_f2': usar_f2, 'p2': p2_name_history, 'c2': str(c2) if c2 else "", 'v2': str(v2),
                     'op_e': operador_e,
+                    'query': consulta.to_dict(),
                     'target_link_id': get_id_value(target_link_instance.Id) if target_link_instance else None
                 }
                 
@@ -1339,6 +1842,14 @@ class FiltroAvancadoWindow(_WPFWindowCPy):
 
 
 
+    def _amostra_coletor(self, col):
+        """Primeiros elementos do coletor, para resolver os parâmetros do filtro nativo."""
+        amostra = []
+        iterator = col.GetElementIterator()
+        while len(amostra) < NATIVE_SAMPLE_SIZE and iterator.MoveNext():
+            amostra.append(iterator.Current)
+        return amostra
+
     def fechar_click(self, sender, args):
         """⚡ OTIMIZADO: Limpar cache ao fechar"""
         try:
@@ -1404,7 +1915,8 @@ class FiltroAvancadoWindow(_WPFWindowCPy):
                 "Cond2": str(self.ComboBox_Condicao2.SelectedItem.Content) if self.ComboBox_Condicao2.SelectedItem else "",
                 "Val2": str(self.TextBox_Valor2.Text) if getattr(self.TextBox_Valor2, "Text", None) else "",
                 
-                "Logic": "AND" if self.Radio_And.IsChecked else "OR"
+                "Logic": "AND" if self.Radio_And.IsChecked else "OR",
+                "Query": self._consulta_atual().to_dict()
             }
             
             # Salva
@@ -1439,6 +1951,18 @@ class FiltroAvancadoWindow(_WPFWindowCPy):
         preset = data.get("Presets", {}).get(sel)
         if not preset: return
         
+        self._query_avancada = None
+        try:
+            consulta = query_from_preset(preset)
+        except ValueError as e:
+            logger.error("Consulta do preset inválida: " + str(e))
+            consulta = None
+        # Consulta que cabe na tela preenche os campos; a maior é aplicada inteira
+        campos = query_to_fields(consulta) if consulta is not None else None
+        if campos:
+            preset = dict(preset)
+            preset.update(campos)
+        
         # Aplicar Preset
         try:
             # 1. Categoria
@@ -1505,6 +2029,9 @@ class FiltroAvancadoWindow(_WPFWindowCPy):
             
             if preset.get("Logic") == "AND": self.Radio_And.IsChecked = True
             else: self.Radio_Or.IsChecked = True
+            
+            if consulta is not None and campos is None:
+                self._definir_consulta_avancada(consulta)
                 
         except Exception as e:
             logger.error("Erro ao aplicar preset: " + str(e))
@@ -1703,6 +2230,14 @@ class FiltroAvancadoWindow(_WPFWindowCPy):
                     else: self.Radio_Or.IsChecked = True
 
                     self.atualizar_status(u"Histórico carregado: {} elementos.".format(len(valid_ids)))
+                    
+                    if state.get('query'):
+                        try:
+                            consulta = query_from_dict(state['query'])
+                            if query_to_fields(consulta) is None:
+                                self._definir_consulta_avancada(consulta)
+                        except ValueError:
+                            pass
                 else:
                     self.atualizar_status(u"Histórico antigo: Seleção restaurada.")
         except Exception as e:
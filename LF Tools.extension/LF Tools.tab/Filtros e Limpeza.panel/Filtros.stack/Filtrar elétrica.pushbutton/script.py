@@ -6,6 +6,7 @@ from System.Collections.Generic import List
 import sys
 import os
 from datetime import datetime
+from lf_revit import get_electrical_network
 
 doc = revit.doc
 uidoc = revit.uidoc
@@ -40,24 +41,10 @@ def processar_painel(painel, dispositivos):
         pn = painel.LookupParameter("Panel Name")
         painel_nome = pn.AsString() if pn else painel.Name
         
-        # Coletar TODOS os circuitos para ESTE painel
-        todos_circuitos = DB.FilteredElementCollector(doc)\
-            .OfCategory(DB.BuiltInCategory.OST_ElectricalCircuit)\
-            .WhereElementIsNotElementType()\
-            .ToElements()
-        
-        circuitos_derivados = []
-        circuito_alimentador = None
-        
-        for c in todos_circuitos:
-            param = c.get_Parameter(DB.BuiltInParameter.RBS_ELEC_CIRCUIT_PANEL_PARAM)
-            if param:
-                nome = param.AsString()
-                if nome and nome.upper().strip() == painel_nome.upper().strip():
-                    circuitos_derivados.append(c)
-            
-            if c.BaseEquipment and c.BaseEquipment.Id == painel.Id:
-                circuito_alimentador = c
+        # Circuitos derivados deste painel e o circuito que o alimenta (grafo da rede)
+        rede = get_electrical_network(doc)
+        circuitos_derivados = rede.circuits_from(painel)
+        circuito_alimentador = rede.feeder_of(painel)
         
         # Coletar dispositivos, conduítes e conexões
         elementos_do_sistema = set()
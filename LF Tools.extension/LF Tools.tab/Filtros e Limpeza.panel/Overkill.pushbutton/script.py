@@ -7,6 +7,7 @@ from Autodesk.Revit.DB import (
     LinePatternElement, View, GraphicsStyleType,
 )
 import System
+import math
 
 from pyrevit import revit, forms, script
 
@@ -47,12 +48,24 @@ class CleanupItem(object):
 
 # ====== Funções geométricas (detecção de sobrepostos) ======
 
-def _quantize(val_ft, step_mm):
-    return int(round((val_ft * MM_PER_FT) / float(step_mm)))
+# Direções com diferença menor que isso (rad) entram no mesmo grupo de colineares
+COLLINEAR_ANGLE_TOL = 1e-3
 
 
-def _qxyz(pt, step_mm):
-    return (_quantize(pt.X, step_mm), _quantize(pt.Y, step_mm), _quantize(pt.Z, step_mm))
+def _pt_mm(pt):
+    return (pt.X * MM_PER_FT, pt.Y * MM_PER_FT, pt.Z * MM_PER_FT)
+
+
+def _dist(a, b):
+    return math.sqrt((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2)
+
+
+def _dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def _sub(a, b):
+    return (a[0] - b[0], a[1] - b[1], a[2] - b[2])
 
 
 def _safe_level_id(el):
@@ -72,33 +85,270 @@ def _safe_level_id(el):
     return -1
 
 
-def _location_signature(el, step_curve, step_point):
+class GeometryRecord(object):
+    """
+    Geometria de um elemento para a busca de sobrepostos (coordenadas em mm).
+    kind: TEXT, LINE, ARC, POINT ou BBOX. anchor é o ponto indexado no hash
+    espacial (ponto médio para curvas, então linhas/arcos invertidos coincidem).
+    """
+    __slots__ = ('el_int', 'group', 'cat_name', 'kind', 'anchor', 'pts', 'radius', 'text', 'tol')
+
+    def __init__(self, el_int, group, cat_name, kind, anchor, pts, tol, radius=0.0, text=None):
+        self.el_int   = el_int
+        self.group    = group      # (categoria, tipo, nível)
+        self.cat_name = cat_name
+        self.kind     = kind
+        self.anchor   = anchor
+        self.pts      = pts
+        self.tol      = tol
+        self.radius   = radius
+        self.text     = text
+
+
+def _element_geometry(el, tol_curve, tol_point):
+    """GeometryRecord do elemento, ou None se não houver geometria utilizável."""
     try:
+        cat = el.Category
+        cat_id = cat.Id.IntegerValue if cat else -1
+        cat_name = cat.Name if cat else "Desconhecido"
+        type_id = el.GetTypeId().IntegerValue if el.GetTypeId() else -1
+        group = (cat_id, type_id, _safe_level_id(el))
+        el_int = el.Id.IntegerValue
+
         if isinstance(el, TextNote):
-            return ("TEXT", _qxyz(el.Coord, step_point), el.Text.strip())
+            coord = _pt_mm(el.Coord)
+            return GeometryRecord(el_int, group, cat_name, "TEXT", coord, (coord,),
+                                  tol_point, text=el.Text.strip())
 
         loc = el.Location
         if isinstance(loc, LocationCurve):
             c = loc.Curve
             if isinstance(c, Line):
-                p1 = _qxyz(c.GetEndPoint(0), step_curve)
-                p2 = _qxyz(c.GetEndPoint(1), step_curve)
-                return ("LINE", tuple(sorted((p1, p2))))
+                p1 = _pt_mm(c.GetEndPoint(0))
+                p2 = _pt_mm(c.GetEndPoint(1))
+                mid = ((p1[0] + p2[0]) * 0.5, (p1[1] + p2[1]) * 0.5, (p1[2] + p2[2]) * 0.5)
+                return GeometryRecord(el_int, group, cat_name, "LINE", mid, (p1, p2), tol_curve)
             if isinstance(c, Arc):
-                return ("ARC", _qxyz(c.Center, step_curve), _quantize(c.Radius, step_curve))
+                p1 = _pt_mm(c.GetEndPoint(0))
+                p2 = _pt_mm(c.GetEndPoint(1))
+                mid = _pt_mm(c.Evaluate(0.5, True))
+                center = _pt_mm(c.Center)
+                return GeometryRecord(el_int, group, cat_name, "ARC", mid, (p1, p2, center),
+                                      tol_curve, radius=c.Radius * MM_PER_FT)
 
         if isinstance(el, FamilyInstance) and isinstance(loc, LocationPoint):
-            return ("POINT", _qxyz(loc.Point, step_point))
+            pt = _pt_mm(loc.Point)
+            return GeometryRecord(el_int, group, cat_name, "POINT", pt, (pt,), tol_point)
 
         bb = el.get_BoundingBox(None)
         if bb:
-            center = (bb.Min + bb.Max) * 0.5
-            return ("BBOX", _qxyz(center, step_point))
+            center = _pt_mm((bb.Min + bb.Max) * 0.5)
+            return GeometryRecord(el_int, group, cat_name, "BBOX", center, (center,), tol_point)
     except Exception:
         pass
     return None
 
 
+def _same_geometry(a, b):
+    """a e b (mesmo grupo e tipo de geometria) coincidem dentro da tolerância?"""
+    tol = a.tol
+    if _dist(a.anchor, b.anchor) > tol:
+        return False
+    if a.kind == "TEXT":
+        return a.text == b.text
+    if a.kind in ("LINE", "ARC"):
+        a1, a2 = a.pts[0], a.pts[1]
+        b1, b2 = b.pts[0], b.pts[1]
+        ends = ((_dist(a1, b1) <= tol and _dist(a2, b2) <= tol) or
+                (_dist(a1, b2) <= tol and _dist(a2, b1) <= tol))
+        if not ends:
+            return False
+        if a.kind == "ARC":
+            return abs(a.radius - b.radius) <= tol and _dist(a.pts[2], b.pts[2]) <= tol
+    return True
+
+
+def find_duplicate_groups(records):
+    """
+    Agrupa registros coincidentes com um hash espacial: células do tamanho da
+    tolerância, cada âncora comparada só com as 27 células vizinhas (sem o problema
+    de fronteira do arredondamento). Retorna listas de índices com 2+ elementos.
+
+    Cada registro é comparado com o representante do grupo (o de menor ElementId,
+    que é o mantido), não encadeado: A≈B e B≈C não juntam A e C se eles estão
+    além da tolerância um do outro.
+    """
+    grid = {}
+    cells = []
+    for i, rec in enumerate(records):
+        size = max(rec.tol, 1e-6)
+        cell = (int(math.floor(rec.anchor[0] / size)),
+                int(math.floor(rec.anchor[1] / size)),
+                int(math.floor(rec.anchor[2] / size)))
+        cells.append(cell)
+        grid.setdefault((rec.group, rec.kind, cell), []).append(i)
+
+    assigned = set()
+    groups = []
+    offsets = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)]
+    for i in sorted(range(len(records)), key=lambda k: records[k].el_int):
+        if i in assigned:
+            continue
+        rec = records[i]
+        group = [i]
+        cx, cy, cz = cells[i]
+        for dx, dy, dz in offsets:
+            for j in grid.get((rec.group, rec.kind, (cx + dx, cy + dy, cz + dz)), ()):
+                if j == i or j in assigned or not _same_geometry(rec, records[j]):
+                    continue
+                group.append(j)
+        if len(group) > 1:
+            assigned.update(group)
+            groups.append(group)
+    return groups
+
+
+def _chain_clusters(items, key, tol):
+    """Ordena por key e corta onde dois vizinhos consecutivos distam mais que tol."""
+    items = sorted(items, key=key)
+    clusters = []
+    current = []
+    last = None
+    for it in items:
+        k = key(it)
+        if current and k - last > tol:
+            clusters.append(current)
+            current = []
+        current.append(it)
+        last = k
+    if current:
+        clusters.append(current)
+    return clusters
+
+
+def _line_direction(rec):
+    """Direção unitária canônica (x > 0, ou y > 0, ou z > 0) e comprimento.
+
+    Componentes abaixo de COLLINEAR_ANGLE_TOL contam como zero: uma reta quase
+    vertical com x minúsculo de sinal trocado não vai para a outra ponta do azimute.
+    """
+    v = _sub(rec.pts[1], rec.pts[0])
+    length = math.sqrt(_dot(v, v))
+    if length <= 0:
+        return None, 0.0
+    d = (v[0] / length, v[1] / length, v[2] / length)
+    eps = COLLINEAR_ANGLE_TOL
+    if d[0] < -eps or (abs(d[0]) <= eps and (d[1] < -eps or (abs(d[1]) <= eps and d[2] < 0))):
+        d = (-d[0], -d[1], -d[2])
+    return d, length
+
+
+def _perpendicular_basis(r):
+    helper = (0.0, 0.0, 1.0) if abs(r[2]) < 0.9 else (1.0, 0.0, 0.0)
+    u = (r[1] * helper[2] - r[2] * helper[1],
+         r[2] * helper[0] - r[0] * helper[2],
+         r[0] * helper[1] - r[1] * helper[0])
+    n = math.sqrt(_dot(u, u))
+    u = (u[0] / n, u[1] / n, u[2] / n)
+    w = (r[1] * u[2] - r[2] * u[1], r[2] * u[0] - r[0] * u[2], r[0] * u[1] - r[1] * u[0])
+    return u, w
+
+
+def find_collinear_overlaps(records, tol):
+    """
+    Segmentos de reta colineares que se sobrepõem ou um contém o outro, por
+    (categoria, tipo, nível). Agrupa por direção e depois por deslocamento
+    perpendicular (ordenações + cortes em cadeia) e varre os intervalos projetados
+    na direção da reta: O(n log n) mais os pares que de fato se sobrepõem.
+    Retorna [(i, j, relação, sobreposição_mm)] com relação 'contido' (i dentro de j)
+    ou 'parcial'. Pares que coincidem nas duas pontas ficam de fora (são duplicados).
+    """
+    by_group = {}
+    for i, rec in enumerate(records):
+        if rec.kind != "LINE":
+            continue
+        d, length = _line_direction(rec)
+        if d is None or length <= tol:
+            continue
+        az = math.atan2(d[1], d[0])
+        el = math.asin(max(-1.0, min(1.0, d[2])))
+        by_group.setdefault(rec.group, []).append((i, d, az, el))
+
+    results = []
+    for lines in by_group.values():
+        if len(lines) < 2:
+            continue
+        for az_cluster in _chain_clusters(lines, lambda t: t[2], COLLINEAR_ANGLE_TOL):
+            for dir_cluster in _chain_clusters(az_cluster, lambda t: t[3], COLLINEAR_ANGLE_TOL):
+                if len(dir_cluster) > 1:
+                    _sweep_direction_cluster(records, dir_cluster, tol, results)
+    return results
+
+
+def _sweep_direction_cluster(records, cluster, tol, results):
+    r = cluster[0][1]
+    u, w = _perpendicular_basis(r)
+    origin = records[cluster[0][0]].pts[0]
+    placed = []
+    max_len = 0.0
+    for i, d, _az, _el in cluster:
+        p1, p2 = records[i].pts[0], records[i].pts[1]
+        mid = _sub(records[i].anchor, origin)
+        t1 = _dot(_sub(p1, origin), r)
+        t2 = _dot(_sub(p2, origin), r)
+        placed.append((i, _dot(mid, u), _dot(mid, w), min(t1, t2), max(t1, t2)))
+        max_len = max(max_len, abs(t2 - t1))
+
+    # Com direções levemente diferentes, o deslocamento medido no ponto médio varia
+    # até (distância entre os médios) x (abertura angular do grupo)
+    spread = (max(t[2] for t in cluster) - min(t[2] for t in cluster) +
+              max(t[3] for t in cluster) - min(t[3] for t in cluster))
+    offset_tol = tol + max_len * spread
+
+    for u_cluster in _chain_clusters(placed, lambda t: t[1], offset_tol):
+        for line_cluster in _chain_clusters(u_cluster, lambda t: t[2], offset_tol):
+            if len(line_cluster) < 2:
+                continue
+            # Varredura: intervalos ordenados pelo início; ativos = os que ainda não terminaram
+            active = []
+            for cur in sorted(line_cluster, key=lambda t: t[3]):
+                active = [a for a in active if a[4] - cur[3] > tol]
+                for a in active:
+                    rel = _collinear_relation(records[a[0]], records[cur[0]], tol)
+                    if rel:
+                        results.append(rel)
+                active.append(cur)
+
+
+def _distance_to_line(pt, origin, d):
+    v = _sub(pt, origin)
+    t = _dot(v, d)
+    return math.sqrt(max(0.0, _dot(v, v) - t * t))
+
+
+def _collinear_relation(a, b, tol):
+    """(i, j, relação, mm) para dois segmentos de reta, ou None se não colineares/sobrepostos."""
+    da, la = _line_direction(a)
+    if da is None:
+        return None
+    if (_distance_to_line(b.pts[0], a.pts[0], da) > tol or
+            _distance_to_line(b.pts[1], a.pts[0], da) > tol):
+        return None
+    if _same_geometry(a, b):
+        return None
+
+    ta = sorted((_dot(_sub(a.pts[0], a.pts[0]), da), _dot(_sub(a.pts[1], a.pts[0]), da)))
+    tb = sorted((_dot(_sub(b.pts[0], a.pts[0]), da), _dot(_sub(b.pts[1], a.pts[0]), da)))
+    overlap = min(ta[1], tb[1]) - max(ta[0], tb[0])
+    if overlap <= tol:
+        return None
+    if tb[0] >= ta[0] - tol and tb[1] <= ta[1] + tol:
+        return (b.el_int, a.el_int, "contido", overlap)
+    if ta[0] >= tb[0] - tol and ta[1] <= tb[1] + tol:
+        return (a.el_int, b.el_int, "contido", overlap)
+    return (max(a.el_int, b.el_int), min(a.el_int, b.el_int), "parcial", overlap)
+
+
 def _element_description(el):
     try:
         if isinstance(el, TextNote):
@@ -126,60 +376,352 @@ def _element_description(el):
         return "El. {}".format(el.Id.IntegerValue)
 
 
-# ====== Funções de análise por operação ======
+# ====== Censo do modelo (uma passada para todas as análises) ======
+
+def _all_elements(doc):
+    """Todos os elementos (instâncias e tipos). Um FilteredElementCollector sem
+    filtro não pode ser iterado, daí o OR de ElementIsElementTypeFilter."""
+    from Autodesk.Revit.DB import ElementIsElementTypeFilter, LogicalOrFilter
+    return FilteredElementCollector(doc).WherePasses(LogicalOrFilter(
+        ElementIsElementTypeFilter(False), ElementIsElementTypeFilter(True)))
 
-def find_duplicate_elements(doc, selected_bics, is_active_view, tol_curve, tol_point):
-    items = []
-    elements = []
-    for bic in selected_bics:
-        col = (FilteredElementCollector(doc, doc.ActiveView.Id)
-               if is_active_view
-               else FilteredElementCollector(doc))
-        elements.extend(list(col.OfCategory(bic).WhereElementIsNotElementType()))
 
-    seen = {}
-    for el in elements:
+class ModelCensus(object):
+    """
+    Percorre o documento uma única vez e separa os elementos por classe e por
+    categoria, montando no caminho os conjuntos de ids em uso (modelos de vista,
+    tipos de texto, filtros de vista). Todas as análises leem daqui em vez de
+    abrir o próprio coletor. update() reaplica só os elementos alterados.
+    """
+    def __init__(self, doc):
+        from Autodesk.Revit.DB import (
+            ParameterFilterElement, CADLinkType, IndependentTag, ElementType,
+        )
+        self._classes = [
+            ("view", View),
+            ("text_note", TextNote),
+            ("line_pattern", LinePatternElement),
+            ("view_filter", ParameterFilterElement),
+            ("cad_link_type", CADLinkType),
+            ("tag", IndependentTag),
+        ]
         try:
-            cat_id  = el.Category.Id.IntegerValue if el.Category else -1
-            cat_name = el.Category.Name if el.Category else "Desconhecido"
-            type_id = el.GetTypeId().IntegerValue if el.GetTypeId() else -1
-            lvl_id  = _safe_level_id(el)
-            sig     = _location_signature(el, tol_curve, tol_point)
-            if not sig:
-                continue
-            full_sig = (cat_id, type_id, lvl_id, sig)
-            if full_sig in seen:
-                existing_id = seen[full_sig]
-                # mantém o ID menor (elemento mais antigo); marca o mais novo como duplicado
-                if el.Id.IntegerValue > existing_id.IntegerValue:
-                    dup_id = el.Id
-                else:
-                    dup_id = existing_id
-                    seen[full_sig] = el.Id
-                dup_el = doc.GetElement(dup_id)
-                desc = _element_description(dup_el) if dup_el else "?"
-                items.append(CleanupItem(dup_id, "Sobreposto", cat_name, desc))
-            else:
-                seen[full_sig] = el.Id
+            from Autodesk.Revit.DB.Electrical import ElectricalLoadClassification, ElectricalSystem
+            self._classes.append(("load_classification", ElectricalLoadClassification))
+            self._classes.append(("circuit", ElectricalSystem))
+        except Exception:
+            pass  # Revit sem API elétrica
+        self._element_type = ElementType
+
+        # Classificação por tipo .NET: isinstance só uma vez por classe concreta
+        self._kind_of = {}
+        # el_int -> (elemento, classe, é tipo, categoria, ids usados: [(conjunto, id)])
+        self._entries = {}
+        for el in _all_elements(doc):
+            self._add(el)
+        self._rebuild()
+
+    def _add(self, el):
+        try:
+            el_int = el.Id.IntegerValue
+            net_type = el.GetType()
+            kind = self._kind_of.get(net_type)
+            if kind is None:
+                name = None
+                for cname, cls in self._classes:
+                    if isinstance(el, cls):
+                        name = cname
+                        break
+                kind = self._kind_of[net_type] = (name, isinstance(el, self._element_type))
+            name, is_type = kind
+
+            uses = []
+            if name == "view":
+                try:
+                    if not el.IsTemplate:
+                        tid = el.ViewTemplateId
+                        if tid and tid.IntegerValue > 0:
+                            uses.append(("template", tid.IntegerValue))
+                except Exception:
+                    pass
+                try:
+                    for fid in el.GetFilters():
+                        uses.append(("filter", fid.IntegerValue))
+                except Exception:
+                    pass
+            elif name == "text_note":
+                tid = el.GetTypeId()
+                if tid and tid.IntegerValue > 0:
+                    uses.append(("text_type", tid.IntegerValue))
+
+            cat = el.Category
+            cat_int = cat.Id.IntegerValue if cat is not None else None
+            self._entries[el_int] = (el, name, is_type, cat_int, uses)
         except Exception:
             pass
+
+    def _rebuild(self):
+        """Listas e conjuntos derivados das entradas (sem chamadas à API)."""
+        self.elements = []
+        self.element_ids = set(self._entries)
+        self.by_class = dict((name, []) for name, _ in self._classes)
+        used = {"template": set(), "text_type": set(), "filter": set()}
+        self._instances_by_cat = {}
+        self._types_by_cat = {}
+        for el, name, is_type, cat_int, uses in self._entries.values():
+            self.elements.append(el)
+            if name is not None:
+                self.by_class[name].append(el)
+            for key, ref in uses:
+                used[key].add(ref)
+            if cat_int is not None:
+                bucket = self._types_by_cat if is_type else self._instances_by_cat
+                bucket.setdefault(cat_int, []).append(el)
+        self.used_template_ids = used["template"]
+        self.used_text_type_ids = used["text_type"]
+        self.used_filter_ids = used["filter"]
+
+    def update(self, doc, changed_ids, deleted_ids):
+        """Reaplica os ids (int) adicionados/modificados e remove os excluídos."""
+        for el_int in deleted_ids:
+            self._entries.pop(el_int, None)
+        for el_int in changed_ids:
+            el = doc.GetElement(ElementId(el_int))
+            if el is None:
+                self._entries.pop(el_int, None)
+            else:
+                self._add(el)
+        self._rebuild()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def of_class(self, name):
+        return self.by_class.get(name, [])
+
+    def instances(self, bic):
+        """Instâncias (não tipos) da categoria, como OfCategory().WhereElementIsNotElementType()."""
+        return self._instances_by_cat.get(int(bic), [])
+
+    def types(self, bic):
+        return self._types_by_cat.get(int(bic), [])
+
+
+# ====== Cache da auditoria entre execuções ======
+
+# AppDomain: sobrevive entre execuções do botão (cada uma roda num engine novo)
+_KEY_AUDIT_CACHE = "LF_Overkill_AuditCache"
+_KEY_DOC_CHANGED = "LF_Overkill_DocChanged"
+_KEY_DOC_CLOSING = "LF_Overkill_DocClosing"
+
+# Acima disso (fração do modelo alterada) é mais barato refazer o censo inteiro
+_MAX_DIRTY_FRACTION = 0.3
+
+
+def _document_key(document):
+    try:
+        return document.PathName or document.Title
+    except Exception:
+        return ""
+
+
+class OverkillAuditCache(object):
+    """
+    Censo e registros geométricos de um documento, mantidos entre execuções.
+    O handler de DocumentChanged só anota ids sujos (mark); o trabalho de
+    atualização fica para a próxima análise (refresh).
+    """
+    def __init__(self):
+        self.census = None
+        self.records = {}        # el_int -> GeometryRecord ou None
+        self.tolerances = None   # (tol_curve, tol_point) com que records foi montado
+        self.dirty = set()
+        self.deleted = set()
+        self.overflow = False
+
+    def mark(self, added_ids, modified_ids, deleted_ids):
+        if self.overflow:
+            return
+        for eid in added_ids:
+            self.dirty.add(eid.IntegerValue)
+        for eid in modified_ids:
+            self.dirty.add(eid.IntegerValue)
+        for eid in deleted_ids:
+            self.deleted.add(eid.IntegerValue)
+        size = len(self.census) if self.census is not None else len(self.records)
+        if len(self.dirty) + len(self.deleted) > _MAX_DIRTY_FRACTION * max(size, 1):
+            self.overflow = True
+            self.dirty = set()
+            self.deleted = set()
+
+    def refresh(self, doc, build_census=True):
+        """
+        Aplica os ids sujos: descarta os registros geométricos deles e atualiza o
+        censo de forma incremental. Com build_census, monta o censo se ainda não
+        existir (ou se o modelo mudou demais desde a última análise).
+        """
+        dirty, deleted = self.dirty, self.deleted
+        self.dirty, self.deleted = set(), set()
+        if self.overflow:
+            self.overflow = False
+            self.records = {}
+            self.census = None
+        for el_int in dirty:
+            self.records.pop(el_int, None)
+        for el_int in deleted:
+            self.records.pop(el_int, None)
+
+        if self.census is not None:
+            if dirty or deleted:
+                self.census.update(doc, dirty, deleted)
+        elif build_census:
+            self.census = ModelCensus(doc)
+        return self.census
+
+    def geometry_records(self, tol_curve, tol_point):
+        """Cache de GeometryRecord por elemento, descartado se as tolerâncias mudarem."""
+        if self.tolerances != (tol_curve, tol_point):
+            self.records = {}
+            self.tolerances = (tol_curve, tol_point)
+        return self.records
+
+
+def _on_document_changed(sender, args):
+    try:
+        caches = System.AppDomain.CurrentDomain.GetData(_KEY_AUDIT_CACHE)
+        if not caches:
+            return
+        entry = caches.get(_document_key(args.GetDocument()))
+        if entry is not None:
+            entry.mark(args.GetAddedElementIds(), args.GetModifiedElementIds(),
+                       args.GetDeletedElementIds())
+    except Exception:
+        pass
+
+
+def _on_document_closing(sender, args):
+    try:
+        caches = System.AppDomain.CurrentDomain.GetData(_KEY_AUDIT_CACHE)
+        if caches:
+            caches.pop(_document_key(args.Document), None)
+    except Exception:
+        pass
+
+
+def _ensure_change_tracking(app):
+    """Registra (uma vez por sessão) os handlers que mantêm o cache em dia."""
+    from Autodesk.Revit.DB.Events import DocumentChangedEventArgs, DocumentClosingEventArgs
+    domain = System.AppDomain.CurrentDomain
+    if domain.GetData(_KEY_DOC_CHANGED) is None:
+        h = System.EventHandler[DocumentChangedEventArgs](_on_document_changed)
+        app.DocumentChanged += h
+        domain.SetData(_KEY_DOC_CHANGED, h)
+    if domain.GetData(_KEY_DOC_CLOSING) is None:
+        h = System.EventHandler[DocumentClosingEventArgs](_on_document_closing)
+        app.DocumentClosing += h
+        domain.SetData(_KEY_DOC_CLOSING, h)
+
+
+def get_audit_cache(doc):
+    """OverkillAuditCache do documento, ou None se não for possível rastrear mudanças
+    (aí cada análise recomeça do zero, como antes)."""
+    try:
+        _ensure_change_tracking(doc.Application)
+    except Exception as ex:
+        logger.debug("Overkill: sem rastreamento de alterações: {}".format(ex))
+        return None
+    domain = System.AppDomain.CurrentDomain
+    caches = domain.GetData(_KEY_AUDIT_CACHE)
+    if caches is None:
+        caches = {}
+        domain.SetData(_KEY_AUDIT_CACHE, caches)
+    key = _document_key(doc)
+    entry = caches.get(key)
+    if entry is None:
+        entry = caches[key] = OverkillAuditCache()
+    return entry
+
+
+# ====== Funções de análise por operação ======
+
+def _collect_geometry(doc, selected_bics, is_active_view, tol_curve, tol_point, census=None,
+                      record_cache=None):
+    """GeometryRecords das categorias; record_cache (el_int -> registro) evita recalcular
+    a geometria de elementos que não mudaram desde a última análise."""
+    records = []
+    for bic in selected_bics:
+        if is_active_view:
+            elements = (FilteredElementCollector(doc, doc.ActiveView.Id)
+                        .OfCategory(bic).WhereElementIsNotElementType())
+        elif census is not None:
+            elements = census.instances(bic)
+        else:
+            elements = (FilteredElementCollector(doc)
+                        .OfCategory(bic).WhereElementIsNotElementType())
+        for el in elements:
+            if record_cache is None:
+                rec = _element_geometry(el, tol_curve, tol_point)
+            else:
+                el_int = el.Id.IntegerValue
+                if el_int in record_cache:
+                    rec = record_cache[el_int]
+                else:
+                    rec = record_cache[el_int] = _element_geometry(el, tol_curve, tol_point)
+            if rec:
+                records.append(rec)
+    return records
+
+
+def _duplicate_items_from_records(doc, records, tol_curve):
+    """CleanupItems dos sobrepostos: duplicados exatos e retas colineares contidas/sobrepostas."""
+    items = []
+    flagged = set()
+
+    def _item(el_int, cat_name, detail_fmt, *args):
+        dup_id = ElementId(el_int)
+        dup_el = doc.GetElement(dup_id)
+        desc = _element_description(dup_el) if dup_el else "?"
+        if detail_fmt:
+            desc = "{} — {}".format(desc, detail_fmt.format(*args))
+        return CleanupItem(dup_id, "Sobreposto", cat_name, desc)
+
+    for group in find_duplicate_groups(records):
+        # mantém o ID menor (elemento mais antigo); marca os mais novos como duplicados
+        members = sorted(group, key=lambda i: records[i].el_int)
+        for i in members[1:]:
+            rec = records[i]
+            flagged.add(rec.el_int)
+            items.append(_item(rec.el_int, rec.cat_name, None))
+
+    by_id = dict((rec.el_int, rec) for rec in records)
+    for el_int, other_int, relation, overlap in find_collinear_overlaps(records, tol_curve):
+        if el_int in flagged:
+            continue
+        flagged.add(el_int)
+        rec = by_id[el_int]
+        if relation == "contido":
+            items.append(_item(el_int, rec.cat_name, "contido em {}", other_int))
+        else:
+            item = _item(el_int, rec.cat_name, "sobreposição parcial de {:.0f} mm com {}",
+                         overlap, other_int)
+            item.IsSelected = False   # excluir apagaria trecho não coberto: revisar
+            items.append(item)
     return items
 
 
-def find_unused_view_templates(doc):
+def find_duplicate_elements(doc, selected_bics, is_active_view, tol_curve, tol_point, census=None,
+                            record_cache=None):
+    records = _collect_geometry(doc, selected_bics, is_active_view, tol_curve, tol_point, census,
+                                record_cache)
+    return _duplicate_items_from_records(doc, records, tol_curve)
+
+
+def find_unused_view_templates(doc, census=None):
     items = []
     try:
-        all_views = list(FilteredElementCollector(doc).OfClass(View))
-        templates = [v for v in all_views if v.IsTemplate]
-        used_ids  = set()
-        for v in all_views:
-            if not v.IsTemplate:
-                try:
-                    tid = v.ViewTemplateId
-                    if tid and tid.IntegerValue > 0:
-                        used_ids.add(tid.IntegerValue)
-                except Exception:
-                    pass
+        census = census or ModelCensus(doc)
+        templates = [v for v in census.of_class("view") if v.IsTemplate]
+        used_ids  = census.used_template_ids
         for t in templates:
             if t.Id.IntegerValue not in used_ids:
                 items.append(CleanupItem(
@@ -191,21 +733,12 @@ def find_unused_view_templates(doc):
     return items
 
 
-def find_unused_text_types(doc):
+def find_unused_text_types(doc, census=None):
     items = []
     try:
-        used_ids = set()
-        for tn in FilteredElementCollector(doc).OfClass(TextNote):
-            try:
-                tid = tn.GetTypeId()
-                if tid and tid.IntegerValue > 0:
-                    used_ids.add(tid.IntegerValue)
-            except Exception:
-                pass
-        col = (FilteredElementCollector(doc)
-               .OfCategory(BuiltInCategory.OST_TextNotes)
-               .WhereElementIsElementType())
-        for tt in col:
+        census = census or ModelCensus(doc)
+        used_ids = census.used_text_type_ids
+        for tt in census.types(BuiltInCategory.OST_TextNotes):
             if tt.Id.IntegerValue not in used_ids:
                 try:
                     name = tt.Name
@@ -220,13 +753,14 @@ def find_unused_text_types(doc):
     return items
 
 
-def find_unused_line_patterns(doc):
+def find_unused_line_patterns(doc, census=None):
     """
     Coleta padrões de linha não referenciados pelas configurações
     de categoria (projeção e corte). Não detecta overrides por elemento.
     """
     items = []
     try:
+        census = census or ModelCensus(doc)
         used_ids = set()
         try:
             for cat in doc.Settings.Categories:
@@ -251,7 +785,7 @@ def find_unused_line_patterns(doc):
         except Exception:
             pass
 
-        for lp in FilteredElementCollector(doc).OfClass(LinePatternElement):
+        for lp in census.of_class("line_pattern"):
             if lp.Id.IntegerValue not in used_ids:
                 try:
                     name = lp.GetLinePattern().Name
@@ -306,116 +840,161 @@ def _legacy_find_unused_load_classifications(doc):
     return items
 
 
-def _find_load_classification_references(doc, clf_id, clf_name):
-    """Retorna descricoes curtas de referencias que impedem exclusao segura."""
-    refs = []
-    clf_int = clf_id.IntegerValue
+def _describe_param_ref(el, p):
     try:
-        from Autodesk.Revit.DB.Electrical import ElectricalSystem
-        for circ in FilteredElementCollector(doc).OfClass(ElectricalSystem):
-            try:
-                raw = circ.LoadClassifications
-                names = [p.strip() for p in raw.replace(";", ",").split(",")] if raw else []
-                if clf_name in names:
-                    refs.append("Circuito {}".format(circ.Id.IntegerValue))
-            except Exception:
-                pass
+        pname = p.Definition.Name
     except Exception:
-        pass
-
+        pname = "parametro"
     try:
+        ename = el.Name
+    except Exception:
+        ename = el.GetType().Name
+    return "{} em {} ({})".format(pname, ename, el.Id.IntegerValue)
+
+
+class ElementIdReferenceIndex(object):
+    """
+    Índice reverso: ElementId referenciado -> [(elemento, parâmetro)] que apontam
+    para ele. Montado numa única passada por todos os elementos e seus parâmetros
+    do tipo ElementId; target_ids (set de int) restringe o índice aos ids de interesse.
+    elements reaproveita uma lista já coletada (ModelCensus.elements).
+    """
+    def __init__(self, doc, target_ids=None, elements=None):
         from Autodesk.Revit.DB import StorageType
-        for el in FilteredElementCollector(doc):
+        self._refs = {}
+        st_eid = StorageType.ElementId
+        for el in (elements if elements is not None else _all_elements(doc)):
             try:
-                if el.Id.IntegerValue == clf_int:
-                    continue
+                el_int = el.Id.IntegerValue
                 for p in el.Parameters:
                     try:
-                        if p.StorageType != StorageType.ElementId:
+                        if p.StorageType != st_eid:
                             continue
                         pid = p.AsElementId()
-                        if not pid or pid.IntegerValue != clf_int:
+                        if not pid:
+                            continue
+                        ref_int = pid.IntegerValue
+                        if ref_int <= 0 or ref_int == el_int:
+                            continue
+                        if target_ids is not None and ref_int not in target_ids:
                             continue
-                        try:
-                            pname = p.Definition.Name
-                        except Exception:
-                            pname = "parametro"
-                        try:
-                            ename = el.Name
-                        except Exception:
-                            ename = el.GetType().Name
-                        refs.append("{} em {} ({})".format(pname, ename, el.Id.IntegerValue))
+                        self._refs.setdefault(ref_int, []).append((el, p))
                     except Exception:
                         pass
             except Exception:
                 pass
+
+    def references(self, el_int):
+        """[(elemento, parâmetro)] que referenciam o id (int)."""
+        return self._refs.get(el_int, [])
+
+    def describe(self, el_int):
+        return [_describe_param_ref(el, p) for el, p in self.references(el_int)]
+
+
+def _circuits_by_load_classification(doc, circuits=None):
+    """{nome da classificação: [ids de circuito]} numa passada pelos ElectricalSystem."""
+    by_name = {}
+    try:
+        if circuits is None:
+            from Autodesk.Revit.DB.Electrical import ElectricalSystem
+            circuits = FilteredElementCollector(doc).OfClass(ElectricalSystem)
+        for circ in circuits:
+            try:
+                raw = circ.LoadClassifications
+                if not raw:
+                    continue
+                for part in raw.replace(";", ",").split(","):
+                    by_name.setdefault(part.strip(), []).append(circ.Id.IntegerValue)
+            except Exception:
+                pass
     except Exception:
         pass
+    return by_name
 
-    seen = set()
-    unique_refs = []
-    for ref in refs:
-        if ref not in seen:
-            seen.add(ref)
-            unique_refs.append(ref)
-    return unique_refs
+
+def _load_classification_references(doc, classifications, census=None):
+    """
+    Referências de cada classificação de carga, com uma única varredura do modelo.
+    classifications: [(ElementId, nome)]. Retorna {id int: [descrições únicas]}.
+    """
+    target_ids = set(clf_id.IntegerValue for clf_id, _ in classifications)
+    circuits = _circuits_by_load_classification(
+        doc, census.of_class("circuit") if census else None)
+    try:
+        index = ElementIdReferenceIndex(doc, target_ids, census.elements if census else None)
+    except Exception:
+        index = None
+
+    result = {}
+    for clf_id, clf_name in classifications:
+        clf_int = clf_id.IntegerValue
+        refs = ["Circuito {}".format(cid) for cid in circuits.get(clf_name, [])]
+        if index is not None:
+            refs.extend(index.describe(clf_int))
+        seen = set()
+        unique_refs = []
+        for ref in refs:
+            if ref not in seen:
+                seen.add(ref)
+                unique_refs.append(ref)
+        result[clf_int] = unique_refs
+    return result
 
 
-def _replace_load_classification_references(doc, old_ids, substitute_id):
+def _find_load_classification_references(doc, clf_id, clf_name):
+    """Retorna descricoes curtas de referencias que impedem exclusao segura."""
+    return _load_classification_references(doc, [(clf_id, clf_name)]).get(clf_id.IntegerValue, [])
+
+
+def _replace_load_classification_references(doc, old_ids, substitute_id, index=None):
     """Troca parametros ElementId que apontam para classificacoes antigas."""
     changed = 0
     locked = []
     try:
-        from Autodesk.Revit.DB import StorageType
-        for el in FilteredElementCollector(doc):
-            try:
-                if el.Id.IntegerValue in old_ids:
-                    continue
-                for p in el.Parameters:
-                    try:
-                        if p.StorageType != StorageType.ElementId:
-                            continue
-                        pid = p.AsElementId()
-                        if not pid or pid.IntegerValue not in old_ids:
-                            continue
-                        if p.IsReadOnly:
-                            try:
-                                pname = p.Definition.Name
-                            except Exception:
-                                pname = "parametro"
-                            try:
-                                ename = el.Name
-                            except Exception:
-                                ename = el.GetType().Name
-                            locked.append("{} em {} ({})".format(pname, ename, el.Id.IntegerValue))
-                            continue
-                        p.Set(substitute_id)
-                        changed += 1
-                    except Exception:
-                        pass
-            except Exception:
-                pass
+        if index is None:
+            index = ElementIdReferenceIndex(doc, set(old_ids))
+        for old_id in old_ids:
+            for el, p in index.references(old_id):
+                try:
+                    if el.Id.IntegerValue in old_ids:
+                        continue
+                    # O valor pode ter mudado desde a indexação (reatribuição por circuito)
+                    if p.AsElementId().IntegerValue not in old_ids:
+                        continue
+                    if p.IsReadOnly:
+                        locked.append(_describe_param_ref(el, p))
+                        continue
+                    p.Set(substitute_id)
+                    changed += 1
+                except Exception:
+                    pass
     except Exception:
         pass
     return changed, locked
 
 
-def find_unused_load_classifications(doc):
+def find_unused_load_classifications(doc, census=None):
     """Lista classificacoes de carga para limpeza/consolidacao."""
     items = []
     try:
-        from Autodesk.Revit.DB.Electrical import ElectricalLoadClassification
-
-        all_clf = list(FilteredElementCollector(doc).OfClass(ElectricalLoadClassification))
+        census = census or ModelCensus(doc)
+        all_clf = census.of_class("load_classification")
         if not all_clf:
             return items
 
+        named = []
         for clf in all_clf:
             try:
                 name = clf.Name
             except Exception:
                 name = "Classificacao {}".format(clf.Id.IntegerValue)
-            refs = _find_load_classification_references(doc, clf.Id, name)
+            named.append((clf, name))
+
+        refs_by_id = _load_classification_references(
+            doc, [(clf.Id, name) for clf, name in named], census)
+        for clf, name in named:
+            refs = refs_by_id.get(clf.Id.IntegerValue)
             if refs:
                 detail = "{} referencia(s); escolha uma substituta para consolidar".format(len(refs))
             else:
@@ -426,13 +1005,12 @@ def find_unused_load_classifications(doc):
     return items
 
 
-def find_unconnected_conduits(doc):
+def find_unconnected_conduits(doc, census=None):
     """Eletrodutos com ambas as pontas livres (nenhum conector conectado)."""
     items = []
     try:
-        for el in (FilteredElementCollector(doc)
-                   .OfCategory(BuiltInCategory.OST_Conduit)
-                   .WhereElementIsNotElementType()):
+        census = census or ModelCensus(doc)
+        for el in census.instances(BuiltInCategory.OST_Conduit):
             try:
                 mgr = el.ConnectorManager
                 if mgr is None:
@@ -460,19 +1038,13 @@ def find_unconnected_conduits(doc):
     return items
 
 
-def find_unused_view_filters(doc):
+def find_unused_view_filters(doc, census=None):
     """ParameterFilterElement definido no projeto mas não aplicado a nenhuma vista ou modelo de vista."""
     items = []
     try:
-        from Autodesk.Revit.DB import ParameterFilterElement
-        used_ids = set()
-        for v in FilteredElementCollector(doc).OfClass(View):
-            try:
-                for fid in v.GetFilters():
-                    used_ids.add(fid.IntegerValue)
-            except Exception:
-                pass
-        for f in FilteredElementCollector(doc).OfClass(ParameterFilterElement):
+        census = census or ModelCensus(doc)
+        used_ids = census.used_filter_ids
+        for f in census.of_class("view_filter"):
             if f.Id.IntegerValue not in used_ids:
                 items.append(CleanupItem(
                     f.Id, "Filtro de Vista", f.Name,
@@ -483,12 +1055,12 @@ def find_unused_view_filters(doc):
     return items
 
 
-def find_unloaded_cad_links(doc):
+def find_unloaded_cad_links(doc, census=None):
     """Links CAD (DWG/DXF) com status diferente de Carregado."""
     items = []
     try:
-        from Autodesk.Revit.DB import CADLinkType
-        for lt in FilteredElementCollector(doc).OfClass(CADLinkType):
+        census = census or ModelCensus(doc)
+        for lt in census.of_class("cad_link_type"):
             try:
                 efr = lt.GetExternalFileReference()
                 if efr is None:
@@ -511,23 +1083,21 @@ def find_unloaded_cad_links(doc):
     return items
 
 
-def find_orphaned_tags(doc):
+def find_orphaned_tags(doc, census=None):
     """
     IndependentTag cujo elemento hospedeiro não existe mais no documento.
     Tags de elementos em links são ignoradas (falso positivo garantido).
     """
     items = []
     try:
-        from Autodesk.Revit.DB import IndependentTag
-        for tag in (FilteredElementCollector(doc)
-                    .OfClass(IndependentTag)
-                    .WhereElementIsNotElementType()):
+        census = census or ModelCensus(doc)
+        for tag in census.of_class("tag"):
             try:
                 host_id = tag.TaggedLocalElementId
                 # host_id == -1 indica elemento em arquivo linkado — pular
                 if host_id.IntegerValue <= 0:
                     continue
-                if doc.GetElement(host_id) is None:
+                if host_id.IntegerValue not in census.element_ids:
                     try:
                         cat_name = tag.Category.Name if tag.Category else "Tag"
                     except Exception:
@@ -736,6 +1306,19 @@ class OverkillWindow(forms.WPFWindow):
 
         self.cleanup_items = []
 
+        # Uma única passada pelo modelo para todas as análises (criada sob demanda:
+        # sobrepostos só na vista ativa não precisam dela). Com o cache da auditoria,
+        # análises seguintes só reaplicam os elementos alterados desde a anterior.
+        audit = get_audit_cache(doc)
+        if audit:
+            audit.refresh(doc, build_census=False)
+        census_holder = []
+
+        def _census():
+            if not census_holder:
+                census_holder.append(audit.refresh(doc) if audit else ModelCensus(doc))
+            return census_holder[0]
+
         # Elementos sobrepostos
         if self.op_duplicates_cb.IsChecked:
             selected_bics = [c.bic for c in self.categories if c.is_checked]
@@ -750,40 +1333,42 @@ class OverkillWindow(forms.WPFWindow):
                 return
             is_active_view = bool(self.scope_view_rb.IsChecked)
             self.cleanup_items.extend(
-                find_duplicate_elements(doc, selected_bics, is_active_view, tol_curve, tol_point)
+                find_duplicate_elements(doc, selected_bics, is_active_view, tol_curve, tol_point,
+                                        None if is_active_view else _census(),
+                                        audit.geometry_records(tol_curve, tol_point) if audit else None)
             )
 
         # Modelos de vista não utilizados
         if self.op_view_templates_cb.IsChecked:
-            self.cleanup_items.extend(find_unused_view_templates(doc))
+            self.cleanup_items.extend(find_unused_view_templates(doc, _census()))
 
         # Tipos de texto não utilizados
         if self.op_text_types_cb.IsChecked:
-            self.cleanup_items.extend(find_unused_text_types(doc))
+            self.cleanup_items.extend(find_unused_text_types(doc, _census()))
 
         # Padrões de linha não utilizados
         if self.op_line_patterns_cb.IsChecked:
-            self.cleanup_items.extend(find_unused_line_patterns(doc))
+            self.cleanup_items.extend(find_unused_line_patterns(doc, _census()))
 
         # Tipos de carga (LoadClassification, estrutural)
         if self.op_load_cb.IsChecked:
-            self.cleanup_items.extend(find_unused_load_classifications(doc))
+            self.cleanup_items.extend(find_unused_load_classifications(doc, _census()))
 
         # Eletrodutos com ambas as pontas livres
         if self.op_conduits_cb.IsChecked:
-            self.cleanup_items.extend(find_unconnected_conduits(doc))
+            self.cleanup_items.extend(find_unconnected_conduits(doc, _census()))
 
         # Filtros de vista não aplicados
         if self.op_view_filters_cb.IsChecked:
-            self.cleanup_items.extend(find_unused_view_filters(doc))
+            self.cleanup_items.extend(find_unused_view_filters(doc, _census()))
 
         # Links CAD não carregados
         if self.op_cad_links_cb.IsChecked:
-            self.cleanup_items.extend(find_unloaded_cad_links(doc))
+            self.cleanup_items.extend(find_unloaded_cad_links(doc, _census()))
 
         # Tags sem elemento hospedeiro
         if self.op_orphan_tags_cb.IsChecked:
-            self.cleanup_items.extend(find_orphaned_tags(doc))
+            self.cleanup_items.extend(find_orphaned_tags(doc, _census()))
 
         if not self.cleanup_items:
             forms.alert("Nenhum item encontrado. O projeto está limpo nessas categorias!")
@@ -824,10 +1409,12 @@ class OverkillWindow(forms.WPFWindow):
         if load_items:
             from Autodesk.Revit.DB.Electrical import ElectricalLoadClassification
             deleting_ids = {i.ElementId.IntegerValue for i in load_items}
-            for item in load_items:
-                refs = _find_load_classification_references(doc, item.ElementId, item.Name)
+            refs_by_id = _load_classification_references(
+                doc, [(i.ElementId, i.Name) for i in load_items]
+            )
+            for clf_int, refs in refs_by_id.items():
                 if refs:
-                    load_refs_before[item.ElementId.IntegerValue] = refs
+                    load_refs_before[clf_int] = refs
 
             available = [
                 clf for clf in FilteredElementCollector(doc).OfClass(ElectricalLoadClassification)
@@ -892,8 +1479,11 @@ class OverkillWindow(forms.WPFWindow):
 
             if load_items:
                 still_used_ids = set()
+                refs_by_id = _load_classification_references(
+                    doc, [(i.ElementId, i.Name) for i in load_items]
+                )
                 for item in load_items:
-                    refs = _find_load_classification_references(doc, item.ElementId, item.Name)
+                    refs = refs_by_id.get(item.ElementId.IntegerValue)
                     if refs:
                         still_used_ids.add(item.ElementId.IntegerValue)
                         skipped.append(u"{} (Tipo de Carga - ainda possui {} referencia(s))".format(
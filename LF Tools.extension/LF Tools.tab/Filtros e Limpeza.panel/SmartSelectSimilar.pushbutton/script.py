@@ -33,6 +33,8 @@ from Autodesk.Revit.DB import (
 from Autodesk.Revit.UI.Selection import ObjectType
 from pyrevit import forms, script as _pyscript
 
+from lf_revit import ViewHighlighter, highlight_overrides
+
 uidoc       = __revit__.ActiveUIDocument
 doc         = uidoc.Document
 active_view = uidoc.ActiveView
@@ -379,6 +381,147 @@ def _effective_criteria(ref_elem, configured_criteria, include_standard=True):
     return result
 
 
+# Critérios que são propriedade do tipo (sempre iguais para instâncias do mesmo tipo)
+_TYPE_LEVEL_PROPS = ('Family', 'Type')
+
+
+def _type_level_value(type_elem, name, pid):
+    """Valor de um critério de tipo lido do próprio tipo; None = o tipo não decide
+    (a comparação cai no caminho por elemento, como antes). pid None = busca por nome."""
+    try:
+        if name == 'Family':
+            return type_elem.FamilyName or None
+        if name == 'Type':
+            return type_elem.Name or None
+        p = type_elem.get_Parameter(pid) if pid is not None else type_elem.LookupParameter(name)
+        if p and p.HasValue:
+            return p.AsValueString() or p.AsString() or u''
+    except:
+        pass
+    return None
+
+
+def _type_id_filter(target_doc, type_ids):
+    """Filtro nativo "o tipo do elemento está em type_ids": FamilyInstanceFilter para
+    FamilySymbol, regra em ELEM_TYPE_PARAM para tipos de sistema, unidos por OR."""
+    from Autodesk.Revit.DB import (FamilySymbol, ElementFilter, LogicalOrFilter,
+                                   ParameterValueProvider, FilterElementIdRule,
+                                   FilterNumericEquals, ElementParameterFilter)
+    filters = []
+    provider = None
+    for tid in type_ids:
+        if isinstance(target_doc.GetElement(tid), FamilySymbol):
+            filters.append(FamilyInstanceFilter(target_doc, tid))
+        else:
+            if provider is None:
+                provider = ParameterValueProvider(ElementId(BuiltInParameter.ELEM_TYPE_PARAM))
+            filters.append(ElementParameterFilter(
+                FilterElementIdRule(provider, FilterNumericEquals(), tid)))
+    if len(filters) == 1:
+        return filters[0]
+    return LogicalOrFilter(List[ElementFilter](filters))
+
+
+def _create_string_rule(provider, evaluator, value):
+    from Autodesk.Revit.DB import FilterStringRule
+    try:
+        return FilterStringRule(provider, evaluator, value) # Revit 2022+
+    except:
+        return FilterStringRule(provider, evaluator, value, False) # Revit 2021-
+
+
+def _equals_rule(provider, storage_type, value):
+    """Regra nativa "parâmetro == value" para o StorageType dado (None se não suportado)."""
+    from Autodesk.Revit.DB import (FilterStringEquals, FilterNumericEquals, FilterIntegerRule,
+                                   FilterDoubleRule, FilterElementIdRule, StorageType)
+    if storage_type == StorageType.String:
+        return _create_string_rule(provider, FilterStringEquals(), value or "")
+    if storage_type == StorageType.Integer:
+        return FilterIntegerRule(provider, FilterNumericEquals(), value)
+    if storage_type == StorageType.Double:
+        return FilterDoubleRule(provider, FilterNumericEquals(), value, 1e-6)
+    if storage_type == StorageType.ElementId:
+        return FilterElementIdRule(provider, FilterNumericEquals(), value)
+    return None
+
+
+def _raw_value(p):
+    from Autodesk.Revit.DB import StorageType
+    st = p.StorageType
+    if st == StorageType.String:
+        return p.AsString() or ""
+    if st == StorageType.Integer:
+        return p.AsInteger()
+    if st == StorageType.Double:
+        return p.AsDouble()
+    if st == StorageType.ElementId:
+        return p.AsElementId()
+    return None
+
+
+def _match_soft(coll, target_doc, param_ids):
+    """Critérios sem filtro nativo, comparados elemento a elemento."""
+    result = []
+    for elem in coll:
+        try:
+            ok = True
+            current_type_elem = None
+            for c, pid, is_type, ref_val in param_ids:
+                val = None
+                if pid:
+                    # Busca O(1) via ElementId
+                    if is_type:
+                        if not current_type_elem:
+                            current_type_elem = target_doc.GetElement(elem.GetTypeId())
+                        if current_type_elem:
+                            p = current_type_elem.get_Parameter(pid)
+                            if p and p.HasValue:
+                                val = p.AsValueString() or p.AsString() or u''
+                    else:
+                        p = elem.get_Parameter(pid)
+                        if p and p.HasValue:
+                            val = p.AsValueString() or p.AsString() or u''
+
+                # Fallback lento para propriedades complexas (Name, Category, Level, etc)
+                if val is None:
+                    val = _param_value(elem, c)
+
+                if val != ref_val:
+                    ok = False
+                    break
+            if ok:
+                result.append(elem)
+        except:
+            pass
+    return result
+
+
+def _split_types_by_criteria(target_doc, ref_cat_id, type_criteria):
+    """
+    Avalia os critérios de tipo uma vez por tipo da categoria.
+    Retorna (aprovados, indecisos): listas de ElementId de tipo. Indeciso = algum
+    critério não pôde ser lido no tipo e nenhum outro reprovou.
+    """
+    passing, undecided = [], []
+    types = (FilteredElementCollector(target_doc)
+             .WhereElementIsElementType()
+             .OfCategoryId(ref_cat_id))
+    for type_elem in types:
+        verdict = True
+        for c, pid, ref_val in type_criteria:
+            val = _type_level_value(type_elem, c, pid)
+            if val is None:
+                verdict = None
+            elif val != ref_val:
+                verdict = False
+                break
+        if verdict is True:
+            passing.append(type_elem.Id)
+        elif verdict is None:
+            undecided.append(type_elem.Id)
+    return passing, undecided
+
+
 def filter_similar(target_doc, ref_elem, criteria, scope, ref_cat_id=None):
     """
     Usa filtros nativos C++ do Revit (FamilyInstanceFilter, ElementLevelFilter)
@@ -386,13 +529,22 @@ def filter_similar(target_doc, ref_elem, criteria, scope, ref_cat_id=None):
 
     FamilyInstanceFilter cobre Família+Tipo em uma única passagem sem tocar
     em parâmetros — é ordens de magnitude mais rápido que comparação manual.
+    Critérios de tipo que sobram (Família/Tipo por nome, parâmetros de tipo) são
+    avaliados uma vez por tipo e voltam ao coletor como filtro de ids de tipo;
+    no laço Python ficam só os critérios de instância.
     """
     use_view = (scope == 'active_view' and target_doc == doc)
-    coll = (FilteredElementCollector(target_doc, active_view.Id)
-            if use_view else FilteredElementCollector(target_doc))
-    coll = coll.WhereElementIsNotElementType()
-    if ref_cat_id:
-        coll = coll.OfCategoryId(ref_cat_id)
+    native = []
+
+    def _collector(*extra):
+        coll = (FilteredElementCollector(target_doc, active_view.Id)
+                if use_view else FilteredElementCollector(target_doc))
+        coll = coll.WhereElementIsNotElementType()
+        if ref_cat_id:
+            coll = coll.OfCategoryId(ref_cat_id)
+        for f in native + list(extra):
+            coll = coll.WherePasses(f)
+        return coll
 
     soft = list(criteria)
 
@@ -402,7 +554,7 @@ def filter_similar(target_doc, ref_elem, criteria, scope, ref_cat_id=None):
             symbol = ref_elem.Symbol
             type_id = ref_elem.GetTypeId()
             if symbol and type_id != ElementId.InvalidElementId:
-                coll = coll.WherePasses(FamilyInstanceFilter(target_doc, type_id))
+                native.append(FamilyInstanceFilter(target_doc, type_id))
                 soft = [c for c in soft if c not in ('Family', 'Type', 'Category')]
         except:
             pass
@@ -412,21 +564,13 @@ def filter_similar(target_doc, ref_elem, criteria, scope, ref_cat_id=None):
         try:
             lvl_id = ref_elem.LevelId
             if lvl_id != ElementId.InvalidElementId:
-                coll = coll.WherePasses(ElementLevelFilter(lvl_id))
+                native.append(ElementLevelFilter(lvl_id))
                 soft = [c for c in soft if c != 'Level']
         except:
             pass
 
     # Aplicar ElementParameterFilter nativo (C++) para acelerar parâmetros de instância
-    from Autodesk.Revit.DB import (ParameterValueProvider, FilterStringRule, FilterStringEquals,
-                                   FilterNumericEquals, ElementParameterFilter, FilterIntegerRule,
-                                   FilterDoubleRule, FilterElementIdRule, StorageType)
-
-    def _create_string_rule(provider, evaluator, value):
-        try:
-            return FilterStringRule(provider, evaluator, value) # Revit 2022+
-        except:
-            return FilterStringRule(provider, evaluator, value, False) # Revit 2021-
+    from Autodesk.Revit.DB import ParameterValueProvider, ElementParameterFilter
 
     for c in list(soft):
         try:
@@ -434,32 +578,28 @@ def filter_similar(target_doc, ref_elem, criteria, scope, ref_cat_id=None):
             # Filtro nativo só funciona direto para parâmetros da instância
             if p and p.HasValue and p.Id != ElementId.InvalidElementId:
                 provider = ParameterValueProvider(p.Id)
-                rule = None
-                st = p.StorageType
-                if st == StorageType.String:
-                    rule = _create_string_rule(provider, FilterStringEquals(), p.AsString() or "")
-                elif st == StorageType.Integer:
-                    rule = FilterIntegerRule(provider, FilterNumericEquals(), p.AsInteger())
-                elif st == StorageType.Double:
-                    rule = FilterDoubleRule(provider, FilterNumericEquals(), p.AsDouble(), 1e-6)
-                elif st == StorageType.ElementId:
-                    rule = FilterElementIdRule(provider, FilterNumericEquals(), p.AsElementId())
-                
+                rule = _equals_rule(provider, p.StorageType, _raw_value(p))
                 if rule:
-                    coll = coll.WherePasses(ElementParameterFilter(rule))
+                    native.append(ElementParameterFilter(rule))
                     soft.remove(c)
         except:
             pass
 
+    # A categoria já está garantida por OfCategoryId
+    if ref_cat_id:
+        soft = [c for c in soft if c != 'Category']
+
     # Se todos os critérios foram cobertos por filtros nativos, retorna direto
     if not soft:
-        return list(coll.ToElements())
+        return list(_collector().ToElements())
 
     # Pré-computa cache de IDs O(1) para os critérios que não puderam usar C++ filter (ex: de Tipo)
     param_ids = []
     try:
-        type_elem = target_doc.GetElement(ref_elem.GetTypeId()) if ref_elem.GetTypeId() != ElementId.InvalidElementId else None
+        ref_type_id = ref_elem.GetTypeId()
+        type_elem = target_doc.GetElement(ref_type_id) if ref_type_id != ElementId.InvalidElementId else None
     except:
+        ref_type_id = None
         type_elem = None
         
     for c in soft:
@@ -475,41 +615,243 @@ def filter_similar(target_doc, ref_elem, criteria, scope, ref_cat_id=None):
                 is_type = True
         param_ids.append((c, pid, is_type, _param_value(ref_elem, c)))
 
-    result = []
-    for elem in coll:
+    # Critérios de tipo → avaliados por tipo e empurrados para o coletor
+    type_criteria = [(c, pid, ref_val) for c, pid, is_type, ref_val in param_ids
+                     if c in _TYPE_LEVEL_PROPS or (is_type and pid)]
+    if type_criteria and ref_cat_id and type_elem is not None:
         try:
-            ok = True
-            current_type_elem = None
-            for c, pid, is_type, ref_val in param_ids:
-                val = None
-                if pid:
-                    # Busca O(1) via ElementId
-                    if is_type:
-                        if not current_type_elem:
-                            current_type_elem = target_doc.GetElement(elem.GetTypeId())
-                        if current_type_elem:
-                            p = current_type_elem.get_Parameter(pid)
-                            if p and p.HasValue:
-                                val = p.AsValueString() or p.AsString() or u''
-                    else:
-                        p = elem.get_Parameter(pid)
-                        if p and p.HasValue:
-                            val = p.AsValueString() or p.AsString() or u''
-                
-                # Fallback lento para propriedades complexas (Name, Category, Level, etc)
-                if val is None:
-                    val = _param_value(elem, c)
+            passing, undecided = _split_types_by_criteria(target_doc, ref_cat_id, type_criteria)
+        except:
+            passing, undecided = [], []
+        # Se o próprio tipo de referência não apareceu, a categoria dos tipos não
+        # bate com a das instâncias: segue pelo caminho elemento a elemento
+        if ref_type_id in passing or ref_type_id in undecided:
+            type_names = set(c for c, _, _ in type_criteria)
+            inst_ids = [t for t in param_ids if t[0] not in type_names]
+            result = []
+            if passing:
+                coll = _collector(_type_id_filter(target_doc, passing))
+                result.extend(_match_soft(coll, target_doc, inst_ids) if inst_ids
+                              else coll.ToElements())
+            if undecided:
+                coll = _collector(_type_id_filter(target_doc, undecided))
+                result.extend(_match_soft(coll, target_doc, param_ids))
+            return result
+
+    return _match_soft(_collector(), target_doc, param_ids)
+
+
+# ── Host + vínculos ───────────────────────────────────────────────────────
+
+def _doc_key(d):
+    try:
+        return d.PathName or d.Title
+    except:
+        return u''
 
-                if val != ref_val:
-                    ok = False
-                    break
-            if ok:
-                result.append(elem)
+
+# Integer que guarda id local do documento (WorksetId): o número não vale em
+# outro arquivo, então vai pelo valor de exibição (nome do workset).
+_LOCAL_ID_INT_PARAMS = (BuiltInParameter.ELEM_PARTITION_PARAM,)
+
+
+def _portable_param_key(p):
+    """Como achar o mesmo parâmetro em outro documento: BuiltInParameter, GUID
+    do compartilhado, ou None (só pelo nome)."""
+    try:
+        bip = p.Definition.BuiltInParameter
+        if bip != BuiltInParameter.INVALID:
+            return bip
+    except:
+        pass
+    try:
+        if p.IsShared:
+            return p.GUID
+    except:
+        pass
+    return None
+
+
+class SimilarQuery(object):
+    """
+    Critérios do elemento de referência numa forma que não depende do documento,
+    montada uma única vez: categoria, nomes de família/tipo/nível e, para cada
+    parâmetro, a chave portátil com o valor esperado. run(d) traduz isso para os
+    filtros nativos de cada documento (ids de tipo, nível e parâmetro mudam de um
+    arquivo para outro) e executa.
+    """
+    def __init__(self, ref_elem, criteria):
+        criteria = list(criteria)
+        self.signature = (_doc_key(ref_elem.Document), ref_elem.Id.IntegerValue, tuple(criteria))
+        cat = ref_elem.Category
+        self.cat_int  = cat.Id.IntegerValue if cat else None
+        self.cat_name = cat.Name if cat else None
+        self.ref_vals = dict((c, _param_value(ref_elem, c)) for c in criteria)
+        self.level_name = self.ref_vals.get('Level') if 'Level' in criteria else None
+
+        self.type_specs = []   # (critério, chave) lidos no tipo
+        self.inst_specs = []   # (critério, chave, StorageType, valor bruto) → regra nativa
+        self.soft       = []   # comparados pelo valor de exibição, elemento a elemento
+
+        from Autodesk.Revit.DB import StorageType
+        portable_storage = (StorageType.String, StorageType.Integer, StorageType.Double)
+        ref_type = _elem_type(ref_elem)
+        for c in criteria:
+            if c == 'Category' and self.cat_int is not None:
+                continue
+            if c == 'Level' and self.level_name:
+                continue
+            if c in _TYPE_LEVEL_PROPS:
+                self.type_specs.append((c, None))
+                continue
+            try:
+                p = ref_elem.LookupParameter(c)
+                if p is not None:
+                    key = _portable_param_key(p)
+                    # ElementId aponta para elementos do documento de origem: só por valor
+                    if (p.HasValue and key is not None and p.StorageType in portable_storage
+                            and key not in _LOCAL_ID_INT_PARAMS):
+                        self.inst_specs.append((c, key, p.StorageType, _raw_value(p)))
+                        continue
+                elif ref_type is not None:
+                    pt = ref_type.LookupParameter(c)
+                    if pt is not None:
+                        self.type_specs.append((c, _portable_param_key(pt)))
+                        continue
+            except:
+                pass
+            self.soft.append(c)
+
+    def _category_id(self, d):
+        if self.cat_int is None:
+            return None
+        if self.cat_int < 0:   # BuiltInCategory: mesmo id em todo documento
+            return ElementId(self.cat_int)
+        try:
+            for cat in d.Settings.Categories:
+                if cat.Name == self.cat_name:
+                    return cat.Id
         except:
             pass
+        return None
+
+    def _param_id(self, d, key):
+        if isinstance(key, BuiltInParameter):
+            return ElementId(key)
+        try:
+            from Autodesk.Revit.DB import SharedParameterElement
+            spe = SharedParameterElement.Lookup(d, key)
+            return spe.Id if spe else None
+        except:
+            return None
+
+    def run(self, d):
+        """Elementos similares no documento d."""
+        from Autodesk.Revit.DB import Level, ParameterValueProvider, ElementParameterFilter
+        cat_id = self._category_id(d)
+        if self.cat_int is not None and cat_id is None:
+            return []
+
+        native = []
+        soft = list(self.soft)
+        if self.level_name:
+            level = None
+            for lv in FilteredElementCollector(d).OfClass(Level):
+                if lv.Name == self.level_name:
+                    level = lv
+                    break
+            if level is None:
+                return []
+            native.append(ElementLevelFilter(level.Id))
+
+        for c, key, st, raw in self.inst_specs:
+            pid = self._param_id(d, key)
+            rule = _equals_rule(ParameterValueProvider(pid), st, raw) if pid else None
+            if rule:
+                native.append(ElementParameterFilter(rule))
+            else:
+                soft.append(c)
+
+        if self.type_specs:
+            if cat_id is None:
+                soft.extend(c for c, _ in self.type_specs)
+            else:
+                type_criteria = [(c, key, self.ref_vals[c]) for c, key in self.type_specs]
+                passing, undecided = _split_types_by_criteria(d, cat_id, type_criteria)
+                if not passing and not undecided:
+                    return []
+                type_names = [c for c, _ in self.type_specs]
+                result = []
+                if passing:
+                    result.extend(self._collect(d, cat_id, native, _type_id_filter(d, passing), soft))
+                if undecided:
+                    result.extend(self._collect(d, cat_id, native, _type_id_filter(d, undecided),
+                                                soft + type_names))
+                return result
+        return self._collect(d, cat_id, native, None, soft)
+
+    def _collect(self, d, cat_id, native, type_filter, soft):
+        coll = FilteredElementCollector(d).WhereElementIsNotElementType()
+        if cat_id is not None:
+            coll = coll.OfCategoryId(cat_id)
+        for f in native:
+            coll = coll.WherePasses(f)
+        if type_filter is not None:
+            coll = coll.WherePasses(type_filter)
+        if not soft:
+            return list(coll.ToElements())
+        return _match_soft(coll, d, [(c, None, False, self.ref_vals.get(c)) for c in soft])
+
+
+def loaded_link_instances(host_doc):
+    """[(RevitLinkInstance, documento)] dos vínculos carregados."""
+    result = []
+    for inst in FilteredElementCollector(host_doc).OfClass(RevitLinkInstance):
+        try:
+            link_doc = inst.GetLinkDocument()
+        except:
+            link_doc = None
+        if link_doc is not None:
+            result.append((inst, link_doc))
     return result
 
 
+def filter_similar_all_docs(query, host_doc, cache=None):
+    """
+    Roda a consulta no host e em cada vínculo carregado: [(link_inst ou None, [elementos])].
+    Um documento vinculado em várias instâncias é consultado uma vez só; cache (dict)
+    guarda o resultado por (documento, consulta) entre chamadas.
+    """
+    if cache is None:
+        cache = {}
+    results = []
+    for inst, d in [(None, host_doc)] + loaded_link_instances(host_doc):
+        key = (_doc_key(d), query.signature)
+        elems = cache.get(key)
+        if elems is None:
+            try:
+                elems = query.run(d)
+            except:
+                elems = []
+            cache[key] = elems
+        if elems:
+            results.append((inst, elems))
+    return results
+
+
+def references_for(matches):
+    """List[Reference] para SetReferences: direta no host, CreateLinkReference nos vínculos."""
+    refs = List[Reference]()
+    for inst, elems in matches:
+        for e in elems:
+            try:
+                r = Reference(e)
+                refs.Add(r.CreateLinkReference(inst) if inst is not None else r)
+            except:
+                pass
+    return refs
+
+
 # ── Janela ────────────────────────────────────────────────────────────────
 
 class SmartSelectSimilarWindow(forms.WPFWindow):
@@ -524,7 +866,11 @@ class SmartSelectSimilarWindow(forms.WPFWindow):
         self._empty_params       = get_empty_param_names(ref_elem) - set(self._params.keys())
         self._criteria           = []
         self._matches            = []
+        self._multi_matches      = []   # escopo host + vínculos: [(link_inst ou None, [elementos])]
+        self._doc_cache          = {}   # (documento, consulta) → elementos
         self._highlighted        = []
+        self._highlighter        = ViewHighlighter(
+            doc, active_view, highlight_overrides(doc, RvtColor(255, 0, 0), 8, background=True))
         self._pinned_param_names = set()
 
         prefix = u'[VÍNCULO] ' if is_linked else u''
@@ -543,6 +889,7 @@ class SmartSelectSimilarWindow(forms.WPFWindow):
         self.SearchBox.LostFocus            += self._on_search_focus
         self.RadioActiveView.Checked        += self._on_scope
         self.RadioProject.Checked           += self._on_scope
+        self.RadioAllLinks.Checked          += self._on_scope
         self.BtnPresetFamilyType.Click      += self._preset_family_type
         self.BtnPresetFamilyComments.Click  += self._preset_family_comments
         self.BtnClearAll.Click              += self._clear_all
@@ -558,12 +905,13 @@ class SmartSelectSimilarWindow(forms.WPFWindow):
         self._clear_highlight()
 
     def _clear_highlight(self):
-        if not self._highlighted:
+        if not self._highlighter.active:
+            self._highlighted = []
             return
         t = Transaction(doc, u'Limpar Highlight')
         t.Start()
         try:
-            set_highlight(active_view, self._highlighted, apply=False)
+            self._highlighter.clear()
             t.Commit()
         except:
             try:
@@ -723,6 +1071,11 @@ class SmartSelectSimilarWindow(forms.WPFWindow):
     def _on_scope(self, s, a):
         self._update_preview()
 
+    def _scope(self):
+        if self.RadioAllLinks.IsChecked:
+            return 'all_links'
+        return 'active_view' if self.RadioActiveView.IsChecked else 'project'
+
     def _on_criteria(self, s, a):
         self._criteria = [
             str(c.Tag) for c in self.ParametersPanel.Children
@@ -734,29 +1087,56 @@ class SmartSelectSimilarWindow(forms.WPFWindow):
         if not self._criteria:
             self.PreviewLabel.Text = u'Selecione ao menos 1 critério'
             self._matches = []
+            self._multi_matches = []
             return
 
-        scope = 'active_view' if self.RadioActiveView.IsChecked else 'project'
-        self._matches = filter_similar(
-            self._target_doc, self._ref_elem, self._criteria, scope, self._cat_id
-        )
-        n = len(self._matches)
-        self.PreviewLabel.Text = u'{} elemento(s) encontrado(s)'.format(n)
-
-        if not self._is_linked:
+        scope = self._scope()
+        if scope == 'all_links':
+            query = SimilarQuery(self._ref_elem, self._criteria)
+            self._multi_matches = filter_similar_all_docs(query, doc, self._doc_cache)
+            self._matches = [e for _, elems in self._multi_matches for e in elems]
+            self.PreviewLabel.Text = u'{} elemento(s) encontrado(s) em {} documento(s)'.format(
+                len(self._matches), len(self._multi_matches))
+            host_ids = self._host_match_ids()
+        else:
+            self._multi_matches = []
+            self._matches = filter_similar(
+                self._target_doc, self._ref_elem, self._criteria, scope, self._cat_id
+            )
+            n = len(self._matches)
+            self.PreviewLabel.Text = u'{} elemento(s) encontrado(s)'.format(n)
+            host_ids = [] if self._is_linked else [e.Id for e in self._matches]
+
+        # Filtro de seleção na vista (um override só) para muitos resultados;
+        # override por elemento para poucos
+        if not host_ids:
             self._clear_highlight()
-            if self._matches:
-                self._highlighted = [e.Id for e in self._matches]
-                t = Transaction(doc, u'Highlight Temporário')
-                t.Start()
-                try:
-                    set_highlight(active_view, self._highlighted, apply=True)
-                    t.Commit()
-                except:
-                    try:
-                        t.RollBack()
-                    except:
-                        pass
+            return
+        t = Transaction(doc, u'Highlight Temporário')
+        t.Start()
+        try:
+            self._highlighter.show(host_ids)
+            t.Commit()
+            self._highlighted = host_ids
+        except:
+            try:
+                t.RollBack()
+            except:
+                pass
+
+    def _host_match_ids(self):
+        """Ids dos resultados que estão no próprio documento (escopo host + vínculos)."""
+        return [e.Id for inst, elems in self._multi_matches if inst is None for e in elems]
+
+    def _show_multi(self, select=True):
+        refs = references_for(self._multi_matches)
+        if select and refs.Count:
+            uidoc.Selection.SetReferences(refs)
+        host_ids = self._host_match_ids()
+        if host_ids:
+            uidoc.ShowElements(List[ElementId](host_ids))
+        else:
+            uidoc.ShowElements(List[ElementId]([inst.Id for inst, _ in self._multi_matches]))
 
     def _batch_checks(self, tags):
         tags_set = set(tags)
@@ -779,7 +1159,9 @@ class SmartSelectSimilarWindow(forms.WPFWindow):
     def _on_preview(self, s, a):
         if not self._matches:
             return
-        if self._is_linked:
+        if self._multi_matches:
+            self._show_multi()
+        elif self._is_linked:
             refs = List[Reference]()
             for e in self._matches:
                 try:
@@ -799,10 +1181,16 @@ class SmartSelectSimilarWindow(forms.WPFWindow):
     def _on_paint(self, s, a):
         if not self._matches:
             return
-        if self._is_linked:
+        if self._multi_matches:
+            ids = self._host_match_ids()
+            if not ids:
+                forms.alert(u'Pintura em vínculos não é suportada pelo Revit.')
+                return
+        elif self._is_linked:
             forms.alert(u'Pintura em vínculos não é suportada pelo Revit.')
             return
-        ids = [e.Id for e in self._matches]
+        else:
+            ids = [e.Id for e in self._matches]
         t = Transaction(doc, u'Pintar Elementos')
         t.Start()
         try:
@@ -814,13 +1202,16 @@ class SmartSelectSimilarWindow(forms.WPFWindow):
             except:
                 pass
         if ids == self._highlighted:
-            self._highlighted = []
+            # Pintura é permanente: fechar a janela não deve limpar esses overrides
+            self._highlighter.forget_element_overrides()
         forms.toast(u'Seleção pintada!')
 
     def _on_zoom(self, s, a):
         if not self._matches:
             return
-        if self._is_linked:
+        if self._multi_matches:
+            self._show_multi(select=False)
+        elif self._is_linked:
             refs = List[Reference]()
             for e in self._matches:
                 try:
@@ -841,11 +1232,17 @@ class SmartSelectSimilarWindow(forms.WPFWindow):
             try:
                 _save_config({
                     'criteria': u','.join(self._criteria),
-                    'scope': 'active_view' if self.RadioActiveView.IsChecked else 'project',
+                    'scope': self._scope(),
                 })
             except:
                 pass
-            if self._is_linked:
+            if self._multi_matches:
+                refs = references_for(self._multi_matches)
+                if refs.Count:
+                    uidoc.Selection.SetReferences(refs)
+                else:
+                    forms.alert(u'Falha ao criar referências vinculadas.')
+            elif self._is_linked:
                 refs = List[Reference]()
                 for e in self._matches:
                     try:
@@ -943,16 +1340,26 @@ if shift_pressed or not saved_criteria:
     if saved_criteria:
         win.RadioProject.IsChecked    = (saved_scope == 'project')
         win.RadioActiveView.IsChecked = (saved_scope == 'active_view')
+        win.RadioAllLinks.IsChecked   = (saved_scope == 'all_links')
         win._batch_checks(_effective_criteria(elem, saved_criteria, include_standard=True))
     win.ShowDialog()
 else:
     cat_id  = elem.Category.Id if elem.Category else None
     effective_criteria = _effective_criteria(elem, saved_criteria, include_standard=True)
+    multi_matches = []
     with forms.ProgressBar(title=u"Smart Select Similar...", cancellable=False) as pb:
         pb.update_progress(0, 1)
-        matches = filter_similar(tgt_doc, elem, effective_criteria, saved_scope, cat_id)
+        if saved_scope == 'all_links':
+            multi_matches = filter_similar_all_docs(SimilarQuery(elem, effective_criteria), doc)
+            matches = [e for _, elems in multi_matches for e in elems]
+        else:
+            matches = filter_similar(tgt_doc, elem, effective_criteria, saved_scope, cat_id)
         pb.update_progress(1, 1)
-    if matches:
+    if multi_matches:
+        refs = references_for(multi_matches)
+        if refs.Count:
+            uidoc.Selection.SetReferences(refs)
+    elif matches:
         if is_linked:
             refs = List[Reference]()
             for e in matches:
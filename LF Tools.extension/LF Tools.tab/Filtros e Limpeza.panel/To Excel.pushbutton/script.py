@@ -47,33 +47,87 @@ def _parse_excel_range(range_ref):
     c2, r2 = _parse_cell_ref(parts[1])
     return min(c1, c2), min(r1, r2), max(c1, c2), max(r1, r2)
 
-class _XlsxReader:
-    """Leitor leve de .xlsx usando apenas zipfile + ElementTree."""
-    def __init__(self, file_path):
-        self._zf = zipfile.ZipFile(file_path, 'r')
-        self._shared_strings = self._load_shared_strings()
-        self._sheet_names, self._sheet_paths, self._print_areas = self._load_workbook_info()
+def _is_element_id_header(row):
+    return bool(row) and str(row[0] if row[0] is not None else "").strip() == "ElementId"
+
+_SS_TAG = '{' + _XLSX_NS['ss'] + '}'
+_TAG_SI = _SS_TAG + 'si'
+_TAG_ROW = _SS_TAG + 'row'
+_TAG_SHEETDATA = _SS_TAG + 'sheetData'
+
+class _LazySharedStrings(object):
+    """sharedStrings.xml decodificado sob demanda: o XML só é percorrido (via
+    iterparse) até o maior índice já pedido, liberando cada <si> após ler."""
+    def __init__(self, zf):
+        self._zf = zf
+        self._items = []
+        self._iter = None
+        self._file = None
+        self._root = None   # <sst>, capturado no primeiro evento 'start'
+        self._done = False
+
+    def _start(self):
+        try:
+            self._file = self._zf.open('xl/sharedStrings.xml')
+        except KeyError:
+            self._done = True
+            return
+        self._iter = ET.iterparse(self._file, events=('start', 'end'))
 
-    def _load_shared_strings(self):
-        strings = []
+    def _advance(self, index):
+        if self._iter is None and not self._done:
+            self._start()
         try:
-            xml_data = self._zf.read('xl/sharedStrings.xml')
-            root = ET.fromstring(xml_data)
-            for si in root.findall('ss:si', _XLSX_NS):
+            while not self._done and len(self._items) <= index:
+                event, elem = next(self._iter)
+                if event == 'start':
+                    if self._root is None and elem.tag.endswith('sst'):
+                        self._root = elem
+                    continue
+                if elem.tag != _TAG_SI:
+                    continue
                 # Texto pode estar em <t> direto ou em múltiplos <r><t>
                 parts = []
-                t_elem = si.find('ss:t', _XLSX_NS)
+                t_elem = elem.find('ss:t', _XLSX_NS)
                 if t_elem is not None and t_elem.text:
                     parts.append(t_elem.text)
                 else:
-                    for r_elem in si.findall('ss:r', _XLSX_NS):
+                    for r_elem in elem.findall('ss:r', _XLSX_NS):
                         rt = r_elem.find('ss:t', _XLSX_NS)
                         if rt is not None and rt.text:
                             parts.append(rt.text)
-                strings.append(''.join(parts))
-        except (KeyError, ET.ParseError):
-            pass
-        return strings
+                self._items.append(''.join(parts))
+                elem.clear()
+                if self._root is not None:
+                    self._root.clear()
+        except (StopIteration, ET.ParseError):
+            self.close()
+
+    def __getitem__(self, index):
+        if index < 0:
+            raise IndexError(index)
+        if index >= len(self._items):
+            self._advance(index)
+        return self._items[index]
+
+    def close(self):
+        self._done = True
+        self._iter = None
+        self._root = None
+        if self._file is not None:
+            try:
+                self._file.close()
+            except:
+                pass
+            self._file = None
+
+
+class _XlsxReader:
+    """Leitor leve de .xlsx usando apenas zipfile + ElementTree."""
+    def __init__(self, file_path):
+        self._zf = zipfile.ZipFile(file_path, 'r')
+        self._shared_strings = _LazySharedStrings(self._zf)
+        self._sheet_names, self._sheet_paths, self._print_areas = self._load_workbook_info()
 
     def _load_workbook_info(self):
         # Ler nomes das abas
@@ -169,94 +223,147 @@ class _XlsxReader:
         except:
             return rows, False
 
-    def read_sheet(self, sheet_name):
-        """Retorna lista de linhas (cada linha é uma lista de valores)."""
+    def _sheet_path(self, sheet_name):
         try:
             idx = self._sheet_names.index(sheet_name)
         except ValueError:
-            return []
-        path = self._sheet_paths[idx]
-        if not path:
-            return []
+            return None
+        return self._sheet_paths[idx] or None
+
+    def _cell_value(self, cell):
+        cell_type = cell.get('t', '')
+        v_elem = cell.find('ss:v', _XLSX_NS)
+        value = None
 
+        if v_elem is not None and v_elem.text is not None:
+            raw = v_elem.text
+            if cell_type == 's':  # shared string
+                try:
+                    value = self._shared_strings[int(raw)]
+                except (IndexError, ValueError):
+                    value = raw
+            elif cell_type == 'b':  # boolean
+                value = 'Yes' if raw == '1' else 'No'
+            elif cell_type == 'inlineStr':
+                is_elem = cell.find('ss:is/ss:t', _XLSX_NS)
+                value = is_elem.text if is_elem is not None else raw
+            else:  # number
+                try:
+                    fval = float(raw)
+                    value = int(fval) if fval == int(fval) else fval
+                except ValueError:
+                    value = raw
+        else:
+            # Inline string sem <v>
+            is_elem = cell.find('ss:is/ss:t', _XLSX_NS)
+            if is_elem is not None:
+                value = is_elem.text
+        return value
+
+    def iter_rows(self, sheet_name, max_col=None):
+        """Gera as linhas da aba (tuplas de valores) em streaming com iterparse.
+        Cada <row> é descartado após a leitura, então a memória não cresce com o
+        tamanho da aba. Linhas ausentes no XML saem como linhas vazias para manter
+        a numeração. Sem max_col, cada tupla vai até a última célula da linha;
+        com max_col, todas têm exatamente max_col colunas."""
+        path = self._sheet_path(sheet_name)
+        if not path:
+            return
         try:
-            xml_data = self._zf.read(path)
+            fh = self._zf.open(path)
         except KeyError:
-            return []
+            return
 
-        root = ET.fromstring(xml_data)
-        rows_dict = {}  # row_num -> {col_idx: value}
-        max_col = 0
+        empty_row = tuple([None] * max_col) if max_col else ()
+        next_row = 1
+        sheet_data = None
+        try:
+            for event, elem in ET.iterparse(fh, events=('start', 'end')):
+                if event == 'start':
+                    if sheet_data is None and elem.tag == _TAG_SHEETDATA:
+                        sheet_data = elem
+                    continue
+                if elem.tag != _TAG_ROW:
+                    continue
 
-        for row_elem in root.findall('.//ss:row', _XLSX_NS):
-            row_num = int(row_elem.get('r', '0'))
-            if row_num == 0:
-                continue
-            cells = {}
-            for cell in row_elem.findall('ss:c', _XLSX_NS):
-                ref = cell.get('r', '')
-                if not ref:
+                row_num = int(elem.get('r', '0'))
+                if row_num == 0:
+                    elem.clear()
                     continue
-                col_idx, _ = _parse_cell_ref(ref)
-                if col_idx > max_col:
-                    max_col = col_idx
 
-                cell_type = cell.get('t', '')
-                v_elem = cell.find('ss:v', _XLSX_NS)
-                value = None
+                cells = {}
+                width = 0
+                for cell in elem.findall('ss:c', _XLSX_NS):
+                    ref = cell.get('r', '')
+                    if not ref:
+                        continue
+                    col_idx, _ = _parse_cell_ref(ref)
+                    if max_col is not None and col_idx >= max_col:
+                        continue
+                    cells[col_idx] = self._cell_value(cell)
+                    if col_idx + 1 > width:
+                        width = col_idx + 1
+
+                elem.clear()
+                if sheet_data is not None:
+                    sheet_data.clear()
+
+                while next_row < row_num:
+                    yield empty_row
+                    next_row += 1
+                if max_col is not None:
+                    width = max_col
+                yield tuple([cells.get(c) for c in range(width)])
+                next_row = row_num + 1
+        finally:
+            try:
+                fh.close()
+            except:
+                pass
 
-                if v_elem is not None and v_elem.text is not None:
-                    raw = v_elem.text
-                    if cell_type == 's':  # shared string
-                        try:
-                            value = self._shared_strings[int(raw)]
-                        except (IndexError, ValueError):
-                            value = raw
-                    elif cell_type == 'b':  # boolean
-                        value = 'Yes' if raw == '1' else 'No'
-                    elif cell_type == 'inlineStr':
-                        is_elem = cell.find('ss:is/ss:t', _XLSX_NS)
-                        value = is_elem.text if is_elem is not None else raw
-                    else:  # number
-                        try:
-                            fval = float(raw)
-                            value = int(fval) if fval == int(fval) else fval
-                        except ValueError:
-                            value = raw
-                else:
-                    # Inline string sem <v>
-                    is_elem = cell.find('ss:is/ss:t', _XLSX_NS)
-                    if is_elem is not None:
-                        value = is_elem.text
+    def read_header(self, sheet_name):
+        """Primeira linha da aba (None se a aba não tem linhas). O parse para logo
+        após o primeiro <row>, então abas grandes não são lidas por inteiro."""
+        rows = self.iter_rows(sheet_name)
+        try:
+            return next(rows, None)
+        finally:
+            rows.close()
 
-                cells[col_idx] = value
-            rows_dict[row_num] = cells
+    def is_importable(self, sheet_name):
+        """Aba exportada pelo LF Tools: "ElementId" na célula A1."""
+        return _is_element_id_header(self.read_header(sheet_name))
 
-        if not rows_dict:
+    def read_sheet(self, sheet_name):
+        """Retorna lista de linhas (cada linha é uma tupla de valores, todas com a mesma largura)."""
+        rows = list(self.iter_rows(sheet_name))
+        if not rows:
             return []
-
-        # Montar lista de linhas densas
-        max_row = max(rows_dict.keys())
-        num_cols = max_col + 1
-        result = []
-        for r in range(1, max_row + 1):
-            row_cells = rows_dict.get(r, {})
-            row = [row_cells.get(c) for c in range(num_cols)]
-            result.append(tuple(row))
-        return result
+        num_cols = max(1, max(len(r) for r in rows))
+        pad = (None,) * num_cols
+        return [r + pad[len(r):] if len(r) < num_cols else r for r in rows]
 
     def close(self):
+        self._shared_strings.close()
         try:
             self._zf.close()
         except:
             pass
 import io
 import re
+import hashlib
+import threading
 import traceback
 import gc
 import unicodedata
 
 from collections import namedtuple
+try:
+    import Queue as _queue
+except ImportError:
+    import queue as _queue
+from lf_utils import LRUCache
+from lf_revit import get_schema_cache
 import clr
 clr.AddReference("PresentationFramework")
 clr.AddReference("PresentationCore")
@@ -402,6 +509,11 @@ _param_def_cache = {}
 _element_cache = {}
 _format_pool = {}
 
+# Resolvedor de parâmetros: estratégia que encontrou o parâmetro por
+# (categoria, tipo, campo) e valores de parâmetros de tipo, lidos uma vez por tipo
+_param_strategy_cache = LRUCache(4096)
+_type_value_cache = LRUCache(8192)
+
 def setup_memory_optimization():
     gc.enable()
 
@@ -418,6 +530,8 @@ def clear_all_caches():
         _param_def_cache.clear()
         _element_cache.clear()
         _format_pool.clear()
+        _param_strategy_cache.clear()
+        _type_value_cache.clear()
     except:
         pass
 
@@ -1147,6 +1261,11 @@ def get_schedule_elements_and_params(schedule):
     
     schedule_id_val = schedule.Id.IntegerValue
 
+    # Esquema por (categoria, tipo), em cache entre execuções: cada tipo distinto
+    # da amostra é lido uma vez e os campos saem direto dele
+    schema = get_schema_cache(doc).merged(elements[:500])
+    schema_by_id = dict((info.id, info) for info in schema.values())
+
     for field in visible_fields:
         field_name = field.GetName()
         if not field_name:
@@ -1164,6 +1283,24 @@ def get_schedule_elements_and_params(schedule):
         param_id = field.ParameterId
         param_info = None
 
+        info = None
+        if param_id and param_id != DB.ElementId.InvalidElementId:
+            info = schema_by_id.get(param_id.IntegerValue)
+        if info is None:
+            info = schema.get(field_name)
+        if info is not None:
+            param_def = ParamDef(
+                name=field_name,
+                istype=False,
+                definition=info.definition,
+                isreadonly=info.read_only,
+                isunit=info.measurable,
+                storagetype=info.storage_type,
+            )
+            param_defs_list.append(param_def)
+            _param_def_cache[param_cache_key] = param_def
+            continue
+
         # Tentar múltiplos elementos para encontrar a definição do parâmetro.
         # Usando mais amostras pois alguns parâmetros só existem em certos elementos.
         sample_elements = elements[:min(15, len(elements))]
@@ -1238,74 +1375,124 @@ def get_schedule_elements_and_params(schedule):
     
     return result
 
-def get_element_parameter_value(el, param_def, param_cache=None):
-    """Obtém valor de parâmetro com cache simples."""
-    if param_cache is None:
-        param_cache = {}
-    
-    param_name = param_def.name
-    cache_key = (el.Id.IntegerValue, param_name)
-    
-    # Cache L1: Por elemento/parâmetro
-    cached_value = param_cache.get(cache_key)
-    if cached_value is not None:
-        return cached_value
-    
+# Estratégias de busca, na ordem em que são tentadas
+_STRATEGY_DEFINITION = 0   # el.get_Parameter(definition)
+_STRATEGY_LOOKUP = 1       # el.LookupParameter(nome)
+_STRATEGY_SCAN = 2         # varredura de el.Parameters
+_STRATEGY_TYPE = 3         # LookupParameter no tipo do elemento
+_INSTANCE_STRATEGIES = (_STRATEGY_DEFINITION, _STRATEGY_LOOKUP, _STRATEGY_SCAN)
+
+def _find_instance_parameter(el, param_def, strategy):
+    try:
+        if strategy == _STRATEGY_DEFINITION:
+            if param_def.definition and hasattr(el, 'get_Parameter'):
+                return el.get_Parameter(param_def.definition)
+        elif strategy == _STRATEGY_LOOKUP:
+            if hasattr(el, 'LookupParameter'):
+                return el.LookupParameter(param_def.name)
+        elif hasattr(el, 'Parameters'):
+            for param in el.Parameters:
+                try:
+                    if param.Definition.Name == param_def.name:
+                        return param
+                except:
+                    continue
+    except:
+        pass
+    return None
+
+_NOT_CACHED = object()
+
+def _type_parameter_value(el, param_def):
+    """Valor do parâmetro no tipo do elemento, lido uma vez por (tipo, campo).
+    None quando o tipo não tem o parâmetro (ou ele está sem valor)."""
+    try:
+        type_id = el.GetTypeId()
+    except:
+        return None
+    if not type_id or type_id == DB.ElementId.InvalidElementId:
+        return None
+    key = (type_id.IntegerValue, param_def.name)
+    value = _type_value_cache.get(key, _NOT_CACHED)
+    if value is not _NOT_CACHED:
+        return value
+    value = None
+    try:
+        el_type = doc.GetElement(type_id)
+        if el_type:
+            tp = el_type.LookupParameter(param_def.name)
+            if tp and tp.HasValue:
+                value = get_parameter_value(tp, param_def)
+    except:
+        pass
+    _type_value_cache.put(key, value)
+    return value
+
+def _strategy_key(el, param_def):
+    try:
+        cat_id = el.Category.Id.IntegerValue if el.Category else -1
+    except:
+        cat_id = -1
+    try:
+        type_id = el.GetTypeId().IntegerValue
+    except:
+        type_id = -1
+    return (cat_id, type_id, param_def.name)
+
+def _resolve_parameter_value(el, param_def):
+    """Cadeia completa: instância (definição, nome, varredura) e depois o tipo.
+    Retorna (valor, estratégia que localizou o parâmetro ou None)."""
     value = ""
-    
-    # Cache L2: Elemento já carregado?
-    element_key = el.Id.IntegerValue
-    cached_element = _element_cache.get(element_key)
-    if not cached_element:
-        _element_cache[element_key] = el
-    
-    # Extrair valor — tentar múltiplas estratégias
-    if param_def.definition and hasattr(el, 'get_Parameter'):
-        try:
-            param = el.get_Parameter(param_def.definition)
-            if param and param.HasValue:
-                value = get_parameter_value(param, param_def)
-        except:
-            pass
-    
-    if not value and hasattr(el, 'LookupParameter'):
-        try:
-            param = el.LookupParameter(param_name)
-            if param and param.HasValue:
-                value = get_parameter_value(param, param_def)
-        except:
-            pass
-    
-    if not value and hasattr(el, 'Parameters'):
-        for param in el.Parameters:
-            try:
-                if param.Definition.Name == param_name:
-                    if param.HasValue:
-                        value = get_parameter_value(param, param_def)
-                    break
-            except:
-                continue
-    
-    # Fallback: tentar parâmetro no Type
-    if not value:
-        try:
-            type_id = el.GetTypeId()
-            if type_id and type_id != DB.ElementId.InvalidElementId:
-                el_type = doc.GetElement(type_id)
-                if el_type:
-                    tp = el_type.LookupParameter(param_name)
-                    if tp and tp.HasValue:
-                        value = get_parameter_value(tp, param_def)
-        except:
-            pass
-    
-    # Armazenar em cache
-    param_cache[cache_key] = value
-    
-    # Limpeza periódica do cache — threshold maior para evitar perda
-    if len(param_cache) > 10000:
-        param_cache.clear()
-    
+    located = None
+    for strategy in _INSTANCE_STRATEGIES:
+        param = _find_instance_parameter(el, param_def, strategy)
+        if param is None:
+            continue
+        if located is None:
+            located = strategy
+        if param.HasValue:
+            value = get_parameter_value(param, param_def)
+            if value:
+                return value, strategy
+    type_value = _type_parameter_value(el, param_def)
+    if type_value is not None:
+        value = type_value
+        if located is None:
+            located = _STRATEGY_TYPE
+    return value, located
+
+def get_element_parameter_value(el, param_def, param_cache=None):
+    """Obtém valor de parâmetro. A estratégia que localiza o parâmetro é aprendida
+    por (categoria, tipo, campo) e usada direto nos elementos seguintes; a cadeia
+    completa só roda quando ela não acha o parâmetro. param_cache: LRUCache opcional."""
+    cache_key = (el.Id.IntegerValue, param_def.name)
+    if param_cache is not None:
+        cached_value = param_cache.get(cache_key)
+        if cached_value is not None:
+            return cached_value
+
+    skey = _strategy_key(el, param_def)
+    strategy = _param_strategy_cache.get(skey)
+    value = None
+
+    if strategy == _STRATEGY_TYPE:
+        value = _type_parameter_value(el, param_def)
+    elif strategy is not None:
+        param = _find_instance_parameter(el, param_def, strategy)
+        if param is not None:
+            value = get_parameter_value(param, param_def) if param.HasValue else ""
+            if not value:
+                type_value = _type_parameter_value(el, param_def)
+                if type_value is not None:
+                    value = type_value
+
+    if value is None:
+        value, strategy = _resolve_parameter_value(el, param_def)
+        if strategy is not None:
+            _param_strategy_cache.put(skey, strategy)
+
+    if param_cache is not None:
+        param_cache.put(cache_key, value)
     return value
 
 def get_parameter_value(param, param_def=None):
@@ -1430,183 +1617,461 @@ def get_schedule_visual_table(schedule):
 
 
 # ==================== EXPORTAÇÃO OTIMIZADA ====================
-def export_xls(targets, file_path, formatted=False):
-    """Exporta dados para Excel com múltiplas abas se necessário."""
-    workbook = None
-    try:
-        # Configurar workbook com otimizações
-        has_panel_schedule = any([t.get('is_panel', False) for t in targets])
-        workbook_options = {
-            'constant_memory': not has_panel_schedule,
-            'use_zip64': True,
-        }
-        
-        workbook = xlsxwriter.Workbook(file_path, workbook_options)
-        
-        # Pool de formatos globais (reutilizados entre abas)
-        fmt_head_panel = get_excel_format(workbook, {
-            "bold": True, 
-            "bg_color": "#4F81BD", 
-            "font_color": "white", 
-            "border": 1, 
-            "align": "center"
-        })
-        fmt_data_panel = get_excel_format(workbook, {"border": 1, "align": "left"})
-        fmt_panel_title = get_excel_format(workbook, {
-            "bold": True, "font_size": 14, "bg_color": "#D9EAD3",
+# ==================== EXPORTAÇÃO EM PIPELINE ====================
+# Produtor/consumidor: a thread do Revit só extrai valores (a API do Revit não é
+# thread-safe); a thread de escrita é dona do Workbook, formata/escreve as células
+# e faz a serialização XML + zip no final. Funções _xl_* rodam na thread de escrita.
+_EXPORT_CHUNK_ROWS = 250     # linhas por tarefa enviada à thread de escrita
+_EXPORT_MAX_PENDING = 8      # tarefas na fila antes de a extração esperar
+
+def _create_export_formats(workbook, formatted):
+    """Formatos globais do export (reutilizados entre abas), por nome."""
+    # Pool de formatos globais (reutilizados entre abas)
+    fmt_head_panel = get_excel_format(workbook, {
+        "bold": True, 
+        "bg_color": "#4F81BD", 
+        "font_color": "white", 
+        "border": 1, 
+        "align": "center"
+    })
+    fmt_data_panel = get_excel_format(workbook, {"border": 1, "align": "left"})
+    fmt_panel_title = get_excel_format(workbook, {
+        "bold": True, "font_size": 14, "bg_color": "#D9EAD3",
+        "border": 1, "align": "center", "valign": "vcenter",
+    })
+    fmt_panel_info = get_excel_format(workbook, {
+        "bold": True, "bg_color": "#E2F0D9", "border": 1,
+        "align": "left", "valign": "vcenter",
+    })
+    fmt_panel_header = get_excel_format(workbook, {
+        "bold": True, "bg_color": "#B7E1A1", "border": 1,
+        "align": "center", "valign": "vcenter", "text_wrap": True,
+    })
+    fmt_panel_text = get_excel_format(workbook, {
+        "border": 1, "align": "left", "valign": "vcenter",
+    })
+    fmt_panel_num = get_excel_format(workbook, {
+        "border": 1, "align": "center", "valign": "vcenter",
+        "num_format": "#,##0.00",
+    })
+    fmt_panel_int = get_excel_format(workbook, {
+        "border": 1, "align": "center", "valign": "vcenter",
+        "num_format": "0",
+    })
+
+    fmt_bold = get_excel_format(workbook, {"bold": True})
+    fmt_lock_ro = get_excel_format(workbook, {
+        "locked": True, 
+        "font_color": "#C0504D", 
+        "italic": True
+    })
+    fmt_lock_id = get_excel_format(workbook, {
+        "locked": True, 
+        "font_color": "#95B3D7", 
+        "italic": True
+    })
+    fmt_unlock = get_excel_format(workbook, {"locked": False})
+    fmt_head_id = get_excel_format(workbook, {
+        "bold": True, 
+        "bg_color": "#DCE6F1", 
+        "font_color": "#1F4E78"
+    })
+    fmt_head_ro = get_excel_format(workbook, {
+        "bold": True, 
+        "bg_color": "#FFC7CE", 
+        "font_color": "#9C0006"
+    })
+
+    # Formatos extras para modo formatado (visual)
+    if formatted:
+        fmt_head_vis = get_excel_format(workbook, {
+            "bold": True, "bg_color": "#1F4E78", "font_color": "white",
             "border": 1, "align": "center", "valign": "vcenter",
         })
-        fmt_panel_info = get_excel_format(workbook, {
-            "bold": True, "bg_color": "#E2F0D9", "border": 1,
-            "align": "left", "valign": "vcenter",
-        })
-        fmt_panel_header = get_excel_format(workbook, {
-            "bold": True, "bg_color": "#B7E1A1", "border": 1,
-            "align": "center", "valign": "vcenter", "text_wrap": True,
+        fmt_data_vis = get_excel_format(workbook, {
+            "border": 1, "align": "left", "valign": "vcenter",
         })
-        fmt_panel_text = get_excel_format(workbook, {
+        fmt_data_alt = get_excel_format(workbook, {
             "border": 1, "align": "left", "valign": "vcenter",
+            "bg_color": "#EBF3FB",
         })
-        fmt_panel_num = get_excel_format(workbook, {
-            "border": 1, "align": "center", "valign": "vcenter",
-            "num_format": "#,##0.00",
+
+    return dict((k, v) for k, v in locals().items() if k.startswith('fmt_'))
+
+class _ExportContext(object):
+    """Estado da thread de escrita: workbook, formatos e a aba de dados em andamento."""
+    def __init__(self, workbook, formats):
+        self.workbook = workbook
+        self.fmt = formats
+        self.meta_rows = []
+        self.sheet = None
+
+class _ExcelWriterThread(object):
+    """Consumidor do pipeline de exportação. Executa as tarefas fn(ctx, *args) na
+    ordem em que chegam por uma fila limitada e, ao terminar, fecha o workbook.
+    Um erro numa tarefa é guardado em .error e as seguintes são descartadas (a fila
+    continua sendo drenada para não travar o produtor)."""
+    _STOP = object()
+
+    def __init__(self, file_path, options, formatted, max_pending=_EXPORT_MAX_PENDING):
+        self._args = (file_path, options, formatted)
+        self._queue = _queue.Queue(max_pending)
+        self.error = None
+        self.close_error = None
+        self._thread = threading.Thread(target=self._run, name="LFExcelWriter")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, fn, *args):
+        if self.error is not None:
+            raise self.error
+        self._queue.put((fn, args))
+
+    def finish(self):
+        """Fecha a fila e espera a thread gravar o arquivo."""
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+    def _run(self):
+        workbook = None
+        ctx = None
+        try:
+            file_path, options, formatted = self._args
+            workbook = xlsxwriter.Workbook(file_path, options)
+            ctx = _ExportContext(workbook, _create_export_formats(workbook, formatted))
+        except Exception as e:
+            self.error = e
+
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                break
+            if self.error is not None:
+                continue
+            fn, args = item
+            try:
+                fn(ctx, *args)
+            except Exception as e:
+                self.error = e
+
+        if workbook is not None:
+            try:
+                workbook.close()
+            except Exception as e:
+                self.close_error = e
+
+def _xl_write_panel_sheet(ctx, sheet_name, src_elements, file_path, formatted):
+    """Quadro de cargas (row_data já é Python puro: a aba inteira sai daqui)."""
+    workbook = ctx.workbook
+    fmt_panel_title = ctx.fmt['fmt_panel_title']
+    fmt_panel_info = ctx.fmt['fmt_panel_info']
+    fmt_panel_header = ctx.fmt['fmt_panel_header']
+    fmt_panel_text = ctx.fmt['fmt_panel_text']
+    fmt_panel_num = ctx.fmt['fmt_panel_num']
+    fmt_panel_int = ctx.fmt['fmt_panel_int']
+
+    ws = workbook.add_worksheet(sheet_name)
+
+    if formatted:
+        ws.set_tab_color("#70AD47")
+        ws.freeze_panes(5, 0)
+        ws.set_column(0, 0, 3)
+        ws.set_column(1, 1, 8)
+        ws.set_column(2, 5, 12)
+        ws.set_column(6, 6, 8)
+        ws.set_column(7, 7, 13)
+        ws.set_column(8, 8, 12)
+        ws.set_column(9, 9, 12)
+        ws.set_column(10, 10, 12)
+        ws.set_column(11, 11, 12)
+        ws.set_column(12, 12, 22)
+        ws.set_column(13, 13, 18)
+
+        ws.merge_range(0, 1, 0, 13, "ESTUDO DE CARGAS", fmt_panel_title)
+        ws.write(1, 1, "OBRA: " + sanitize_filename(os.path.splitext(os.path.basename(file_path))[0]), fmt_panel_text)
+        ws.write(2, 1, u"Responsável: ", fmt_panel_text)
+        ws.write(3, 1, "Representa a carga total do(a): " + sheet_name, fmt_panel_text)
+
+        headers_panel = [
+            u"Ítem", u"Descrição equipamento", "Quant.",
+            u"Carga \nUnitária\n(W)", u"Carga\nTotal\n(W)",
+            u"Fator de \nDemanda", u"Fator de \nPotência",
+            u"Carga \nDem.\n(VA)", u"Seção do Condutor\nAdotado",
+            u"Proteção\nAdotada"
+        ]
+        ws.write(4, 1, headers_panel[0], fmt_panel_header)
+        ws.merge_range(4, 2, 4, 5, headers_panel[1], fmt_panel_header)
+        for col, label in [(6, headers_panel[2]), (7, headers_panel[3]),
+                           (8, headers_panel[4]), (9, headers_panel[5]),
+                           (10, headers_panel[6]), (11, headers_panel[7]),
+                           (12, headers_panel[8]), (13, headers_panel[9])]:
+            ws.write(4, col, label, fmt_panel_header)
+        ws.set_row(4, 42)
+
+        # Passagem 1: acumula dados por classificacao para saber a linha
+        # de cada classificacao na aba de resumo antes de escrever a principal.
+        summary_data = {}
+        for el in src_elements:
+            if not hasattr(el, 'row_data'):
+                continue
+            data = el.row_data
+            cls_name = data.get('Classificacao', '') or u'Sem classificacao'
+            if cls_name not in summary_data:
+                summary_data[cls_name] = {'count': 0, 'installed_w': 0.0, 'fds': []}
+            summary_data[cls_name]['count'] += 1
+            try:
+                q = float(_clean_number(data.get('Quant.'), 1) or 1)
+                uw = float(_clean_number(data.get(u'Carga Unitária (W)'), 0) or 0)
+                fd = float(_clean_number(data.get('Fator de Demanda'), 1) or 1)
+                summary_data[cls_name]['installed_w'] += q * uw
+                summary_data[cls_name]['fds'].append(fd)
+            except:
+                pass
+
+        # Linha Excel (1-indexed) de cada classificacao na aba de resumo:
+        # linha 1 = cabecalho, dados comecam na linha 2.
+        cls_sorted = sorted(summary_data.keys(), key=lambda cls: _panel_load_group_order(cls))
+        cls_excel_row = {cls: (i + 2) for i, cls in enumerate(cls_sorted)}
+
+        # Passagem 2: escreve aba principal com FD referenciando a aba de resumo.
+        current_panel = None
+        row = 5
+        for el in src_elements:
+            if not hasattr(el, 'row_data'):
+                continue
+            data = el.row_data
+            panel_name = data.get('Nome do Quadro', sheet_name)
+            if panel_name != current_panel:
+                current_panel = panel_name
+                ws.merge_range(row, 2, row, 5, "Painel: " + str(panel_name), fmt_panel_info)
+                for col in [1, 6, 7, 8, 9, 10, 11, 12, 13]:
+                    ws.write(row, col, "", fmt_panel_info)
+                row += 1
+
+            excel_row = row + 1
+            qty = _clean_number(data.get('Quant.'), 1)
+            unit_w = _clean_number(data.get(u'Carga Unitária (W)'), "")
+            demand = _clean_number(data.get('Fator de Demanda'), 1)
+            power_factor = _clean_number(data.get(u'Fator de Potência'), 1)
+            cls_name = data.get('Classificacao', '') or u'Sem classificacao'
+            fd_row = cls_excel_row.get(cls_name)
+
+            ws.write(row, 1, data.get(u'Ítem', ""), fmt_panel_text)
+            ws.merge_range(row, 2, row, 5, data.get(u'Descrição equipamento', ""), fmt_panel_text)
+            ws.write(row, 6, qty, fmt_panel_int)
+            ws.write(row, 7, unit_w, fmt_panel_num)
+            ws.write_formula(row, 8, "=H{0}*G{0}".format(excel_row), fmt_panel_num)
+            if fd_row:
+                ws.write_formula(row, 9,
+                    u"='Classif. de Cargas'!D{}".format(fd_row),
+                    fmt_panel_num, float(demand or 1))
+            else:
+                ws.write(row, 9, demand, fmt_panel_num)
+            ws.write(row, 10, power_factor, fmt_panel_num)
+            ws.write_formula(row, 11, "=IF(K{0}=0,0,(G{0}*H{0}*J{0})/K{0})".format(excel_row), fmt_panel_num)
+            ws.write(row, 12, data.get(u'Seção do Condutor Adotado', ""), fmt_panel_text)
+            ws.write(row, 13, data.get(u'Proteção Adotada', ""), fmt_panel_text)
+            row += 1
+
+        if summary_data:
+            ws_sum = workbook.add_worksheet(u"Classif. de Cargas")
+            ws_sum.set_tab_color("#ED7D31")
+            ws_sum.freeze_panes(1, 0)
+            ws_sum.set_row(0, 36)
+            fmt_sum_total = get_excel_format(workbook, {
+                "bold": True, "bg_color": "#B7E1A1", "border": 1,
+                "align": "left", "valign": "vcenter",
+            })
+            sum_cols = [
+                u"Classificação de Carga",
+                u"Qtd. Circuitos",
+                u"Pot. Instalada (W)",
+                u"Fator de Demanda",
+                u"Pot. Demandada (W)",
+            ]
+            for c, h in enumerate(sum_cols):
+                ws_sum.write(0, c, h, fmt_panel_header)
+            widths_sum = [len(h) + 2 for h in sum_cols]
+            sum_row = 1
+            for cls_key in cls_sorted:
+                sd = summary_data[cls_key]
+                inst = round(sd['installed_w'], 2)
+                fds = sd['fds']
+                fd_disp = max(set(fds), key=fds.count) if fds else 1.0
+                excel_sum_row = sum_row + 1  # 1-indexed para formula
+                ws_sum.write(sum_row, 0, cls_key, fmt_panel_text)
+                ws_sum.write(sum_row, 1, sd['count'], fmt_panel_int)
+                ws_sum.write(sum_row, 2, inst, fmt_panel_num)
+                ws_sum.write(sum_row, 3, fd_disp, fmt_panel_num)
+                # Pot. Demandada = Pot. Instalada * FD — formula reativa
+                ws_sum.write_formula(sum_row, 4,
+                    "=C{0}*D{0}".format(excel_sum_row),
+                    fmt_panel_num, round(inst * fd_disp, 2))
+                sum_row += 1
+                if len(cls_key) > widths_sum[0]:
+                    widths_sum[0] = min(len(cls_key), 45)
+            last_data_row = sum_row  # linha do total (1-indexed = sum_row+1)
+            ws_sum.write(sum_row, 0, "TOTAL", fmt_sum_total)
+            ws_sum.write(sum_row, 1,
+                sum(sd['count'] for sd in summary_data.values()), fmt_panel_int)
+            ws_sum.write_formula(sum_row, 2,
+                "=SUM(C2:C{})".format(last_data_row), fmt_panel_num)
+            ws_sum.write(sum_row, 3, "", fmt_sum_total)
+            ws_sum.write_formula(sum_row, 4,
+                "=SUM(E2:E{})".format(last_data_row), fmt_panel_num)
+            for c, w in enumerate(widths_sum):
+                ws_sum.set_column(c, c, w + 2)
+
+    else:
+        # ── Quadro de cargas agrupado: mesmo visual do formatado + grupos e subtotais ────
+        from collections import OrderedDict
+
+        # Formatos exclusivos deste modo
+        fmt_grp_hdr = get_excel_format(workbook, {
+            "bold": True, "italic": True,
+            "bg_color": "#9DC3E6", "border": 1,
+            "align": "left", "valign": "vcenter", "font_size": 11,
         })
-        fmt_panel_int = get_excel_format(workbook, {
-            "border": 1, "align": "center", "valign": "vcenter",
-            "num_format": "0",
+        fmt_subtotal_txt = get_excel_format(workbook, {
+            "bold": True, "bg_color": "#E2EFDA", "border": 1,
+            "align": "left", "valign": "vcenter",
         })
-        
-        fmt_bold = get_excel_format(workbook, {"bold": True})
-        fmt_lock_ro = get_excel_format(workbook, {
-            "locked": True, 
-            "font_color": "#C0504D", 
-            "italic": True
+        fmt_subtotal_num = get_excel_format(workbook, {
+            "bold": True, "bg_color": "#E2EFDA", "border": 1,
+            "align": "center", "valign": "vcenter",
+            "num_format": "#,##0.00",
         })
-        fmt_lock_id = get_excel_format(workbook, {
-            "locked": True, 
-            "font_color": "#95B3D7", 
-            "italic": True
+        fmt_total_panel_txt = get_excel_format(workbook, {
+            "bold": True, "bg_color": "#B7E1A1", "border": 1,
+            "align": "left", "valign": "vcenter",
         })
-        fmt_unlock = get_excel_format(workbook, {"locked": False})
-        fmt_head_id = get_excel_format(workbook, {
-            "bold": True, 
-            "bg_color": "#DCE6F1", 
-            "font_color": "#1F4E78"
+        fmt_total_panel_num = get_excel_format(workbook, {
+            "bold": True, "bg_color": "#B7E1A1", "border": 1,
+            "align": "center", "valign": "vcenter",
+            "num_format": "#,##0.00",
         })
-        fmt_head_ro = get_excel_format(workbook, {
-            "bold": True, 
-            "bg_color": "#FFC7CE", 
-            "font_color": "#9C0006"
+        fmt_grand_total_txt = get_excel_format(workbook, {
+            "bold": True, "bg_color": "#70AD47", "font_color": "white",
+            "border": 1, "align": "left", "valign": "vcenter",
+        })
+        fmt_grand_total_num = get_excel_format(workbook, {
+            "bold": True, "bg_color": "#70AD47", "font_color": "white",
+            "border": 1, "align": "center", "valign": "vcenter",
+            "num_format": "#,##0.00",
         })
 
-        # Formatos extras para modo formatado (visual)
-        if formatted:
-            fmt_head_vis = get_excel_format(workbook, {
-                "bold": True, "bg_color": "#1F4E78", "font_color": "white",
-                "border": 1, "align": "center", "valign": "vcenter",
-            })
-            fmt_data_vis = get_excel_format(workbook, {
-                "border": 1, "align": "left", "valign": "vcenter",
-            })
-            fmt_data_alt = get_excel_format(workbook, {
-                "border": 1, "align": "left", "valign": "vcenter",
-                "bg_color": "#EBF3FB",
-            })
+        # Mesma estrutura de colunas do modo formatado
+        ws.set_tab_color("#70AD47")
+        ws.freeze_panes(5, 0)
+        ws.set_column(0, 0, 3)
+        ws.set_column(1, 1, 8)
+        ws.set_column(2, 5, 12)
+        ws.set_column(6, 6, 8)
+        ws.set_column(7, 7, 13)
+        ws.set_column(8, 8, 12)
+        ws.set_column(9, 9, 12)
+        ws.set_column(10, 10, 12)
+        ws.set_column(11, 11, 12)
+        ws.set_column(12, 12, 22)
+        ws.set_column(13, 13, 18)
+
+        ws.merge_range(0, 1, 0, 13, "ESTUDO DE CARGAS", fmt_panel_title)
+        ws.write(1, 1, "OBRA: " + sanitize_filename(os.path.splitext(os.path.basename(file_path))[0]), fmt_panel_text)
+        ws.write(2, 1, u"Responsável: ", fmt_panel_text)
+        ws.write(3, 1, "Representa a carga total do(a): " + sheet_name, fmt_panel_text)
+
+        headers_panel = [
+            u"Ítem", u"Descrição equipamento", "Quant.",
+            u"Carga \nUnitária\n(W)", u"Carga\nTotal\n(W)",
+            u"Fator de \nDemanda", u"Fator de \nPotência",
+            u"Carga \nDem.\n(VA)", u"Seção do Condutor\nAdotado",
+            u"Proteção\nAdotada"
+        ]
+        ws.write(4, 1, headers_panel[0], fmt_panel_header)
+        ws.merge_range(4, 2, 4, 5, headers_panel[1], fmt_panel_header)
+        for col, label in [(6, headers_panel[2]), (7, headers_panel[3]),
+                           (8, headers_panel[4]), (9, headers_panel[5]),
+                           (10, headers_panel[6]), (11, headers_panel[7]),
+                           (12, headers_panel[8]), (13, headers_panel[9])]:
+            ws.write(4, col, label, fmt_panel_header)
+        ws.set_row(4, 42)
+
+        # Passagem 1: acumular resumo por classificação (para aba Classif. de Cargas)
+        summary_data = {}
+        for el in src_elements:
+            if not hasattr(el, 'row_data'):
+                continue
+            data = el.row_data
+            cls_name = data.get('Classificacao', '') or u'Sem classificacao'
+            if cls_name not in summary_data:
+                summary_data[cls_name] = {'count': 0, 'installed_w': 0.0, 'fds': []}
+            summary_data[cls_name]['count'] += 1
+            try:
+                q = float(_clean_number(data.get('Quant.'), 1) or 1)
+                uw = float(_clean_number(data.get(u'Carga Unitária (W)'), 0) or 0)
+                fd = float(_clean_number(data.get('Fator de Demanda'), 1) or 1)
+                summary_data[cls_name]['installed_w'] += q * uw
+                summary_data[cls_name]['fds'].append(fd)
+            except:
+                pass
 
-        for target in targets:
-            sheet_name = sanitize_filename(target['name'])[:31] # Excel limita a 31 chars
-            src_elements = target['src']
-            selected_params = target['params']
-            is_panel_schedule = target.get('is_panel', False)
-
-            ws = workbook.add_worksheet(sheet_name)
-
-            if is_panel_schedule and formatted:
-                ws.set_tab_color("#70AD47")
-                ws.freeze_panes(5, 0)
-                ws.set_column(0, 0, 3)
-                ws.set_column(1, 1, 8)
-                ws.set_column(2, 5, 12)
-                ws.set_column(6, 6, 8)
-                ws.set_column(7, 7, 13)
-                ws.set_column(8, 8, 12)
-                ws.set_column(9, 9, 12)
-                ws.set_column(10, 10, 12)
-                ws.set_column(11, 11, 12)
-                ws.set_column(12, 12, 22)
-                ws.set_column(13, 13, 18)
-
-                ws.merge_range(0, 1, 0, 13, "ESTUDO DE CARGAS", fmt_panel_title)
-                ws.write(1, 1, "OBRA: " + sanitize_filename(os.path.splitext(os.path.basename(file_path))[0]), fmt_panel_text)
-                ws.write(2, 1, u"Responsável: ", fmt_panel_text)
-                ws.write(3, 1, "Representa a carga total do(a): " + sheet_name, fmt_panel_text)
-
-                headers_panel = [
-                    u"Ítem", u"Descrição equipamento", "Quant.",
-                    u"Carga \nUnitária\n(W)", u"Carga\nTotal\n(W)",
-                    u"Fator de \nDemanda", u"Fator de \nPotência",
-                    u"Carga \nDem.\n(VA)", u"Seção do Condutor\nAdotado",
-                    u"Proteção\nAdotada"
-                ]
-                ws.write(4, 1, headers_panel[0], fmt_panel_header)
-                ws.merge_range(4, 2, 4, 5, headers_panel[1], fmt_panel_header)
-                for col, label in [(6, headers_panel[2]), (7, headers_panel[3]),
-                                   (8, headers_panel[4]), (9, headers_panel[5]),
-                                   (10, headers_panel[6]), (11, headers_panel[7]),
-                                   (12, headers_panel[8]), (13, headers_panel[9])]:
-                    ws.write(4, col, label, fmt_panel_header)
-                ws.set_row(4, 42)
-
-                # Passagem 1: acumula dados por classificacao para saber a linha
-                # de cada classificacao na aba de resumo antes de escrever a principal.
-                summary_data = {}
-                for el in src_elements:
-                    if not hasattr(el, 'row_data'):
-                        continue
-                    data = el.row_data
-                    cls_name = data.get('Classificacao', '') or u'Sem classificacao'
-                    if cls_name not in summary_data:
-                        summary_data[cls_name] = {'count': 0, 'installed_w': 0.0, 'fds': []}
-                    summary_data[cls_name]['count'] += 1
-                    try:
-                        q = float(_clean_number(data.get('Quant.'), 1) or 1)
-                        uw = float(_clean_number(data.get(u'Carga Unitária (W)'), 0) or 0)
-                        fd = float(_clean_number(data.get('Fator de Demanda'), 1) or 1)
-                        summary_data[cls_name]['installed_w'] += q * uw
-                        summary_data[cls_name]['fds'].append(fd)
-                    except:
-                        pass
+        cls_sorted = sorted(summary_data.keys(), key=lambda cls: _panel_load_group_order(cls))
+        cls_excel_row = {cls: (i + 2) for i, cls in enumerate(cls_sorted)}
 
-                # Linha Excel (1-indexed) de cada classificacao na aba de resumo:
-                # linha 1 = cabecalho, dados comecam na linha 2.
-                cls_sorted = sorted(summary_data.keys(), key=lambda cls: _panel_load_group_order(cls))
-                cls_excel_row = {cls: (i + 2) for i, cls in enumerate(cls_sorted)}
+        # Passagem 2: agrupar circuitos por painel → classificação
+        panels_dict = OrderedDict()
+        for el in src_elements:
+            if not hasattr(el, 'row_data'):
+                continue
+            data = el.row_data
+            pname = data.get('Nome do Quadro', sheet_name)
+            cls = data.get('Classificacao', '') or u'Sem classificacao'
+            if pname not in panels_dict:
+                panels_dict[pname] = OrderedDict()
+            if cls not in panels_dict[pname]:
+                panels_dict[pname][cls] = []
+            panels_dict[pname][cls].append(data)
+
+        # Passagem 3: escrever na aba principal agrupado
+        row = 5
+        panel_total_rows = []
+
+        for pname, cls_groups in panels_dict.items():
+            # Sub-cabeçalho do painel (mesmo do modo formatado)
+            ws.merge_range(row, 2, row, 5, "Painel: " + str(pname), fmt_panel_info)
+            for col in [1, 6, 7, 8, 9, 10, 11, 12, 13]:
+                ws.write(row, col, "", fmt_panel_info)
+            row += 1
+
+            cls_sorted_local = sorted(
+                cls_groups.keys(),
+                key=lambda c: _panel_load_group_order(c)
+            )
+            panel_sub_total_rows = []
 
-                # Passagem 2: escreve aba principal com FD referenciando a aba de resumo.
-                current_panel = None
-                row = 5
-                for el in src_elements:
-                    if not hasattr(el, 'row_data'):
-                        continue
-                    data = el.row_data
-                    panel_name = data.get('Nome do Quadro', sheet_name)
-                    if panel_name != current_panel:
-                        current_panel = panel_name
-                        ws.merge_range(row, 2, row, 5, "Painel: " + str(panel_name), fmt_panel_info)
-                        for col in [1, 6, 7, 8, 9, 10, 11, 12, 13]:
-                            ws.write(row, col, "", fmt_panel_info)
-                        row += 1
+            for cls_name in cls_sorted_local:
+                circuits = cls_groups[cls_name]
+                fd_row = cls_excel_row.get(cls_name)
+
+                # Cabeçalho do grupo de classificação
+                ws.write(row, 1, "", fmt_grp_hdr)
+                ws.merge_range(row, 2, row, 13,
+                               u"  " + cls_name.upper(), fmt_grp_hdr)
+                ws.set_row(row, 20)
+                row += 1
 
+                group_first_row = row
+
+                for data in circuits:
                     excel_row = row + 1
                     qty = _clean_number(data.get('Quant.'), 1)
                     unit_w = _clean_number(data.get(u'Carga Unitária (W)'), "")
                     demand = _clean_number(data.get('Fator de Demanda'), 1)
                     power_factor = _clean_number(data.get(u'Fator de Potência'), 1)
-                    cls_name = data.get('Classificacao', '') or u'Sem classificacao'
-                    fd_row = cls_excel_row.get(cls_name)
 
                     ws.write(row, 1, data.get(u'Ítem', ""), fmt_panel_text)
-                    ws.merge_range(row, 2, row, 5, data.get(u'Descrição equipamento', ""), fmt_panel_text)
+                    ws.merge_range(row, 2, row, 5,
+                                   data.get(u'Descrição equipamento', ""), fmt_panel_text)
                     ws.write(row, 6, qty, fmt_panel_int)
                     ws.write(row, 7, unit_w, fmt_panel_num)
                     ws.write_formula(row, 8, "=H{0}*G{0}".format(excel_row), fmt_panel_num)
@@ -1617,462 +2082,317 @@ def export_xls(targets, file_path, formatted=False):
                     else:
                         ws.write(row, 9, demand, fmt_panel_num)
                     ws.write(row, 10, power_factor, fmt_panel_num)
-                    ws.write_formula(row, 11, "=IF(K{0}=0,0,(G{0}*H{0}*J{0})/K{0})".format(excel_row), fmt_panel_num)
+                    ws.write_formula(row, 11,
+                        "=IF(K{0}=0,0,(G{0}*H{0}*J{0})/K{0})".format(excel_row),
+                        fmt_panel_num)
                     ws.write(row, 12, data.get(u'Seção do Condutor Adotado', ""), fmt_panel_text)
                     ws.write(row, 13, data.get(u'Proteção Adotada', ""), fmt_panel_text)
                     row += 1
 
-                if summary_data:
-                    ws_sum = workbook.add_worksheet(u"Classif. de Cargas")
-                    ws_sum.set_tab_color("#ED7D31")
-                    ws_sum.freeze_panes(1, 0)
-                    ws_sum.set_row(0, 36)
-                    fmt_sum_total = get_excel_format(workbook, {
-                        "bold": True, "bg_color": "#B7E1A1", "border": 1,
-                        "align": "left", "valign": "vcenter",
-                    })
-                    sum_cols = [
-                        u"Classificação de Carga",
-                        u"Qtd. Circuitos",
-                        u"Pot. Instalada (W)",
-                        u"Fator de Demanda",
-                        u"Pot. Demandada (W)",
-                    ]
-                    for c, h in enumerate(sum_cols):
-                        ws_sum.write(0, c, h, fmt_panel_header)
-                    widths_sum = [len(h) + 2 for h in sum_cols]
-                    sum_row = 1
-                    for cls_key in cls_sorted:
-                        sd = summary_data[cls_key]
-                        inst = round(sd['installed_w'], 2)
-                        fds = sd['fds']
-                        fd_disp = max(set(fds), key=fds.count) if fds else 1.0
-                        excel_sum_row = sum_row + 1  # 1-indexed para formula
-                        ws_sum.write(sum_row, 0, cls_key, fmt_panel_text)
-                        ws_sum.write(sum_row, 1, sd['count'], fmt_panel_int)
-                        ws_sum.write(sum_row, 2, inst, fmt_panel_num)
-                        ws_sum.write(sum_row, 3, fd_disp, fmt_panel_num)
-                        # Pot. Demandada = Pot. Instalada * FD — formula reativa
-                        ws_sum.write_formula(sum_row, 4,
-                            "=C{0}*D{0}".format(excel_sum_row),
-                            fmt_panel_num, round(inst * fd_disp, 2))
-                        sum_row += 1
-                        if len(cls_key) > widths_sum[0]:
-                            widths_sum[0] = min(len(cls_key), 45)
-                    last_data_row = sum_row  # linha do total (1-indexed = sum_row+1)
-                    ws_sum.write(sum_row, 0, "TOTAL", fmt_sum_total)
-                    ws_sum.write(sum_row, 1,
-                        sum(sd['count'] for sd in summary_data.values()), fmt_panel_int)
-                    ws_sum.write_formula(sum_row, 2,
-                        "=SUM(C2:C{})".format(last_data_row), fmt_panel_num)
-                    ws_sum.write(sum_row, 3, "", fmt_sum_total)
-                    ws_sum.write_formula(sum_row, 4,
-                        "=SUM(E2:E{})".format(last_data_row), fmt_panel_num)
-                    for c, w in enumerate(widths_sum):
-                        ws_sum.set_column(c, c, w + 2)
-
-            elif is_panel_schedule:
-                # ── Quadro de cargas agrupado: mesmo visual do formatado + grupos e subtotais ────
-                from collections import OrderedDict
-
-                # Formatos exclusivos deste modo
-                fmt_grp_hdr = get_excel_format(workbook, {
-                    "bold": True, "italic": True,
-                    "bg_color": "#9DC3E6", "border": 1,
-                    "align": "left", "valign": "vcenter", "font_size": 11,
-                })
-                fmt_subtotal_txt = get_excel_format(workbook, {
-                    "bold": True, "bg_color": "#E2EFDA", "border": 1,
-                    "align": "left", "valign": "vcenter",
-                })
-                fmt_subtotal_num = get_excel_format(workbook, {
-                    "bold": True, "bg_color": "#E2EFDA", "border": 1,
-                    "align": "center", "valign": "vcenter",
-                    "num_format": "#,##0.00",
-                })
-                fmt_total_panel_txt = get_excel_format(workbook, {
-                    "bold": True, "bg_color": "#B7E1A1", "border": 1,
-                    "align": "left", "valign": "vcenter",
-                })
-                fmt_total_panel_num = get_excel_format(workbook, {
-                    "bold": True, "bg_color": "#B7E1A1", "border": 1,
-                    "align": "center", "valign": "vcenter",
-                    "num_format": "#,##0.00",
-                })
-                fmt_grand_total_txt = get_excel_format(workbook, {
-                    "bold": True, "bg_color": "#70AD47", "font_color": "white",
-                    "border": 1, "align": "left", "valign": "vcenter",
-                })
-                fmt_grand_total_num = get_excel_format(workbook, {
-                    "bold": True, "bg_color": "#70AD47", "font_color": "white",
-                    "border": 1, "align": "center", "valign": "vcenter",
-                    "num_format": "#,##0.00",
-                })
+                # Subtotal da classificação
+                g1 = group_first_row + 1   # 1-indexed
+                g2 = row                    # 1-indexed (row exclusivo → última linha = row-1+1)
+                ws.write(row, 1, "", fmt_subtotal_txt)
+                ws.merge_range(row, 2, row, 7,
+                               u"Subtotal — " + cls_name, fmt_subtotal_txt)
+                ws.write_formula(row, 8,
+                    "=SUM(I{0}:I{1})".format(g1, g2), fmt_subtotal_num)
+                ws.write(row, 9, "", fmt_subtotal_txt)
+                ws.write(row, 10, "", fmt_subtotal_txt)
+                ws.write_formula(row, 11,
+                    "=SUM(L{0}:L{1})".format(g1, g2), fmt_subtotal_num)
+                ws.write(row, 12, "", fmt_subtotal_txt)
+                ws.write(row, 13, "", fmt_subtotal_txt)
+                ws.set_row(row, 20)
+                panel_sub_total_rows.append(row)
+                row += 1
+
+            # Total do painel (soma dos subtotais)
+            if panel_sub_total_rows:
+                refs_i = "+".join(["I{}".format(r + 1) for r in panel_sub_total_rows])
+                refs_l = "+".join(["L{}".format(r + 1) for r in panel_sub_total_rows])
+                ws.write(row, 1, "", fmt_total_panel_txt)
+                ws.merge_range(row, 2, row, 7,
+                               u"TOTAL — " + pname, fmt_total_panel_txt)
+                ws.write_formula(row, 8, "=" + refs_i, fmt_total_panel_num)
+                ws.write(row, 9, "", fmt_total_panel_txt)
+                ws.write(row, 10, "", fmt_total_panel_txt)
+                ws.write_formula(row, 11, "=" + refs_l, fmt_total_panel_num)
+                ws.write(row, 12, "", fmt_total_panel_txt)
+                ws.write(row, 13, "", fmt_total_panel_txt)
+                ws.set_row(row, 22)
+                panel_total_rows.append(row)
+                row += 2  # linha de total + linha em branco entre painéis
+
+        # Total geral (apenas quando há mais de um painel)
+        if len(panel_total_rows) > 1:
+            refs_i = "+".join(["I{}".format(r + 1) for r in panel_total_rows])
+            refs_l = "+".join(["L{}".format(r + 1) for r in panel_total_rows])
+            ws.write(row, 1, "", fmt_grand_total_txt)
+            ws.merge_range(row, 2, row, 7, u"TOTAL GERAL", fmt_grand_total_txt)
+            ws.write_formula(row, 8, "=" + refs_i, fmt_grand_total_num)
+            ws.write(row, 9, "", fmt_grand_total_txt)
+            ws.write(row, 10, "", fmt_grand_total_txt)
+            ws.write_formula(row, 11, "=" + refs_l, fmt_grand_total_num)
+            ws.write(row, 12, "", fmt_grand_total_txt)
+            ws.write(row, 13, "", fmt_grand_total_txt)
+            ws.set_row(row, 24)
+
+        # Aba "Classif. de Cargas" — idêntica ao modo formatado
+        if summary_data:
+            ws_sum = workbook.add_worksheet(u"Classif. de Cargas")
+            ws_sum.set_tab_color("#ED7D31")
+            ws_sum.freeze_panes(1, 0)
+            ws_sum.set_row(0, 36)
+            fmt_sum_total = get_excel_format(workbook, {
+                "bold": True, "bg_color": "#B7E1A1", "border": 1,
+                "align": "left", "valign": "vcenter",
+            })
+            sum_cols = [
+                u"Classificação de Carga",
+                u"Qtd. Circuitos",
+                u"Pot. Instalada (W)",
+                u"Fator de Demanda",
+                u"Pot. Demandada (W)",
+            ]
+            for c, h in enumerate(sum_cols):
+                ws_sum.write(0, c, h, fmt_panel_header)
+            widths_sum = [len(h) + 2 for h in sum_cols]
+            sum_row = 1
+            for cls_key in cls_sorted:
+                sd = summary_data[cls_key]
+                inst = round(sd['installed_w'], 2)
+                fds = sd['fds']
+                fd_disp = max(set(fds), key=fds.count) if fds else 1.0
+                excel_sum_row = sum_row + 1
+                ws_sum.write(sum_row, 0, cls_key, fmt_panel_text)
+                ws_sum.write(sum_row, 1, sd['count'], fmt_panel_int)
+                ws_sum.write(sum_row, 2, inst, fmt_panel_num)
+                ws_sum.write(sum_row, 3, fd_disp, fmt_panel_num)
+                ws_sum.write_formula(sum_row, 4,
+                    "=C{0}*D{0}".format(excel_sum_row),
+                    fmt_panel_num, round(inst * fd_disp, 2))
+                sum_row += 1
+                if len(cls_key) > widths_sum[0]:
+                    widths_sum[0] = min(len(cls_key), 45)
+            last_data_row = sum_row
+            ws_sum.write(sum_row, 0, "TOTAL", fmt_sum_total)
+            ws_sum.write(sum_row, 1,
+                sum(sd['count'] for sd in summary_data.values()), fmt_panel_int)
+            ws_sum.write_formula(sum_row, 2,
+                "=SUM(C2:C{})".format(last_data_row), fmt_panel_num)
+            ws_sum.write(sum_row, 3, "", fmt_sum_total)
+            ws_sum.write_formula(sum_row, 4,
+                "=SUM(E2:E{})".format(last_data_row), fmt_panel_num)
+            for c, w in enumerate(widths_sum):
+                ws_sum.set_column(c, c, w + 2)
+
+def _xl_write_visual_sheet(ctx, sheet_name, visual_rows):
+    """Modo formatado: usa a matriz visual da tabela do Revit."""
+    fmt_head_vis = ctx.fmt['fmt_head_vis']
+    fmt_data_vis = ctx.fmt['fmt_data_vis']
+    fmt_data_alt = ctx.fmt['fmt_data_alt']
+    ws = ctx.workbook.add_worksheet(sheet_name)
+    ws.set_tab_color("#1F4E78")
+    ws.freeze_panes(1, 0)
+
+    col_count = max([len(r) for r in visual_rows])
+    widths = [8 for _ in range(col_count)]
+    for r, row_values in enumerate(visual_rows):
+        is_header = (r == 0)
+        fmt_row = fmt_head_vis if is_header else (fmt_data_alt if r % 2 == 0 else fmt_data_vis)
+        ws.set_row(r, 22 if is_header else 18)
+        for c in range(col_count):
+            value = row_values[c] if c < len(row_values) else ""
+            ws.write(r, c, value, fmt_row)
+            slen = len(str(value)) if value else 0
+            if slen > widths[c]:
+                widths[c] = min(slen, 55)
+
+    for i, w in enumerate(widths):
+        ws.set_column(i, i, max(8, w + 2))
+    if len(visual_rows) > 1 and col_count > 0:
+        ws.autofilter(0, 0, len(visual_rows) - 1, col_count - 1)
+
+def _xl_write_display_sheet(ctx, sheet_name, header_names, rows):
+    """Modo formatado sem TableData: valores de exibição já extraídos."""
+    fmt_head_vis = ctx.fmt['fmt_head_vis']
+    fmt_data_vis = ctx.fmt['fmt_data_vis']
+    fmt_data_alt = ctx.fmt['fmt_data_alt']
+    ws = ctx.workbook.add_worksheet(sheet_name)
+    ws.set_tab_color("#1F4E78")
+    ws.freeze_panes(1, 0)
+
+    widths = [len(n) for n in header_names]
+    for i, name in enumerate(header_names):
+        ws.write(0, i, name, fmt_head_vis)
+    for r, values in enumerate(rows, 1):
+        fmt_row = fmt_data_alt if r % 2 == 0 else fmt_data_vis
+        for c, value in enumerate(values):
+            ws.write(r, c, value, fmt_row)
+            widths[c] = max(widths[c], min(len(value or ""), 55))
+    for i, w in enumerate(widths):
+        ws.set_column(i, i, w + 3)
+
+def _xl_begin_data_sheet(ctx, sheet_name, headers, readonly):
+    """Modo padrão: aba com ElementId, editável/importável."""
+    fmt = ctx.fmt
+    ws = ctx.workbook.add_worksheet(sheet_name)
+    ws.freeze_panes(1, 1)
+    ws.write(0, 0, "ElementId", fmt['fmt_head_id'])
+    for i, header in enumerate(headers):
+        ws.write(0, i+1, header, fmt['fmt_head_ro'] if readonly[i] else fmt['fmt_bold'])
+    ctx.meta_rows.append((sheet_name, _META_HEADER_KEY, _snapshot_hash(["ElementId"] + list(headers))))
+
+    ctx.sheet = {
+        'ws': ws,
+        'name': sheet_name,
+        'widths': [len("ElementId")] + [len(h) for h in headers],
+        'formats': [fmt['fmt_lock_ro'] if ro else fmt['fmt_unlock'] for ro in readonly],
+    }
 
-                # Mesma estrutura de colunas do modo formatado
-                ws.set_tab_color("#70AD47")
-                ws.freeze_panes(5, 0)
-                ws.set_column(0, 0, 3)
-                ws.set_column(1, 1, 8)
-                ws.set_column(2, 5, 12)
-                ws.set_column(6, 6, 8)
-                ws.set_column(7, 7, 13)
-                ws.set_column(8, 8, 12)
-                ws.set_column(9, 9, 12)
-                ws.set_column(10, 10, 12)
-                ws.set_column(11, 11, 12)
-                ws.set_column(12, 12, 22)
-                ws.set_column(13, 13, 18)
-
-                ws.merge_range(0, 1, 0, 13, "ESTUDO DE CARGAS", fmt_panel_title)
-                ws.write(1, 1, "OBRA: " + sanitize_filename(os.path.splitext(os.path.basename(file_path))[0]), fmt_panel_text)
-                ws.write(2, 1, u"Responsável: ", fmt_panel_text)
-                ws.write(3, 1, "Representa a carga total do(a): " + sheet_name, fmt_panel_text)
-
-                headers_panel = [
-                    u"Ítem", u"Descrição equipamento", "Quant.",
-                    u"Carga \nUnitária\n(W)", u"Carga\nTotal\n(W)",
-                    u"Fator de \nDemanda", u"Fator de \nPotência",
-                    u"Carga \nDem.\n(VA)", u"Seção do Condutor\nAdotado",
-                    u"Proteção\nAdotada"
-                ]
-                ws.write(4, 1, headers_panel[0], fmt_panel_header)
-                ws.merge_range(4, 2, 4, 5, headers_panel[1], fmt_panel_header)
-                for col, label in [(6, headers_panel[2]), (7, headers_panel[3]),
-                                   (8, headers_panel[4]), (9, headers_panel[5]),
-                                   (10, headers_panel[6]), (11, headers_panel[7]),
-                                   (12, headers_panel[8]), (13, headers_panel[9])]:
-                    ws.write(4, col, label, fmt_panel_header)
-                ws.set_row(4, 42)
-
-                # Passagem 1: acumular resumo por classificação (para aba Classif. de Cargas)
-                summary_data = {}
-                for el in src_elements:
-                    if not hasattr(el, 'row_data'):
-                        continue
-                    data = el.row_data
-                    cls_name = data.get('Classificacao', '') or u'Sem classificacao'
-                    if cls_name not in summary_data:
-                        summary_data[cls_name] = {'count': 0, 'installed_w': 0.0, 'fds': []}
-                    summary_data[cls_name]['count'] += 1
-                    try:
-                        q = float(_clean_number(data.get('Quant.'), 1) or 1)
-                        uw = float(_clean_number(data.get(u'Carga Unitária (W)'), 0) or 0)
-                        fd = float(_clean_number(data.get('Fator de Demanda'), 1) or 1)
-                        summary_data[cls_name]['installed_w'] += q * uw
-                        summary_data[cls_name]['fds'].append(fd)
-                    except:
-                        pass
+def _xl_write_data_rows(ctx, first_row, rows):
+    sheet = ctx.sheet
+    ws = sheet['ws']
+    widths = sheet['widths']
+    formats = sheet['formats']
+    fmt_lock_id = ctx.fmt['fmt_lock_id']
+    for r, row in enumerate(rows, first_row):
+        if row is None:
+            continue
+        eid_str, values = row
+        try:
+            ws.write(r, 0, eid_str, fmt_lock_id)
+            for c, value in enumerate(values):
+                ws.write(r, c+1, value, formats[c])
+
+                slen = len(str(value)) if value else 0
+                if slen > widths[c+1]:
+                    widths[c+1] = min(slen, 50)
+            ctx.meta_rows.append((sheet['name'], eid_str, _snapshot_hash([eid_str] + list(values))))
+        except:
+            pass
 
-                cls_sorted = sorted(summary_data.keys(), key=lambda cls: _panel_load_group_order(cls))
-                cls_excel_row = {cls: (i + 2) for i, cls in enumerate(cls_sorted)}
+def _xl_end_data_sheet(ctx, total_elements):
+    sheet = ctx.sheet
+    ws = sheet['ws']
+    # Coluna ElementId oculta — dados preservados para importação
+    ws.set_column(0, 0, None, None, {'hidden': True})
+    for i, w in enumerate(sheet['widths']):
+        if i == 0:
+            continue
+        ws.set_column(i, i, w + 3)
+
+    if total_elements > 0:
+        ws.autofilter(0, 0, total_elements, len(sheet['widths']) - 1)
+    ctx.sheet = None
+
+def _xl_write_snapshot(ctx, doc_key, doc_version):
+    if ctx.meta_rows:
+        _write_export_snapshot(ctx.workbook, ctx.meta_rows, doc_key, doc_version)
+
+def _export_data_sheet(writer, sheet_name, src_elements, selected_params):
+    """Modo padrão: cabeçalhos e valores são lidos aqui (thread do Revit) e enviados
+    em lotes de _EXPORT_CHUNK_ROWS linhas para a thread de escrita."""
+    headers = []
+    for p in selected_params:
+        post = ""
+        header_name = p.name
+
+        if not unit_postfix_pattern.search(header_name):
+            dt = get_parameter_data_type(p.definition) if p.definition else None
+            if dt and DB.UnitUtils.IsMeasurableSpec(dt):
+                try:
+                    sym = project_units.GetFormatOptions(dt).GetSymbolTypeId()
+                    if not sym.Empty():
+                        post = " [" + DB.LabelUtils.GetLabelForSymbol(sym) + "]"
+                except:
+                    pass
 
-                # Passagem 2: agrupar circuitos por painel → classificação
-                panels_dict = OrderedDict()
-                for el in src_elements:
-                    if not hasattr(el, 'row_data'):
-                        continue
-                    data = el.row_data
-                    pname = data.get('Nome do Quadro', sheet_name)
-                    cls = data.get('Classificacao', '') or u'Sem classificacao'
-                    if pname not in panels_dict:
-                        panels_dict[pname] = OrderedDict()
-                    if cls not in panels_dict[pname]:
-                        panels_dict[pname][cls] = []
-                    panels_dict[pname][cls].append(data)
-
-                # Passagem 3: escrever na aba principal agrupado
-                row = 5
-                panel_total_rows = []
-
-                for pname, cls_groups in panels_dict.items():
-                    # Sub-cabeçalho do painel (mesmo do modo formatado)
-                    ws.merge_range(row, 2, row, 5, "Painel: " + str(pname), fmt_panel_info)
-                    for col in [1, 6, 7, 8, 9, 10, 11, 12, 13]:
-                        ws.write(row, col, "", fmt_panel_info)
-                    row += 1
+        headers.append(header_name + post)
 
-                    cls_sorted_local = sorted(
-                        cls_groups.keys(),
-                        key=lambda c: _panel_load_group_order(c)
-                    )
-                    panel_sub_total_rows = []
-
-                    for cls_name in cls_sorted_local:
-                        circuits = cls_groups[cls_name]
-                        fd_row = cls_excel_row.get(cls_name)
-
-                        # Cabeçalho do grupo de classificação
-                        ws.write(row, 1, "", fmt_grp_hdr)
-                        ws.merge_range(row, 2, row, 13,
-                                       u"  " + cls_name.upper(), fmt_grp_hdr)
-                        ws.set_row(row, 20)
-                        row += 1
-
-                        group_first_row = row
-
-                        for data in circuits:
-                            excel_row = row + 1
-                            qty = _clean_number(data.get('Quant.'), 1)
-                            unit_w = _clean_number(data.get(u'Carga Unitária (W)'), "")
-                            demand = _clean_number(data.get('Fator de Demanda'), 1)
-                            power_factor = _clean_number(data.get(u'Fator de Potência'), 1)
-
-                            ws.write(row, 1, data.get(u'Ítem', ""), fmt_panel_text)
-                            ws.merge_range(row, 2, row, 5,
-                                           data.get(u'Descrição equipamento', ""), fmt_panel_text)
-                            ws.write(row, 6, qty, fmt_panel_int)
-                            ws.write(row, 7, unit_w, fmt_panel_num)
-                            ws.write_formula(row, 8, "=H{0}*G{0}".format(excel_row), fmt_panel_num)
-                            if fd_row:
-                                ws.write_formula(row, 9,
-                                    u"='Classif. de Cargas'!D{}".format(fd_row),
-                                    fmt_panel_num, float(demand or 1))
-                            else:
-                                ws.write(row, 9, demand, fmt_panel_num)
-                            ws.write(row, 10, power_factor, fmt_panel_num)
-                            ws.write_formula(row, 11,
-                                "=IF(K{0}=0,0,(G{0}*H{0}*J{0})/K{0})".format(excel_row),
-                                fmt_panel_num)
-                            ws.write(row, 12, data.get(u'Seção do Condutor Adotado', ""), fmt_panel_text)
-                            ws.write(row, 13, data.get(u'Proteção Adotada', ""), fmt_panel_text)
-                            row += 1
-
-                        # Subtotal da classificação
-                        g1 = group_first_row + 1   # 1-indexed
-                        g2 = row                    # 1-indexed (row exclusivo → última linha = row-1+1)
-                        ws.write(row, 1, "", fmt_subtotal_txt)
-                        ws.merge_range(row, 2, row, 7,
-                                       u"Subtotal — " + cls_name, fmt_subtotal_txt)
-                        ws.write_formula(row, 8,
-                            "=SUM(I{0}:I{1})".format(g1, g2), fmt_subtotal_num)
-                        ws.write(row, 9, "", fmt_subtotal_txt)
-                        ws.write(row, 10, "", fmt_subtotal_txt)
-                        ws.write_formula(row, 11,
-                            "=SUM(L{0}:L{1})".format(g1, g2), fmt_subtotal_num)
-                        ws.write(row, 12, "", fmt_subtotal_txt)
-                        ws.write(row, 13, "", fmt_subtotal_txt)
-                        ws.set_row(row, 20)
-                        panel_sub_total_rows.append(row)
-                        row += 1
-
-                    # Total do painel (soma dos subtotais)
-                    if panel_sub_total_rows:
-                        refs_i = "+".join(["I{}".format(r + 1) for r in panel_sub_total_rows])
-                        refs_l = "+".join(["L{}".format(r + 1) for r in panel_sub_total_rows])
-                        ws.write(row, 1, "", fmt_total_panel_txt)
-                        ws.merge_range(row, 2, row, 7,
-                                       u"TOTAL — " + pname, fmt_total_panel_txt)
-                        ws.write_formula(row, 8, "=" + refs_i, fmt_total_panel_num)
-                        ws.write(row, 9, "", fmt_total_panel_txt)
-                        ws.write(row, 10, "", fmt_total_panel_txt)
-                        ws.write_formula(row, 11, "=" + refs_l, fmt_total_panel_num)
-                        ws.write(row, 12, "", fmt_total_panel_txt)
-                        ws.write(row, 13, "", fmt_total_panel_txt)
-                        ws.set_row(row, 22)
-                        panel_total_rows.append(row)
-                        row += 2  # linha de total + linha em branco entre painéis
-
-                # Total geral (apenas quando há mais de um painel)
-                if len(panel_total_rows) > 1:
-                    refs_i = "+".join(["I{}".format(r + 1) for r in panel_total_rows])
-                    refs_l = "+".join(["L{}".format(r + 1) for r in panel_total_rows])
-                    ws.write(row, 1, "", fmt_grand_total_txt)
-                    ws.merge_range(row, 2, row, 7, u"TOTAL GERAL", fmt_grand_total_txt)
-                    ws.write_formula(row, 8, "=" + refs_i, fmt_grand_total_num)
-                    ws.write(row, 9, "", fmt_grand_total_txt)
-                    ws.write(row, 10, "", fmt_grand_total_txt)
-                    ws.write_formula(row, 11, "=" + refs_l, fmt_grand_total_num)
-                    ws.write(row, 12, "", fmt_grand_total_txt)
-                    ws.write(row, 13, "", fmt_grand_total_txt)
-                    ws.set_row(row, 24)
-
-                # Aba "Classif. de Cargas" — idêntica ao modo formatado
-                if summary_data:
-                    ws_sum = workbook.add_worksheet(u"Classif. de Cargas")
-                    ws_sum.set_tab_color("#ED7D31")
-                    ws_sum.freeze_panes(1, 0)
-                    ws_sum.set_row(0, 36)
-                    fmt_sum_total = get_excel_format(workbook, {
-                        "bold": True, "bg_color": "#B7E1A1", "border": 1,
-                        "align": "left", "valign": "vcenter",
-                    })
-                    sum_cols = [
-                        u"Classificação de Carga",
-                        u"Qtd. Circuitos",
-                        u"Pot. Instalada (W)",
-                        u"Fator de Demanda",
-                        u"Pot. Demandada (W)",
-                    ]
-                    for c, h in enumerate(sum_cols):
-                        ws_sum.write(0, c, h, fmt_panel_header)
-                    widths_sum = [len(h) + 2 for h in sum_cols]
-                    sum_row = 1
-                    for cls_key in cls_sorted:
-                        sd = summary_data[cls_key]
-                        inst = round(sd['installed_w'], 2)
-                        fds = sd['fds']
-                        fd_disp = max(set(fds), key=fds.count) if fds else 1.0
-                        excel_sum_row = sum_row + 1
-                        ws_sum.write(sum_row, 0, cls_key, fmt_panel_text)
-                        ws_sum.write(sum_row, 1, sd['count'], fmt_panel_int)
-                        ws_sum.write(sum_row, 2, inst, fmt_panel_num)
-                        ws_sum.write(sum_row, 3, fd_disp, fmt_panel_num)
-                        ws_sum.write_formula(sum_row, 4,
-                            "=C{0}*D{0}".format(excel_sum_row),
-                            fmt_panel_num, round(inst * fd_disp, 2))
-                        sum_row += 1
-                        if len(cls_key) > widths_sum[0]:
-                            widths_sum[0] = min(len(cls_key), 45)
-                    last_data_row = sum_row
-                    ws_sum.write(sum_row, 0, "TOTAL", fmt_sum_total)
-                    ws_sum.write(sum_row, 1,
-                        sum(sd['count'] for sd in summary_data.values()), fmt_panel_int)
-                    ws_sum.write_formula(sum_row, 2,
-                        "=SUM(C2:C{})".format(last_data_row), fmt_panel_num)
-                    ws_sum.write(sum_row, 3, "", fmt_sum_total)
-                    ws_sum.write_formula(sum_row, 4,
-                        "=SUM(E2:E{})".format(last_data_row), fmt_panel_num)
-                    for c, w in enumerate(widths_sum):
-                        ws_sum.set_column(c, c, w + 2)
+    writer.submit(_xl_begin_data_sheet, sheet_name, headers, [p.isreadonly for p in selected_params])
+
+    param_cache = LRUCache(5000)
+    chunk = []
+    first_row = 1
+    for el in src_elements:
+        try:
+            eid = el.Id.IntegerValue
+            chunk.append((str(eid), [get_element_parameter_value(el, p, param_cache) for p in selected_params]))
+        except:
+            chunk.append(None)
+        if len(chunk) >= _EXPORT_CHUNK_ROWS:
+            writer.submit(_xl_write_data_rows, first_row, chunk)
+            first_row += len(chunk)
+            chunk = []
+    if chunk:
+        writer.submit(_xl_write_data_rows, first_row, chunk)
+
+    writer.submit(_xl_end_data_sheet, len(src_elements))
+
+def export_xls(targets, file_path, formatted=False, fast=False):
+    """Exporta dados para Excel com múltiplas abas se necessário.
+    A extração roda aqui e a escrita numa _ExcelWriterThread em paralelo, então o
+    tempo total tende a max(extração, escrita) em vez da soma.
+    fast: perfil de compressão 'fast' do xlsxwriter (arquivo maior, zip mais rápido)."""
+    # Valores de tipo podem ter mudado desde o preview
+    _type_value_cache.clear()
+
+    # Configurar workbook com otimizações
+    has_panel_schedule = any([t.get('is_panel', False) for t in targets])
+    workbook_options = {
+        'constant_memory': not has_panel_schedule,
+        'use_zip64': True,
+        'compression': 'fast' if fast else 'deflate',
+    }
+
+    writer = _ExcelWriterThread(file_path, workbook_options, formatted)
+    try:
+        for target in targets:
+            sheet_name = sanitize_filename(target['name'])[:31] # Excel limita a 31 chars
+            src_elements = target['src']
+            selected_params = target['params']
+
+            if target.get('is_panel', False):
+                writer.submit(_xl_write_panel_sheet, sheet_name, src_elements, file_path, formatted)
 
             elif formatted:
-                # ── Modo formatado: usa a matriz visual da tabela do Revit ─────
-                ws.set_tab_color("#1F4E78")
-                ws.freeze_panes(1, 0)
                 visual_rows = get_schedule_visual_table(target.get('schedule')) if target.get('schedule') else []
-
                 if visual_rows:
-                    col_count = max([len(r) for r in visual_rows])
-                    widths = [8 for _ in range(col_count)]
-                    for r, row_values in enumerate(visual_rows):
-                        is_header = (r == 0)
-                        fmt_row = fmt_head_vis if is_header else (fmt_data_alt if r % 2 == 0 else fmt_data_vis)
-                        ws.set_row(r, 22 if is_header else 18)
-                        for c in range(col_count):
-                            value = row_values[c] if c < len(row_values) else ""
-                            ws.write(r, c, value, fmt_row)
-                            slen = len(str(value)) if value else 0
-                            if slen > widths[c]:
-                                widths[c] = min(slen, 55)
-
-                    for i, w in enumerate(widths):
-                        ws.set_column(i, i, max(8, w + 2))
-                    if len(visual_rows) > 1 and col_count > 0:
-                        ws.autofilter(0, 0, len(visual_rows) - 1, col_count - 1)
+                    writer.submit(_xl_write_visual_sheet, sheet_name, visual_rows)
                 else:
                     # Fallback antigo caso a API nao entregue TableData.
-                    header_names = [p.name for p in selected_params]
-                    widths = [len(n) for n in header_names]
-                    for i, name in enumerate(header_names):
-                        ws.write(0, i, name, fmt_head_vis)
-                    for r, el in enumerate(src_elements, 1):
-                        fmt_row = fmt_data_alt if r % 2 == 0 else fmt_data_vis
-                        for c, p in enumerate(selected_params):
-                            value = get_param_display_string(el, p)
-                            ws.write(r, c, value, fmt_row)
-                            widths[c] = max(widths[c], min(len(value or ""), 55))
-                    for i, w in enumerate(widths):
-                        ws.set_column(i, i, w + 3)
+                    rows = [[get_param_display_string(el, p) for p in selected_params]
+                            for el in src_elements]
+                    writer.submit(_xl_write_display_sheet, sheet_name,
+                                  [p.name for p in selected_params], rows)
 
             else:
-                # ── Modo padrão: com ElementId, editável/importável ───────────
-                ws.freeze_panes(1, 1)
-                ws.write(0, 0, "ElementId", fmt_head_id)
-
-                # Processar cabeçalhos
-                param_units = []
-                header_names = []
-
-                for p in selected_params:
-                    post = ""
-                    header_name = p.name
-
-                    if not unit_postfix_pattern.search(header_name):
-                        dt = get_parameter_data_type(p.definition) if p.definition else None
-                        if dt and DB.UnitUtils.IsMeasurableSpec(dt):
-                            try:
-                                sym = project_units.GetFormatOptions(dt).GetSymbolTypeId()
-                                if not sym.Empty():
-                                    post = " [" + DB.LabelUtils.GetLabelForSymbol(sym) + "]"
-                            except:
-                                pass
-
-                    param_units.append(post)
-                    header_names.append(header_name)
-
-                # Escrever headers
-                for i, p in enumerate(selected_params):
-                    fmt = fmt_head_ro if p.isreadonly else fmt_bold
-                    ws.write(0, i+1, header_names[i] + param_units[i], fmt)
-
-                # Calcular larguras
-                widths = [len("ElementId")] + [len(header_names[i]) + len(param_units[i]) for i in range(len(selected_params))]
-
-                # Processamento em lotes adaptativo
-                total_elements = len(src_elements)
-                batch_size = 1000
-
-                param_cache = {}
-
-                for batch_start in range(0, total_elements, batch_size):
-                    batch_end = min(batch_start + batch_size, total_elements)
-
-                    r_offset = 0
-                    for el in src_elements[batch_start:batch_end]:
-                        r = batch_start + r_offset + 1
-                        try:
-                            eid = el.Id.IntegerValue
-                            ws.write(r, 0, str(eid), fmt_lock_id)
+                _export_data_sheet(writer, sheet_name, src_elements, selected_params)
 
-                            for c, p in enumerate(selected_params):
-                                value = get_element_parameter_value(el, p, param_cache)
-                                fmt = fmt_lock_ro if p.isreadonly else fmt_unlock
-                                ws.write(r, c+1, value, fmt)
-
-                                slen = len(str(value)) if value else 0
-                                if slen > widths[c+1]:
-                                    widths[c+1] = min(slen, 50)
-                        except:
-                            pass
-                        r_offset += 1
-
-                    if len(param_cache) > 5000:
-                        param_cache.clear()
-
-                # Coluna ElementId oculta — dados preservados para importação
-                ws.set_column(0, 0, None, None, {'hidden': True})
-                for i, w in enumerate(widths):
-                    if i == 0:
-                        continue
-                    ws.set_column(i, i, w + 3)
-                
-                if total_elements > 0: 
-                    ws.autofilter(0, 0, total_elements, len(selected_params))
+        writer.submit(_xl_write_snapshot, _document_key(), _document_version())
 
     except Exception as e:
         logger.error("Erro Excel: " + str(e))
-        if workbook:
-            try:
-                workbook.close()
-            except:
-                pass
-        raise e
+        raise
     finally:
-        if workbook:
-            try:
-                workbook.close()
-            except Exception as e:
-                msg = str(e)
-                if "Permission denied" in msg or "being used" in msg:
-                    forms.alert("O arquivo Excel esta ABERTO.\nFeche-o e tente novamente.", 
-                               title="Arquivo em Uso")
-                else:
-                    logger.error("Erro ao fechar workbook: " + str(e))
-        
+        writer.finish()
+        if writer.close_error is not None:
+            msg = str(writer.close_error)
+            if "Permission denied" in msg or "being used" in msg:
+                forms.alert("O arquivo Excel esta ABERTO.\nFeche-o e tente novamente.", 
+                           title="Arquivo em Uso")
+            else:
+                logger.error("Erro ao fechar workbook: " + msg)
+
         # Limpeza pós-exportação
         clear_all_caches()
 
+    if writer.error is not None:
+        logger.error("Erro Excel: " + str(writer.error))
+        raise writer.error
+
 # ==================== IMPORTAÇÃO OTIMIZADA ====================
 def get_param_robust(element, param_name):
     """Busca parametro na instancia ou no tipo."""
@@ -2093,6 +2413,85 @@ def get_param_robust(element, param_name):
         
     return None
 
+# ==================== SNAPSHOT DA EXPORTAÇÃO (_lf_meta) ====================
+# A exportação editável grava numa aba oculta o hash de cada linha exportada.
+# Na reimportação, linhas cujo hash não mudou não foram editadas e são puladas
+# sem buscar o elemento nem ler parâmetros.
+_META_SHEET = "_lf_meta"
+_META_FORMAT = 1
+_META_HEADER_KEY = "*"
+
+def _snapshot_cell(value):
+    """Normaliza um valor igual ao que o Excel devolve na leitura (números em %.16g)."""
+    if value is None:
+        return u""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        fval = float(value)
+        if fval == int(fval) and abs(fval) < 1e15:
+            return u"%d" % int(fval)
+        return u"%.16g" % fval
+    return u"{}".format(value)
+
+def _snapshot_hash(values, width=None):
+    if width is not None:
+        values = list(values[:width]) + [None] * (width - len(values))
+    data = u"\x1f".join([_snapshot_cell(v) for v in values])
+    return hashlib.md5(data.encode('utf-8')).hexdigest()[:16]
+
+def _document_key():
+    try:
+        return doc.PathName or doc.Title
+    except:
+        return ""
+
+def _document_version():
+    # DocumentVersion só existe a partir do Revit 2021
+    try:
+        ver = DB.Document.GetDocumentVersion(doc)
+        return u"{}:{}".format(ver.VersionGUID, ver.NumberOfSaves)
+    except:
+        return ""
+
+def _write_export_snapshot(workbook, meta_rows, doc_key, doc_version):
+    """Grava a aba oculta _lf_meta: cabeçalho com documento/versão + (aba, ElementId, hash)."""
+    ws_meta = workbook.add_worksheet(_META_SHEET)
+    ws_meta.write_row(0, 0, ["LF_META", _META_FORMAT])
+    ws_meta.write_row(1, 0, ["doc", doc_key])
+    ws_meta.write_row(2, 0, ["version", doc_version])
+    ws_meta.write_row(3, 0, ["Sheet", "ElementId", "Hash"])
+    for r, meta in enumerate(meta_rows, 4):
+        ws_meta.write_row(r, 0, meta)
+    ws_meta.hide()
+
+def _load_export_snapshot(wb):
+    """{aba: {ElementId: hash}} gravado na exportação, ou None se o arquivo não tem
+    _lf_meta, veio de outro documento ou de outra versão dele (modelo salvo depois
+    da exportação). Com None a importação compara todas as linhas, como sem snapshot."""
+    if _META_SHEET not in wb.sheetnames:
+        return None
+    info = {}
+    snapshot = {}
+    try:
+        for r, row in enumerate(wb.iter_rows(_META_SHEET, max_col=3)):
+            if r < 3:
+                info[_snapshot_cell(row[0])] = _snapshot_cell(row[1])
+                continue
+            if r == 3:
+                continue
+            if row[0] is None or row[1] is None:
+                continue
+            snapshot.setdefault(_snapshot_cell(row[0]), {})[_snapshot_cell(row[1])] = _snapshot_cell(row[2])
+    except Exception as ex:
+        logger.debug("Snapshot _lf_meta ignorado: {}".format(ex))
+        return None
+    if info.get("LF_META") != str(_META_FORMAT) or info.get("doc") != _document_key():
+        return None
+    if info.get("version") != _document_version():
+        logger.warning("Snapshot _lf_meta descartado: o modelo mudou desde a exportação "
+                       "(versão {} -> {})".format(info.get("version") or "?", _document_version() or "?"))
+        return None
+    return snapshot
+
 def import_xls(file_path):
     """Importa dados do Excel usando leitor embutido (sem openpyxl)."""
     try:
@@ -2102,14 +2501,9 @@ def import_xls(file_path):
         return
 
     try:
-        # Identifica abas válidas: com "ElementId" na célula A1
-        sheets_to_process = []
-        for s_name in wb.sheetnames:
-            if s_name.startswith('_'):
-                continue
-            rows = wb.read_sheet(s_name)
-            if rows and str(rows[0][0] if rows[0] else "").strip() == "ElementId":
-                sheets_to_process.append((s_name, rows))
+        # Identifica abas válidas lendo só a primeira linha de cada uma
+        sheets_to_process = [s_name for s_name in wb.sheetnames
+                             if not s_name.startswith('_') and wb.is_importable(s_name)]
 
         if not sheets_to_process:
             forms.alert(
@@ -2121,24 +2515,38 @@ def import_xls(file_path):
 
         stats = {
             'elements_processed': 0, 'success_cells': 0, 'skipped_cells': 0,
-            'readonly_cells': 0, 'not_found_cells': 0, 'error_cells': 0
+            'readonly_cells': 0, 'not_found_cells': 0, 'error_cells': 0,
+            'unchanged_rows': 0
         }
+        snapshot = _load_export_snapshot(wb)
 
         _t = DB.Transaction(doc, "Import Excel (Multi)")
         _t.Start()
         try:
             import_element_cache = {}
 
-            for s_name, rows in sheets_to_process:
-                if not rows:
+            # Uma aba por vez, linhas lidas em streaming: só a linha atual fica em memória
+            for s_name in sheets_to_process:
+                rows = wb.iter_rows(s_name)
+                header = next(rows, None)
+                if not header:
                     continue
 
-                headers = [str(h).strip() if h is not None else "" for h in rows[0]]
+                headers = [str(h).strip() if h is not None else "" for h in header]
                 pnames = [unit_postfix_pattern.sub("", h).strip() for h in headers[1:]]
+                width = len(headers)
+
+                # Hashes da exportação; descartados se as colunas mudaram
+                sheet_hashes = snapshot.get(s_name) if snapshot else None
+                if sheet_hashes and sheet_hashes.get(_META_HEADER_KEY) != _snapshot_hash(header, width):
+                    sheet_hashes = None
 
-                for row in rows[1:]:
+                for row in rows:
                     try:
-                        if row[0] is None:
+                        if not row or row[0] is None:
+                            continue
+                        if sheet_hashes and sheet_hashes.get(_snapshot_cell(row[0])) == _snapshot_hash(row, width):
+                            stats['unchanged_rows'] += 1
                             continue
                         eid = int(float(row[0]))
 
@@ -2241,6 +2649,9 @@ def import_xls(file_path):
     report = "Importacao Concluida!\n\n"
     report += "Elementos processados: {}\n".format(stats['elements_processed'])
     report += "Celulas atualizadas: {}\n".format(stats['success_cells'])
+
+    if stats['unchanged_rows'] > 0:
+        report += "Linhas nao editadas desde a exportacao (ignoradas): {}\n".format(stats['unchanged_rows'])
     
     if stats['skipped_cells'] > 0:
         report += "Celulas inalteradas (valor igual): {}\n".format(stats['skipped_cells'])
@@ -2928,7 +3339,6 @@ class ExportImportWindow(forms.WPFWindow):
                 for p in param_defs:
                     dt.Columns.Add(p.name)
                 
-                param_cache = {}
                 for i, el in enumerate(elements):
                     if i >= max_preview_rows:
                         break
@@ -2938,7 +3348,7 @@ class ExportImportWindow(forms.WPFWindow):
                     except:
                         row[0] = ""
                     for j, p in enumerate(param_defs):
-                        val = get_element_parameter_value(el, p, param_cache)
+                        val = get_element_parameter_value(el, p)
                         row[j+1] = str(val) if val is not None else ""
                     dt.Rows.Add(row)
 
@@ -2975,13 +3385,14 @@ class ExportImportWindow(forms.WPFWindow):
 
             wb = _XlsxReader(self.import_path)
             try:
+                # Só o cabeçalho de cada aba; as linhas são lidas apenas da aba selecionada
                 sheet_rows = []
                 for s_name in wb.sheetnames:
                     if s_name.startswith('_'):
                         continue
-                    rows = wb.read_sheet(s_name)
-                    if rows:
-                        sheet_rows.append((s_name, rows))
+                    header = wb.read_header(s_name)
+                    if header is not None:
+                        sheet_rows.append((s_name, header))
 
                 if not sheet_rows:
                     self.lbl_ImportStatus.Text = "Nenhuma aba com dados encontrada."
@@ -3003,24 +3414,33 @@ class ExportImportWindow(forms.WPFWindow):
                     self.lbl_ImportStatus.Text = "Nenhuma aba selecionada."
                     return
 
-                selected_sheet_name, rows = sheet_rows[idx]
-                is_importable = bool(rows and rows[0] and str(rows[0][0] if rows[0] else "").strip() == "ElementId")
+                selected_sheet_name, header = sheet_rows[idx]
 
-                if not is_importable:
+                if not _is_element_id_header(header):
                     self.lbl_ImportStatus.Text = u"Aba '{}': Excel externo. Ao importar, sera criada uma tabela visual em Vista de Desenho.".format(selected_sheet_name)
                     return
 
-                headers = [str(h).strip() if h is not None else "" for h in rows[0]]
+                headers = [str(h).strip() if h is not None else "" for h in header]
                 pnames = [unit_postfix_pattern.sub("", h).strip() for h in headers[1:]]
 
+                width = len(headers)
+                snapshot = _load_export_snapshot(wb)
+                sheet_hashes = snapshot.get(selected_sheet_name) if snapshot else None
+                if sheet_hashes and sheet_hashes.get(_META_HEADER_KEY) != _snapshot_hash(header, width):
+                    sheet_hashes = None
+
                 changes = []
                 MAX_CHECK = 500
                 checked = 0
-                for row in rows[1:]:
+                rows = wb.iter_rows(selected_sheet_name)
+                next(rows, None)
+                for row in rows:
                     if checked >= MAX_CHECK:
                         break
                     try:
-                        if row[0] is None:
+                        if not row or row[0] is None:
+                            continue
+                        if sheet_hashes and sheet_hashes.get(_snapshot_cell(row[0])) == _snapshot_hash(row, width):
                             continue
                         eid = int(float(row[0]))
                         el = doc.GetElement(DB.ElementId(eid))
@@ -3065,6 +3485,7 @@ class ExportImportWindow(forms.WPFWindow):
                                 changes.append((eid_str, pname, str(before_val).strip(), after_val.strip()))
                     except:
                         pass
+                rows.close()
             finally:
                 wb.close()
 
@@ -3143,6 +3564,7 @@ class ExportImportWindow(forms.WPFWindow):
             try:
                 self.update_status("Lendo dados...")
                 formatted = bool(self.CheckBox_KeepFormat.IsChecked)
+                fast = bool(self.CheckBox_FastExport.IsChecked)
 
                 for i, sch_dict in enumerate(selected):
                     _pb_update(i)
@@ -3191,7 +3613,7 @@ class ExportImportWindow(forms.WPFWindow):
 
                 _pb_update(len(selected))
                 self.update_status("Gerando Excel ({} abas)...".format(len(targets)))
-                export_xls(targets, self.export_path, formatted=formatted)
+                export_xls(targets, self.export_path, formatted=formatted, fast=fast)
                 self.update_status("Concluído!")
             finally:
                 if _pb_ctx:
@@ -3236,8 +3658,7 @@ class ExportImportWindow(forms.WPFWindow):
                 for s_name in wb.sheetnames:
                     if s_name.startswith('_'):
                         continue
-                    rows = wb.read_sheet(s_name)
-                    if rows and str(rows[0][0] if rows[0] else "").strip() == "ElementId":
+                    if wb.is_importable(s_name):
                         has_importable = True
                         break
             finally:
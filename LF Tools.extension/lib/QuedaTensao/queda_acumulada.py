@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Queda de tensão acumulada na hierarquia de quadros.
+
+Quadro de origem → circuito alimentador → sub-quadro → ... → circuito terminal.
+A árvore é montada uma vez a partir de ElectricalSystem.BaseEquipment (quadro de
+origem de cada circuito) e dos circuitos alimentadores (quadro alimentado). A
+queda acumulada de todos os circuitos sai de um único percurso O(N); quando um
+circuito ou alimentador muda, só a subárvore afetada é recalculada.
+"""
+import math
+
+# Limite NBR 5410 para a queda total (origem → ponto de utilização)
+LIMITE_QUEDA_TOTAL = 4.0
+
+
+def queda_trecho(comprimento_m, corrente, tensao, secao_mm2, fases=1):
+    """Queda percentual de um trecho isolado (mesma fórmula de Sincronizar Circuitos)"""
+    if secao_mm2 <= 0 or tensao <= 0:
+        return 0.0
+    fator = 2.0 if fases <= 2 else math.sqrt(3)
+    dv = (fator * comprimento_m * corrente) / (56.0 * secao_mm2)
+    return (dv * 100.0) / tensao
+
+
+class QuedaAcumuladaEngine(object):
+    """
+    Árvore quadro → circuito → sub-quadro com a queda acumulada de cada nó.
+
+    Uso:
+        arvore = QuedaAcumuladaEngine()
+        arvore.adicionar_circuito(circ_id, quadro_id, queda_pct, quadro_alimentado=None)
+        arvore.calcular()
+        arvore.queda_acumulada(circ_id)
+        arvore.atualizar_circuito(circ_id, nova_queda)   # recalcula só a subárvore
+    """
+
+    def __init__(self):
+        self._quadro_de = {}            # circuito -> quadro de origem (BaseEquipment)
+        self._queda_trecho = {}         # circuito -> queda própria (%)
+        self._alimenta = {}             # circuito alimentador -> quadro alimentado
+        self._alimentador_de = {}       # quadro -> circuito alimentador
+        self._circuitos_do_quadro = {}  # quadro -> set(circuitos)
+        self._queda_quadro = {}         # quadro -> queda acumulada no barramento
+        self._queda_acumulada = {}      # circuito -> queda acumulada no fim do circuito
+
+    # ---------------------------------------------------------------- montagem
+
+    def adicionar_circuito(self, circuito_id, quadro_id, queda, quadro_alimentado=None):
+        """Registra (ou substitui) um circuito. quadro_alimentado só para alimentadores."""
+        if circuito_id in self._quadro_de:
+            self._desligar(circuito_id)
+
+        self._quadro_de[circuito_id] = quadro_id
+        self._queda_trecho[circuito_id] = float(queda or 0.0)
+        self._circuitos_do_quadro.setdefault(quadro_id, set()).add(circuito_id)
+
+        if quadro_alimentado is not None and quadro_alimentado != quadro_id:
+            self._alimenta[circuito_id] = quadro_alimentado
+            self._alimentador_de[quadro_alimentado] = circuito_id
+            self._circuitos_do_quadro.setdefault(quadro_alimentado, set())
+
+    def remover_circuito(self, circuito_id):
+        """Remove o circuito e recalcula o que dependia dele."""
+        if circuito_id not in self._quadro_de:
+            return
+        alimentado = self._alimenta.get(circuito_id)
+        self._desligar(circuito_id)
+        self._queda_acumulada.pop(circuito_id, None)
+        if alimentado is not None:
+            self._propagar(alimentado, 0.0)
+
+    def _desligar(self, circuito_id):
+        quadro = self._quadro_de.pop(circuito_id, None)
+        self._queda_trecho.pop(circuito_id, None)
+        if quadro is not None:
+            self._circuitos_do_quadro.get(quadro, set()).discard(circuito_id)
+        alimentado = self._alimenta.pop(circuito_id, None)
+        if alimentado is not None and self._alimentador_de.get(alimentado) == circuito_id:
+            del self._alimentador_de[alimentado]
+
+    # ------------------------------------------------------------------ cálculo
+
+    def calcular(self):
+        """Percorre toda a árvore uma vez a partir dos quadros de origem."""
+        self._queda_quadro = {}
+        self._queda_acumulada = {}
+        visitados = set()
+        for quadro in self._raizes():
+            self._propagar(quadro, 0.0, visitados)
+        # Quadros presos em ciclo (modelo inconsistente) são tratados como origem
+        for quadro in list(self._circuitos_do_quadro):
+            if quadro not in visitados:
+                self._propagar(quadro, 0.0, visitados)
+
+    def _raizes(self):
+        return [q for q in self._circuitos_do_quadro
+                if self._alimentador_de.get(q) not in self._quadro_de]
+
+    def _propagar(self, quadro_id, queda_barramento, visitados=None):
+        """Atualiza quadro_id e toda a subárvore abaixo dele (iterativo, sem recursão)."""
+        if visitados is None:
+            visitados = set()
+        pilha = [(quadro_id, queda_barramento)]
+        while pilha:
+            quadro, queda_q = pilha.pop()
+            if quadro in visitados:
+                continue
+            visitados.add(quadro)
+            self._queda_quadro[quadro] = queda_q
+            for circ in self._circuitos_do_quadro.get(quadro, ()):
+                acumulada = queda_q + self._queda_trecho[circ]
+                self._queda_acumulada[circ] = acumulada
+                alimentado = self._alimenta.get(circ)
+                if alimentado is not None:
+                    pilha.append((alimentado, acumulada))
+
+    def atualizar_circuito(self, circuito_id, queda=None):
+        """Altera a queda própria de um circuito (se informada) e recalcula só o que
+        depende dele: o próprio circuito ou, se for alimentador, o sub-quadro inteiro."""
+        if circuito_id not in self._quadro_de:
+            return
+        if queda is not None:
+            self._queda_trecho[circuito_id] = float(queda)
+
+        quadro = self._quadro_de[circuito_id]
+        acumulada = self._queda_quadro.get(quadro, 0.0) + self._queda_trecho[circuito_id]
+        self._queda_acumulada[circuito_id] = acumulada
+
+        alimentado = self._alimenta.get(circuito_id)
+        if alimentado is not None:
+            self._propagar(alimentado, acumulada, set([quadro]))
+
+    # ---------------------------------------------------------------- consultas
+
+    def queda_acumulada(self, circuito_id, default=None):
+        return self._queda_acumulada.get(circuito_id, default)
+
+    def queda_trecho(self, circuito_id, default=None):
+        return self._queda_trecho.get(circuito_id, default)
+
+    def queda_no_quadro(self, quadro_id, default=0.0):
+        """Queda acumulada no barramento do quadro (vinda dos alimentadores a montante)."""
+        return self._queda_quadro.get(quadro_id, default)
+
+    def alimentador_de(self, quadro_id):
+        return self._alimentador_de.get(quadro_id)
+
+    def circuitos_do_quadro(self, quadro_id):
+        return list(self._circuitos_do_quadro.get(quadro_id, ()))
+
+    def caminho(self, circuito_id):
+        """Circuitos da origem até circuito_id (alimentadores primeiro)."""
+        trilha = []
+        vistos = set()
+        atual = circuito_id
+        while atual is not None and atual in self._quadro_de and atual not in vistos:
+            vistos.add(atual)
+            trilha.append(atual)
+            atual = self._alimentador_de.get(self._quadro_de[atual])
+        trilha.reverse()
+        return trilha
+
+    def circuitos_terminais(self):
+        return [c for c in self._quadro_de if c not in self._alimenta]
+
+    def excedentes(self, limite=LIMITE_QUEDA_TOTAL):
+        """Circuitos terminais cuja queda acumulada passa do limite: [(id, queda)]"""
+        return [(c, self._queda_acumulada[c]) for c in self.circuitos_terminais()
+                if self._queda_acumulada.get(c, 0.0) > limite]
+
+    def __len__(self):
+        return len(self._quadro_de)
+
+    # ------------------------------------------------------------ montagem Revit
+
+    @classmethod
+    def de_circuitos(cls, circuitos, queda_fn, eh_alimentador=None):
+        """
+        Monta e calcula a árvore a partir de ElectricalSystems do Revit.
+
+        circuitos      — iterável de ElectricalSystem (ex.: todos os do projeto)
+        queda_fn       — função(circuito) -> queda própria do trecho em %
+        eh_alimentador — função(circuito) -> bool (ex.: is_panel_feeder); se None,
+                         qualquer circuito com um quadro entre os elementos alimenta.
+        """
+        arvore = cls()
+        for c in circuitos:
+            try:
+                base = c.BaseEquipment
+            except Exception:
+                base = None
+            if base is None:
+                continue
+
+            alimentado = None
+            if eh_alimentador is None or eh_alimentador(c):
+                alimentado = _quadro_alimentado(c, base.Id.IntegerValue)
+
+            try:
+                queda = queda_fn(c)
+            except Exception:
+                queda = 0.0
+            arvore.adicionar_circuito(c.Id.IntegerValue, base.Id.IntegerValue, queda, alimentado)
+        arvore.calcular()
+        return arvore
+
+
+def _quadro_alimentado(circuito, quadro_origem_id):
+    """Id do quadro ligado como carga do circuito (o sub-quadro que ele alimenta)."""
+    from Autodesk.Revit.DB import BuiltInCategory
+    cat_equip = int(BuiltInCategory.OST_ElectricalEquipment)
+    try:
+        for el in circuito.Elements:
+            if el.Category and el.Category.Id.IntegerValue == cat_equip:
+                eid = el.Id.IntegerValue
+                if eid != quadro_origem_id:
+                    return eid
+    except Exception:
+        pass
+    return None
@@ -1,5 +1,14 @@
 # -*- coding: utf-8 -*-
 import math
+from bisect import bisect_left
+
+from lf_utils import LRUCache
+
+# NumPy é opcional (ausente no IronPython do pyRevit): só acelera o cálculo em lote
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # =========================================================================
 # TABELA 1: CAPACIDADE DE CONDUÇÃO (Ampacidade)
@@ -85,6 +94,58 @@ REATANCIA = {
     '240': 0.064,
 }
 
+# =========================================================================
+# TABELAS PRÉ-CALCULADAS (montadas uma vez na importação, na ordem das listas)
+# =========================================================================
+AMPACIDADES_ORDENADAS = tuple(BITOLAS_CAPACIDADE[b][0] for b in ORDERED_BITOLAS)
+SECOES_MM2 = tuple(float(b) for b in ORDERED_BITOLAS)
+AREAS_CABOS_MM2 = dict(
+    (BITOLAS_CAPACIDADE[b][1], math.pi * ((float(BITOLAS_CAPACIDADE[b][1]) / 2.0) ** 2))
+    for b in ORDERED_BITOLAS)
+AREAS_ELETRODUTOS_MM2 = tuple(
+    math.pi * ((float(ELETRODUTOS_DIAM_INTERNO[e]) / 2.0) ** 2) for e in ORDERED_ELETRODUTOS)
+DN_ELETRODUTOS = tuple(float(e) for e in ORDERED_ELETRODUTOS)
+
+# Taxa máxima de ocupação do eletroduto por número de condutores (demais: 40%)
+LIMITE_OCUPACAO = {1: 0.53, 2: 0.31}
+LIMITE_OCUPACAO_PADRAO = 0.40
+
+# Seção mínima por tipo de carga (índice em ORDERED_BITOLAS)
+IDX_BITOLA_MINIMA = {
+    'Iluminação': ORDERED_BITOLAS.index('1.5'),
+    'TUG': ORDERED_BITOLAS.index('2.5'),
+    'TUE': ORDERED_BITOLAS.index('2.5'),
+}
+
+# Memo do cálculo unitário (digitação ao vivo na janela repete entradas)
+_MEMO_DIMENSIONAMENTO = LRUCache(maxsize=512)
+_CHAVES_ENTRADA = (
+    'diam_eletroduto_mm', 'comprimento_m', 'tipo_carga', 'potencia_w', 'corrente_a',
+    'tensao_v', 'fp', 'tipo_circuito', 'num_fios', 'num_circuitos_agrup', 'bitola_manual',
+)
+
+# =========================================================================
+# CÁLCULO EM LOTE
+# =========================================================================
+# Chaves do resultado colunar de calcular_dimensionamento_lote
+COLUNAS_RESULTADO = (
+    'ok', 'bitola', 'motivo_bitola', 'corrente', 'corrente_fca', 'fca',
+    'num_condutores', 'ocupacao', 'limite_ocupacao', 'queda_tensao', 'queda_ok',
+    'dist_maxima', 'eletroduto_recomendado', 'eletroduto_atualizado_para_check',
+    'erros', 'dicas',
+)
+
+# Valores assumidos para colunas não informadas no lote
+PADROES_LOTE = {
+    'corrente_a': None,
+    'potencia_w': None,
+    'fp': 1.0,
+    'tipo_carga': None,
+    'num_fios': 3,
+    'bitola_manual': None,
+    'diam_eletroduto_mm': 25.0,
+}
+
 # =========================================================================
 # MOTOR E FUNÇÕES CORE
 # =========================================================================
@@ -95,23 +156,25 @@ class QuedaTensaoEngine(object):
     def _encontrar_eletroduto_adequado(num_condutores, diam_cabo_mm):
         """Retorna o eletroduto ideal do mercado para o número de cabos e bitola atuais"""
         # Limite permitido
-        if num_condutores == 1:
-            limite = 0.53
-        elif num_condutores == 2:
-            limite = 0.31
-        else:
-            limite = 0.40
+        limite = LIMITE_OCUPACAO.get(num_condutores, LIMITE_OCUPACAO_PADRAO)
 
-        area_condutor = math.pi * ((float(diam_cabo_mm) / 2.0) ** 2)
+        area_condutor = AREAS_CABOS_MM2.get(diam_cabo_mm)
+        if area_condutor is None:
+            area_condutor = math.pi * ((float(diam_cabo_mm) / 2.0) ** 2)
         area_ocupada = num_condutores * area_condutor
 
-        for eletroduto_dn in ORDERED_ELETRODUTOS:
-            diam_interno = ELETRODUTOS_DIAM_INTERNO[eletroduto_dn]
-            area_eletroduto = math.pi * ((float(diam_interno) / 2.0) ** 2)
-            
-            ocupacao_percent = (area_ocupada / area_eletroduto)
-            if ocupacao_percent <= limite:
-                return eletroduto_dn, round(ocupacao_percent * 100, 1), round(limite * 100, 1)
+        # Ocupação decresce com a área do eletroduto: busca binária do primeiro que atende
+        lo, hi = 0, len(AREAS_ELETRODUTOS_MM2)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if (area_ocupada / AREAS_ELETRODUTOS_MM2[mid]) <= limite:
+                hi = mid
+            else:
+                lo = mid + 1
+
+        if lo < len(AREAS_ELETRODUTOS_MM2):
+            ocupacao_percent = (area_ocupada / AREAS_ELETRODUTOS_MM2[lo])
+            return ORDERED_ELETRODUTOS[lo], round(ocupacao_percent * 100, 1), round(limite * 100, 1)
         
         # Caso ultrapasse o máximo (100mm)
         return "100", 100.0, round(limite*100, 1)
@@ -122,13 +185,42 @@ class QuedaTensaoEngine(object):
         closest = None
         min_diff = float('inf')
         
-        for elet in ORDERED_ELETRODUTOS:
-            diff = abs(float(elet) - float(diam_atual_mm))
+        diam_atual_mm = float(diam_atual_mm)
+        for elet, dn in zip(ORDERED_ELETRODUTOS, DN_ELETRODUTOS):
+            diff = abs(dn - diam_atual_mm)
             if diff < min_diff:
                 min_diff = diff
                 closest = elet
         return closest
 
+    @staticmethod
+    def _calcular_corrente(inputs):
+        """Corrente de projeto (A): informada diretamente ou derivada da potência"""
+        if inputs.get('corrente_a'):
+            return float(inputs['corrente_a'])
+        p = float(inputs['potencia_w'])
+        v = float(inputs['tensao_v'])
+        fp = float(inputs['fp'])
+        if inputs['tipo_circuito'] in ['mono', 'bi']:
+            return p / (v * fp)
+        return p / (1.732 * v * fp)
+
+    @staticmethod
+    def _fator_agrupamento(num_circuitos_agrup):
+        agrup = int(num_circuitos_agrup)
+        if agrup > 9: agrup = 9
+        if agrup < 1: agrup = 1
+        return FATOR_AGRUPAMENTO[agrup]
+
+    @staticmethod
+    def _indice_bitola_auto(corrente_corrigida, tipo_carga):
+        """Índice em ORDERED_BITOLAS da menor seção que conduz a corrente corrigida (ou None)"""
+        idx = bisect_left(AMPACIDADES_ORDENADAS, corrente_corrigida)
+        # Comparação explícita também descarta NaN (bisect não garante)
+        if idx >= len(AMPACIDADES_ORDENADAS) or not (AMPACIDADES_ORDENADAS[idx] >= corrente_corrigida):
+            return None
+        return max(idx, IDX_BITOLA_MINIMA.get(tipo_carga, 0))
+
     @staticmethod
     def calcular_dimensionamento(inputs):
         """ 
@@ -144,28 +236,50 @@ class QuedaTensaoEngine(object):
         - num_circuitos_agrup (int)
         - bitola_manual (str ou None)
         """
-        
-        erros = []
-        dicas = []
+        try:
+            chave = tuple(inputs.get(k) for k in _CHAVES_ENTRADA)
+            hash(chave)
+        except TypeError:
+            chave = None
 
+        res = _MEMO_DIMENSIONAMENTO.get(chave) if chave is not None else None
+        if res is None:
+            res = QuedaTensaoEngine._calcular_dimensionamento(inputs)
+            if chave is not None:
+                _MEMO_DIMENSIONAMENTO.put(chave, res)
+        # Cópia rasa: quem chama pode alterar as listas sem contaminar o memo
+        return dict(res, erros=list(res['erros']), dicas=list(res['dicas']))
+
+    @staticmethod
+    def _calcular_dimensionamento(inputs):
         # 1. CALCULA A CORRENTE
-        if inputs.get('corrente_a'):
-            corrente = float(inputs['corrente_a'])
-        else:
-            p = float(inputs['potencia_w'])
-            v = float(inputs['tensao_v'])
-            fp = float(inputs['fp'])
-            if inputs['tipo_circuito'] in ['mono', 'bi']:
-                corrente = p / (v * fp)
-            else:
-                corrente = p / (1.732 * v * fp)
-        
+        corrente = QuedaTensaoEngine._calcular_corrente(inputs)
+
         # 2. SELECIONA A BITOLA (Por Ampacidade Corrigida)
-        agrup = int(inputs['num_circuitos_agrup'])
-        if agrup > 9: agrup = 9
-        if agrup < 1: agrup = 1
-        
-        fca = FATOR_AGRUPAMENTO[agrup]
+        fca = QuedaTensaoEngine._fator_agrupamento(inputs['num_circuitos_agrup'])
+        idx_auto = QuedaTensaoEngine._indice_bitola_auto(corrente / fca, inputs.get('tipo_carga'))
+
+        c = 58.0 # Cobre
+        tensao = float(inputs['tensao_v'])
+        comp = float(inputs['comprimento_m'])
+        fator = 1.732 if inputs['tipo_circuito'] == 'tri' else 2.0
+
+        def queda_de(idx):
+            # Formula da imagem: Δv (V) = (I * L * Fator) / (C * S)
+            s_mm2 = SECOES_MM2[idx]
+            delta_v_absoluto = (corrente * comp * fator) / (c * s_mm2)
+            return (delta_v_absoluto / tensao) * 100.0
+
+        return QuedaTensaoEngine._montar_resultado(inputs, corrente, fca, idx_auto, queda_de)
+
+    @staticmethod
+    def _montar_resultado(inputs, corrente, fca, idx_auto, queda_de):
+        """Etapas 2-4 do dimensionamento a partir dos valores numéricos já resolvidos.
+        Compartilhado entre o cálculo unitário e o em lote para que ambos gerem o mesmo resultado.
+        queda_de(idx) -> queda percentual usando a bitola ORDERED_BITOLAS[idx]."""
+        erros = []
+        dicas = []
+
         corrente_corrigida = corrente / fca
 
         bitola_recomendada = None
@@ -176,16 +290,9 @@ class QuedaTensaoEngine(object):
             amp_manual = BITOLAS_CAPACIDADE[bitola_manual][0]
             if amp_manual < corrente_corrigida:
                 erros.append("⚠️ Bitola Manual ({}mm²) insuficiente para Corrente Corrigida ({}A). (Capacidade: {}A)".format(bitola_manual, round(corrente_corrigida,1), amp_manual))
-        else:
+        elif idx_auto is not None:
             # Automático
-            for b in ORDERED_BITOLAS:
-                amp, diam = BITOLAS_CAPACIDADE[b]
-                if amp >= corrente_corrigida:
-                    carga = inputs['tipo_carga']
-                    if carga == 'Iluminação' and float(b) < 1.5: continue
-                    elif carga in ['TUG', 'TUE'] and float(b) < 2.5: continue
-                    bitola_recomendada = b
-                    break
+            bitola_recomendada = ORDERED_BITOLAS[idx_auto]
         
         if not bitola_recomendada:
             erros.append("Corrente ({}A) muito alta para as seções padronizadas.".format(round(corrente_corrigida,1)))
@@ -212,13 +319,11 @@ class QuedaTensaoEngine(object):
         # 4. CALCULO DA QUEDA DE TENSÃO
         c = 58.0 # Cobre
         tensao = float(inputs['tensao_v'])
-        comp = float(inputs['comprimento_m'])
         s_mm2 = float(bitola_recomendada)
         fator = 1.732 if inputs['tipo_circuito'] == 'tri' else 2.0
 
-        # Formula da imagem: Δv (V) = (I * L * Fator) / (C * S)
-        delta_v_absoluto = (corrente * comp * fator) / (c * s_mm2)
-        queda_percentual = (delta_v_absoluto / tensao) * 100.0
+        idx_atual = ORDERED_BITOLAS.index(bitola_recomendada)
+        queda_percentual = queda_de(idx_atual)
 
         # Distância máxima (4%)
         if corrente > 0:
@@ -232,12 +337,9 @@ class QuedaTensaoEngine(object):
             
         # Fallback se não for manual
         if not bitola_manual and queda_percentual > 4.0:
-            idx_atual = ORDERED_BITOLAS.index(bitola_recomendada)
             for idx in range(idx_atual+1, len(ORDERED_BITOLAS)):
                 b_test = ORDERED_BITOLAS[idx]
-                s_test = float(b_test)
-                dv_t = (corrente * comp * fator) / (c * s_test)
-                q_t = (dv_t / tensao) * 100.0
+                q_t = queda_de(idx)
                 
                 if q_t <= 4.0 or idx == len(ORDERED_BITOLAS)-1:
                     dicas.append("ℹ️ Bitola elevada para {}mm² para atender limite de 4% de queda.".format(b_test))
@@ -272,3 +374,134 @@ class QuedaTensaoEngine(object):
             "erros": erros,
             "dicas": dicas
         }
+
+    @staticmethod
+    def calcular_dimensionamento_lote(colunas):
+        """
+        Dimensiona vários circuitos de uma vez (ex.: todos os circuitos do projeto).
+
+        colunas: dict com as mesmas chaves de calcular_dimensionamento. Cada valor
+        é uma lista/array (uma posição por circuito) ou um escalar aplicado a todos.
+        Obrigatórias: corrente_a ou potencia_w, tensao_v, comprimento_m,
+        num_circuitos_agrup e tipo_circuito; as demais seguem PADROES_LOTE.
+
+        Retorna dict colunar {chave: [valor por circuito]} com as chaves de
+        COLUNAS_RESULTADO, idêntico a chamar calcular_dimensionamento linha a linha.
+        Linhas cujo cálculo unitário lançaria exceção vêm com ok=False e a
+        mensagem em 'erros'. Usa NumPy quando disponível.
+        """
+        linhas = QuedaTensaoEngine._colunas_para_linhas(colunas)
+        if np is not None and linhas:
+            resultados = QuedaTensaoEngine._lote_numpy(linhas)
+        else:
+            resultados = [QuedaTensaoEngine._calcular_linha(inp) for inp in linhas]
+
+        saida = dict((k, []) for k in COLUNAS_RESULTADO)
+        for res in resultados:
+            for k in COLUNAS_RESULTADO:
+                saida[k].append(res.get(k))
+        return saida
+
+    @staticmethod
+    def _colunas_para_linhas(colunas):
+        """Converte o dict colunar em uma lista de dicts de entrada (um por circuito)"""
+        def e_coluna(v):
+            return hasattr(v, '__len__') and not hasattr(v, 'strip')
+
+        tamanhos = set(len(v) for v in colunas.values() if e_coluna(v))
+        if len(tamanhos) > 1:
+            raise ValueError("Colunas com tamanhos diferentes: {}".format(sorted(tamanhos)))
+        n = tamanhos.pop() if tamanhos else 0
+
+        dados = dict(PADROES_LOTE)
+        dados.update(colunas)
+        linhas = []
+        for i in range(n):
+            linhas.append(dict((k, v[i] if e_coluna(v) else v) for k, v in dados.items()))
+        return linhas
+
+    @staticmethod
+    def _calcular_linha(inputs):
+        try:
+            return QuedaTensaoEngine.calcular_dimensionamento(inputs)
+        except Exception as e:
+            return {"ok": False, "bitola": None, "erros": ["Entrada inválida: {}".format(e)], "dicas": []}
+
+    @staticmethod
+    def _lote_numpy(linhas):
+        """Resolve corrente, bitola automática e quedas de todas as linhas de forma vetorizada.
+        Linhas com entrada inválida (conversão, divisão por zero) seguem pelo cálculo unitário."""
+        n = len(linhas)
+        usa_corrente = np.zeros(n, dtype=bool)
+        corrente_in = np.zeros(n)
+        potencia = np.zeros(n)
+        tensao = np.ones(n)
+        fp = np.ones(n)
+        comp = np.zeros(n)
+        trifasico = np.zeros(n, dtype=bool)   # fórmula da corrente (tudo que não é mono/bi)
+        fator = np.full(n, 2.0)
+        fca = np.ones(n)
+        idx_minimo = np.zeros(n, dtype=np.int64)
+        valido = np.ones(n, dtype=bool)
+
+        for i, inp in enumerate(linhas):
+            try:
+                if inp.get('corrente_a'):
+                    usa_corrente[i] = True
+                    corrente_in[i] = float(inp['corrente_a'])
+                else:
+                    potencia[i] = float(inp['potencia_w'])
+                    fp[i] = float(inp['fp'])
+                tensao[i] = float(inp['tensao_v'])
+                comp[i] = float(inp['comprimento_m'])
+                trifasico[i] = inp['tipo_circuito'] not in ['mono', 'bi']
+                if inp['tipo_circuito'] == 'tri':
+                    fator[i] = 1.732
+                fca[i] = QuedaTensaoEngine._fator_agrupamento(inp['num_circuitos_agrup'])
+                idx_minimo[i] = IDX_BITOLA_MINIMA.get(inp.get('tipo_carga'), 0)
+            except Exception:
+                valido[i] = False
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            corrente = np.where(
+                usa_corrente, corrente_in,
+                np.where(trifasico, potencia / (1.732 * tensao * fp), potencia / (tensao * fp)))
+            corrente_corrigida = corrente / fca
+
+            # Primeira bitola com ampacidade >= corrente corrigida (respeitando a seção mínima da carga)
+            idx_auto = np.searchsorted(_AMPACIDADES_NP, corrente_corrigida, side='left')
+            idx_auto = np.where(idx_auto < len(ORDERED_BITOLAS), np.maximum(idx_auto, idx_minimo), idx_auto)
+
+            # Queda (%) de cada linha para todas as bitolas: Δv = (I * L * Fator) / (C * S)
+            delta_v = (corrente * comp * fator)[:, None] / (58.0 * _SECOES_NP)[None, :]
+            quedas = (delta_v / tensao[:, None]) * 100.0
+
+        valido &= np.isfinite(corrente) & (tensao != 0)
+        valido &= usa_corrente | ((tensao * fp) != 0)
+
+        corrente_l = corrente.tolist()
+        fca_l = fca.tolist()
+        idx_l = idx_auto.tolist()
+        valido_l = valido.tolist()
+        quedas_l = quedas.tolist()
+
+        resultados = []
+        sem_bitola = len(ORDERED_BITOLAS)
+        for i, inp in enumerate(linhas):
+            if not valido_l[i]:
+                resultados.append(QuedaTensaoEngine._calcular_linha(inp))
+                continue
+            idx = idx_l[i] if idx_l[i] < sem_bitola else None
+            try:
+                res = QuedaTensaoEngine._montar_resultado(
+                    inp, corrente_l[i], fca_l[i], idx, quedas_l[i].__getitem__)
+            except Exception:
+                res = QuedaTensaoEngine._calcular_linha(inp)
+            resultados.append(res)
+        return resultados
+
+
+# Vetores auxiliares do cálculo em lote
+if np is not None:
+    _AMPACIDADES_NP = np.array(AMPACIDADES_ORDENADAS)
+    _SECOES_NP = np.array(SECOES_MM2)
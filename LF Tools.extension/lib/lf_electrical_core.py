@@ -18,7 +18,7 @@ from Autodesk.Revit.UI import *
 from Autodesk.Revit.UI.Selection import ObjectType, ISelectionFilter
 from pyrevit import forms, script
 import traceback
-from collections import OrderedDict
+from collections import OrderedDict, deque, namedtuple
 
 # Queda de Tensão: inserir lib no path
 lib_path = os.path.dirname(__file__)
@@ -302,14 +302,7 @@ def show_settings():
         key = opcoes[escolha]
 
         if key == 'dist_system':
-            all_systems = []
-            for s in FilteredElementCollector(doc).OfClass(DistributionSysType).ToElements():
-                try:
-                    name = s.Name
-                except Exception:
-                    p = s.get_Parameter(BuiltInParameter.SYMBOL_NAME_PARAM)
-                    name = p.AsString() if p else "?"
-                all_systems.append(name)
+            all_systems = list(get_electrical_catalog().dist_systems_by_name().keys())
 
             if not all_systems:
                 forms.alert("Nenhum sistema de distribuição encontrado no modelo.")
@@ -425,41 +418,11 @@ def is_element_connected_to_panel(elem):
 
 def _find_matching_dist_sys(target_voltage):
     """Find ElementId of DistributionSysType whose voltage range covers target_voltage (Volts)."""
-    v_internal = float(target_voltage) * 10.7639104167
     dbg.step('  Buscando sistema para {:.1f}V'.format(float(target_voltage)))
-
-    voltage_bips = []
-    for bip_name in ["RBS_ELEC_DISTRIBUTION_SYS_VOLTAGE_L_G_PARAM",
-                     "RBS_ELEC_DISTRIBUTION_SYS_VOLTAGE_L_L_PARAM"]:
-        try:
-            voltage_bips.append(getattr(BuiltInParameter, bip_name))
-        except Exception:
-            dbg.step('  BuiltInParameter indisponivel: {}'.format(bip_name))
-    if not voltage_bips:
-        dbg.warn('  Parametros de tensao do sistema indisponiveis nesta versao do Revit')
-        return None
-    
-    for s in FilteredElementCollector(doc).OfClass(DistributionSysType).ToElements():
-        # RBS_ELEC_DISTRIBUTION_SYS_VOLTAGE_L_G_PARAM (Fase-Neutro)
-        # RBS_ELEC_DISTRIBUTION_SYS_VOLTAGE_L_L_PARAM (Fase-Fase)
-        for bip in voltage_bips:
-            vp = s.get_Parameter(bip)
-            if not vp or not vp.HasValue: continue
-            
-            vid = vp.AsElementId()
-            if vid == ElementId.InvalidElementId: continue
-            
-            vtype = doc.GetElement(vid)
-            if not vtype: continue
-            
-            min_p = vtype.get_Parameter(BuiltInParameter.RBS_ELEC_VOLTAGE_MIN_PARAM)
-            max_p = vtype.get_Parameter(BuiltInParameter.RBS_ELEC_VOLTAGE_MAX_PARAM)
-            if min_p and max_p:
-                # Margem de +- 55 unidades internas (~5 Volts)
-                if (min_p.AsDouble() - 55) <= v_internal <= (max_p.AsDouble() + 55):
-                    dbg.ok('  Sistema compativel: {}'.format(s.Name))
-                    return s.Id
-    return None
+    dist_id = get_electrical_catalog().dist_sys_for_voltage(target_voltage)
+    if dist_id is not None:
+        dbg.ok('  Sistema compativel: {}'.format(doc.GetElement(dist_id).Name))
+    return dist_id
 
 
 def configure_element_for_voltage(elem, voltage, poles):
@@ -635,111 +598,117 @@ def get_family_name(elem):
     except Exception: pass
     return ""
 
-def get_room_name(elem):
+def _room_name_by_phase(elem):
+    """Room/Space do elemento pela fase de criação (propriedades da instância)."""
     eid = elem.Id.IntegerValue
-    # Estratégia 1: Room via Phase (Revit PT-BR usa indexer Room[Phase])
+    phase = None
     try:
-        if hasattr(elem, "Room"):
-            phase = None
-            try:
-                phase_id = elem.CreatedPhaseId
-                if phase_id and phase_id != ElementId.InvalidElementId:
-                    phase = elem.Document.GetElement(phase_id)
-            except Exception:
-                pass
-            if phase:
-                try:
-                    rm = elem.Room[phase]
-                    if rm:
-                        name = rm.get_Parameter(BuiltInParameter.ROOM_NAME).AsString()
-                        if name:
-                            dbg.step('Room[Phase]: "{}" (Id={})'.format(name, eid))
-                            return name
-                except Exception:
-                    pass
+        phase_id = elem.CreatedPhaseId
+        if phase_id and phase_id != ElementId.InvalidElementId:
+            phase = elem.Document.GetElement(phase_id)
     except Exception:
         pass
+    if not phase:
+        return None
+    # Estratégia 1: Room via Phase (Revit PT-BR usa indexer Room[Phase])
     # Estratégia 2: Space via Phase
+    for attr, label in (("Room", "Room[Phase]"), ("Space", "Space[Phase]")):
+        try:
+            if hasattr(elem, attr):
+                rm = getattr(elem, attr)[phase]
+                if rm:
+                    name = rm.get_Parameter(BuiltInParameter.ROOM_NAME).AsString()
+                    if name:
+                        dbg.step('{}: "{}" (Id={})'.format(label, name, eid))
+                        return name
+        except Exception:
+            pass
+    return None
+
+def _room_probe_points(elem):
+    """
+    Pontos de teste para o fallback geométrico. Para elementos hospedados em parede,
+    Location.Point cai dentro da espessura da parede: geramos candidatos com offset nas
+    direções da face (FacingOrientation) e nas 4 direções ortogonais — um deles estará
+    dentro do ambiente.
+    """
+    if not (hasattr(elem, "Location") and elem.Location and hasattr(elem.Location, "Point")):
+        return []
+    pt = elem.Location.Point
+    OFFSET = 0.5  # ~15 cm em pés
+    candidates = [pt]
     try:
-        if hasattr(elem, "Space"):
-            phase = None
-            try:
-                phase_id = elem.CreatedPhaseId
-                if phase_id and phase_id != ElementId.InvalidElementId:
-                    phase = elem.Document.GetElement(phase_id)
-            except Exception:
-                pass
-            if phase:
-                try:
-                    sp = elem.Space[phase]
-                    if sp:
-                        name = sp.get_Parameter(BuiltInParameter.ROOM_NAME).AsString()
-                        if name:
-                            dbg.step('Space[Phase]: "{}" (Id={})'.format(name, eid))
-                            return name
-                except Exception:
-                    pass
+        fo = elem.FacingOrientation
+        candidates.append(XYZ(pt.X + fo.X * OFFSET, pt.Y + fo.Y * OFFSET, pt.Z))
+        candidates.append(XYZ(pt.X - fo.X * OFFSET, pt.Y - fo.Y * OFFSET, pt.Z))
     except Exception:
         pass
-    # Estratégia 3: GetRoomAtPoint (fallback geométrico)
-    # Para elementos hospedados em parede, Location.Point cai dentro da espessura da parede.
-    # Geramos candidatos de ponto com offset nas direções da face (FacingOrientation) e
-    # também nas 4 direções ortogonais — um deles estará dentro do ambiente.
-    def _name_from_room_or_space(target_doc, pt):
-        for getter in [target_doc.GetRoomAtPoint, target_doc.GetSpaceAtPoint]:
-            try:
-                obj = getter(pt)
-                if obj:
-                    p = obj.get_Parameter(BuiltInParameter.ROOM_NAME)
-                    if p:
-                        n = p.AsString()
-                        if n:
-                            return n
-            except Exception:
-                pass
-        return None
+    for dx, dy in [(OFFSET, 0), (-OFFSET, 0), (0, OFFSET), (0, -OFFSET)]:
+        candidates.append(XYZ(pt.X + dx, pt.Y + dy, pt.Z))
+    return candidates
+
+def get_electrical_catalog(target_doc=None):
+    """Sistemas de distribuição, tensões e fiação do documento (ver lf_revit.ElectricalCatalog)."""
+    from lf_revit import get_electrical_catalog as _catalog
+    return _catalog(target_doc or doc)
+
+# RoomIndex por documento, montado uma vez por comando (o módulo é recarregado a cada execução)
+_room_indexes = {}
+
+def get_room_index(target_doc=None):
+    """Índice de Rooms/Spaces do documento e dos vínculos carregados (ver lf_revit.RoomIndex)."""
+    target_doc = target_doc or doc
+    key = target_doc.PathName or target_doc.Title
+    index = _room_indexes.get(key)
+    if index is None:
+        from lf_revit import RoomIndex
+        index = _room_indexes[key] = RoomIndex(target_doc)
+        dbg.step('RoomIndex: {} ambientes/espaços (hospedeiro + vínculos)'.format(len(index)))
+    return index
 
+def get_room_name(elem):
+    eid = elem.Id.IntegerValue
+    name = _room_name_by_phase(elem)
+    if name:
+        return name
+    # Estratégia 3: fallback geométrico pelo índice de ambientes (hospedeiro e links)
     try:
-        if hasattr(elem, "Location") and elem.Location and hasattr(elem.Location, "Point"):
-            pt = elem.Location.Point
-
-            # Candidatos: ponto original + offsets para atravessar a espessura da parede
-            OFFSET = 0.5  # ~15 cm em pés
-            candidates = [pt]
-            try:
-                fo = elem.FacingOrientation
-                candidates.append(XYZ(pt.X + fo.X * OFFSET, pt.Y + fo.Y * OFFSET, pt.Z))
-                candidates.append(XYZ(pt.X - fo.X * OFFSET, pt.Y - fo.Y * OFFSET, pt.Z))
-            except Exception:
-                pass
-            for dx, dy in [(OFFSET, 0), (-OFFSET, 0), (0, OFFSET), (0, -OFFSET)]:
-                candidates.append(XYZ(pt.X + dx, pt.Y + dy, pt.Z))
-
-            for candidate in candidates:
-                name = _name_from_room_or_space(elem.Document, candidate)
-                if name:
-                    dbg.step('Room por ponto: "{}" (Id={})'.format(name, eid))
-                    return name
-
-            # Buscar em Links (Modelos vinculados) com os mesmos candidatos
-            for link in FilteredElementCollector(doc).OfClass(RevitLinkInstance).ToElements():
-                link_doc = link.GetLinkDocument()
-                if not link_doc:
-                    continue
-                try:
-                    inv = link.GetTransform().Inverse
-                    for candidate in candidates:
-                        name = _name_from_room_or_space(link_doc, inv.OfPoint(candidate))
-                        if name:
-                            dbg.step('Room (Link) por ponto: "{}" (Id={})'.format(name, eid))
-                            return name
-                except Exception:
-                    pass
+        candidates = _room_probe_points(elem)
+        if candidates:
+            name = get_room_index(elem.Document).name_at(candidates)
+            if name:
+                dbg.step('Room por ponto: "{}" (Id={})'.format(name, eid))
+                return name
     except Exception as ex:
         dbg.warn('get_room_name fallback erro: {} (Id={})'.format(ex, eid))
     dbg.warn('Sem room/space para Id={}'.format(eid))
     return ""
 
+def batch_room_names(elements):
+    """
+    Nome do ambiente de vários elementos de uma vez: {Id.IntegerValue: nome ou ""}.
+    Mesma lógica de get_room_name, com um único índice por documento e sem log por elemento.
+    """
+    names = {}
+    for elem in elements:
+        try:
+            eid = elem.Id.IntegerValue
+        except Exception:
+            continue
+        if eid in names:
+            continue
+        name = None
+        try:
+            name = _room_name_by_phase(elem)
+            if not name:
+                candidates = _room_probe_points(elem)
+                if candidates:
+                    name = get_room_index(elem.Document).name_at(candidates)
+        except Exception:
+            name = None
+        names[eid] = name or ""
+    return names
+
 def get_valid_electrical_elements(elem, expected_domains=(Domain.DomainElectrical,)):
     dbg.enter('get_valid_electrical_elements', Id=elem.Id.IntegerValue)
     valid_pairs = []
@@ -879,15 +848,11 @@ def _get_compatible_systems(panel):
     except Exception as ex:
         dbg.warn("Erro ao ler conector: {}".format(ex))
 
-    # Obter todos os sistemas
-    all_systems = {}
-    for s in FilteredElementCollector(doc).OfClass(DistributionSysType).ToElements():
-        n = ""
-        try: n = s.Name
-        except Exception:
-            pp = s.get_Parameter(BuiltInParameter.SYMBOL_NAME_PARAM)
-            if pp: n = pp.AsString()
-        if n: all_systems[n] = s
+    # Obter todos os sistemas (catálogo do documento: faixas de tensão já lidas)
+    entries = {}
+    for entry in get_electrical_catalog().dist_systems():
+        if entry.name: entries.setdefault(entry.name, entry)
+    all_systems = dict((n, e.element) for n, e in entries.items())
 
     if not all_systems:
         dbg.warn('Nenhum DistributionSysType no modelo')
@@ -902,14 +867,9 @@ def _get_compatible_systems(panel):
         return compatible
     
     compatible = {}
-    for name, sys in all_systems.items():
+    for name, entry in entries.items():
         # Lógica de Fases
-        try:
-            phase_bip = getattr(BuiltInParameter, "RBS_ELEC_DISTRIBUTION_SYS_PHASE_PARAM")
-        except Exception:
-            phase_bip = None
-        sys_phase_p = sys.get_Parameter(phase_bip) if phase_bip is not None else None
-        sys_phase = sys_phase_p.AsInteger() if sys_phase_p else 2
+        sys_phase = entry.phase if entry.phase is not None else 2
         
         # Monofásico não aceita painel de 3 fases
         if sys_phase == 1 and poles_panel is not None and poles_panel >= 3:
@@ -918,31 +878,15 @@ def _get_compatible_systems(panel):
             
         # Lógica de Tensão
         v_ok = False
-        voltage_params = []
-        for bip_name in ["RBS_ELEC_DISTRIBUTION_SYS_VOLTAGE_L_L_PARAM",
-                         "RBS_ELEC_DISTRIBUTION_SYS_VOLTAGE_L_G_PARAM"]:
-            try:
-                bip = getattr(BuiltInParameter, bip_name)
-                voltage_params.append(sys.get_Parameter(bip))
-            except Exception:
-                pass
-        
-        for vparam in voltage_params:
-            if vparam and vparam.AsElementId() != ElementId.InvalidElementId:
-                vtype = doc.GetElement(vparam.AsElementId())
-                if vtype:
-                    min_p = vtype.get_Parameter(BuiltInParameter.RBS_ELEC_VOLTAGE_MIN_PARAM)
-                    max_p = vtype.get_Parameter(BuiltInParameter.RBS_ELEC_VOLTAGE_MAX_PARAM)
-                    if min_p and max_p:
-                        v_min = min_p.AsDouble()
-                        v_max = max_p.AsDouble()
-                        # Margem flexível de +- 5 Volts (5 * 10.76 internamente ~ 55 unidades)
-                        if (v_min - 55) <= v_panel <= (v_max + 55):
-                            v_ok = True
-                            break
+        for vtype in (entry.ll, entry.lg):
+            if vtype and vtype.min is not None and vtype.max is not None:
+                # Margem flexível de +- 5 Volts (5 * 10.76 internamente ~ 55 unidades)
+                if (vtype.min - 55) <= v_panel <= (vtype.max + 55):
+                    v_ok = True
+                    break
                             
         if v_ok:
-            compatible[name] = sys.Id
+            compatible[name] = entry.element.Id
             dbg.step('  [OK] {}'.format(name))
         else:
             dbg.step('  [--] {} (Incompatível: Tensão não bate)'.format(name))
@@ -1042,6 +986,106 @@ def select_and_configure_panel():
                 forms.alert(msg)
     except Exception: pass
 
+# ==================== GRAFO DE CONECTORES (ELETRODUTOS) ====================
+
+# Limite de elementos visitados por busca (redes grandes ou conectadas a tudo)
+CONDUIT_TRACE_MAX_NODES = 5000
+
+# Trecho de eletroduto no caminho: diâmetro em mm e comprimento em m
+ConduitRun = namedtuple("ConduitRun", ["id", "diam_mm", "length_m"])
+
+def _connector_manager(el):
+    try:
+        mep = getattr(el, "MEPModel", None)
+        if mep is not None:
+            return mep.ConnectorManager
+    except Exception:
+        pass
+    try:
+        return el.ConnectorManager
+    except Exception:
+        return None
+
+def _conduit_run(conduit):
+    diam_mm, length_m = 0.0, 0.0
+    try: diam_mm = round(conduit.get_Parameter(BuiltInParameter.RBS_CONDUIT_DIAMETER_PARAM).AsDouble() * 304.8, 2)
+    except Exception: pass
+    try: length_m = round(conduit.get_Parameter(BuiltInParameter.CURVE_ELEM_LENGTH).AsDouble() * 0.3048, 2)
+    except Exception: pass
+    return ConduitRun(conduit.Id.IntegerValue, diam_mm, length_m)
+
+def trace_conduit_path(elem, target_id=None, max_nodes=CONDUIT_TRACE_MAX_NODES):
+    """
+    Busca em largura pelos conectores de eletroduto a partir do próprio elemento,
+    atravessando conexões, caixas e outros eletrodutos (não atravessa outros quadros).
+
+    Com target_id (ex.: quadro do circuito) devolve os trechos de eletroduto do caminho
+    mais curto (em número de conexões) até ele: ([ConduitRun, ...], True), do elemento
+    para o quadro. Sem alvo, ou se ele não for alcançado dentro de max_nodes, devolve
+    o caminho até o eletroduto mais próximo: ([ConduitRun], False) ou ([], False).
+    """
+    cat_conduit = int(BuiltInCategory.OST_Conduit)
+    cat_equip = int(BuiltInCategory.OST_ElectricalEquipment)
+    start = elem.Id.IntegerValue
+    parent = {start: None}
+    by_id = {start: elem}
+    nearest = None
+    found = None
+    queue = deque([elem])
+    while queue:
+        el = queue.popleft()
+        el_int = el.Id.IntegerValue
+        if target_id is not None and el_int == target_id:
+            found = el_int
+            break
+        try:
+            cat = el.Category.Id.IntegerValue if el.Category else None
+        except Exception:
+            cat = None
+        if cat == cat_conduit and nearest is None:
+            nearest = el_int
+            if target_id is None:
+                break
+        if el_int != start and cat == cat_equip:
+            continue
+        if len(parent) >= max_nodes:
+            continue
+        cm = _connector_manager(el)
+        if cm is None:
+            continue
+        for c in cm.Connectors:
+            try:
+                if c.Domain != Domain.DomainCableTrayConduit or not c.IsConnected:
+                    continue
+                for other in c.AllRefs:
+                    owner = other.Owner
+                    if owner is None:
+                        continue
+                    oid = owner.Id.IntegerValue
+                    if oid in parent:
+                        continue
+                    parent[oid] = el_int
+                    by_id[oid] = owner
+                    queue.append(owner)
+            except Exception:
+                continue
+
+    end = found if found is not None else nearest
+    runs = []
+    node = end
+    while node is not None:
+        el = by_id[node]
+        try:
+            if el.Category and el.Category.Id.IntegerValue == cat_conduit:
+                runs.append(_conduit_run(el))
+        except Exception:
+            pass
+        node = parent[node]
+    runs.reverse()
+    if found is None and runs:
+        runs = runs[:1]
+    return runs, found is not None
+
 def call_queda_tensao():
     try:
         ref = uidoc.Selection.PickObject(ObjectType.Element, ElectricalElementFilter(), "Verificar Queda de Tensão")
@@ -1084,23 +1128,14 @@ def call_queda_tensao():
         try: comp_m = round(circuit.Length * 0.3048, 2)
         except Exception: pass
 
+        # Eletrodutos a partir dos conectores do próprio elemento até o quadro do circuito
         try:
-            conduits = FilteredElementCollector(doc).OfCategory(BuiltInCategory.OST_Conduit).WhereElementIsNotElementType().ToElements()
-            for cond in conduits:
-                try:
-                    cm = cond.ConnectorManager
-                    if cm:
-                        for c in cm.Connectors:
-                            if c.IsConnected:
-                                for ref_conn in c.AllRefs:
-                                    owner = ref_conn.Owner
-                                    if owner and owner.Id == elem.Id:
-                                        p = cond.get_Parameter(BuiltInParameter.RBS_CONDUIT_DIAMETER_PARAM)
-                                        if p and p.HasValue:
-                                            diam_mm = round(p.AsDouble() * 304.8, 2)
-                                            raise StopIteration
-                except StopIteration: break
-                except Exception: continue
+            base = circuit.BaseEquipment
+            runs, reached = trace_conduit_path(elem, base.Id.IntegerValue if base else None)
+            if runs:
+                diam_mm = runs[0].diam_mm or diam_mm
+            if reached and runs:
+                comp_m = round(sum(r.length_m for r in runs), 2)
         except Exception: pass
 
         circ_info = ""
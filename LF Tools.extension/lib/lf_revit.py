@@ -0,0 +1,1076 @@
+# -*- coding: utf-8 -*-
+"""
+lf_revit.py — Utilitários com Revit API compartilhados pela LF Tools
+====================================================================
+Complemento de lf_utils.py para o que depende da Revit API.
+
+Uso nos scripts:
+    from lf_revit import ViewHighlighter, highlight_overrides
+    from lf_revit import get_schema_cache
+    from lf_revit import get_electrical_catalog, get_electrical_network
+    from lf_revit import RoomIndex
+"""
+
+import re
+import uuid
+from collections import OrderedDict, namedtuple
+
+import clr
+clr.AddReference("RevitAPI")
+
+import System
+from System.Collections.Generic import List
+from Autodesk.Revit.DB import (
+    BuiltInCategory, BuiltInParameter, Color, ElementClassFilter, ElementFilter, ElementId, Family,
+    FilteredElementCollector, FillPatternElement, LogicalOrFilter, OverrideGraphicSettings,
+    ParameterElement, RevitLinkInstance, SelectionFilterElement, SpatialElementBoundaryOptions,
+    UnitUtils,
+)
+from Autodesk.Revit.DB.Electrical import (
+    DistributionSysType, ElectricalSystem, ElectricalSystemType, VoltageType, WireType,
+)
+
+
+# =============================================================================
+#  HIGHLIGHT TEMPORÁRIO
+# =============================================================================
+
+# Prefixo dos SelectionFilterElement temporários (restos de uma sessão que
+# terminou com erro são apagados no próximo show())
+HIGHLIGHT_FILTER_PREFIX = u"LF_Highlight_"
+
+# Abaixo disso, override por elemento é mais barato que criar um filtro
+HIGHLIGHT_FILTER_MIN = 200
+
+
+def solid_fill_pattern_id(doc):
+    """Id do padrão de preenchimento sólido, ou ElementId.InvalidElementId."""
+    for fp in FilteredElementCollector(doc).OfClass(FillPatternElement):
+        try:
+            if fp.GetFillPattern().IsSolidFill:
+                return fp.Id
+        except Exception:
+            continue
+    return ElementId.InvalidElementId
+
+
+def highlight_overrides(doc, color=None, line_weight=6, background=False):
+    """OverrideGraphicSettings de destaque: linha grossa e superfície sólida na cor dada."""
+    color = color or Color(255, 0, 0)
+    ogs = OverrideGraphicSettings()
+    ogs.SetProjectionLineColor(color)
+    try:
+        ogs.SetProjectionLineWeight(line_weight)
+    except Exception:
+        pass
+    fill_id = solid_fill_pattern_id(doc)
+    if fill_id != ElementId.InvalidElementId:
+        try:
+            ogs.SetSurfaceForegroundPatternId(fill_id)
+            ogs.SetSurfaceForegroundPatternColor(color)
+            ogs.SetSurfaceForegroundPatternVisible(True)
+        except Exception:
+            pass
+        if background:
+            try:
+                ogs.SetSurfaceBackgroundPatternId(fill_id)
+                ogs.SetSurfaceBackgroundPatternColor(color)
+                ogs.SetSurfaceBackgroundPatternVisible(True)
+            except Exception:
+                pass
+    return ogs
+
+
+def remove_stale_highlight_filters(doc):
+    """Apaga SelectionFilterElement temporários que ficaram para trás. Requer transação."""
+    stale = []
+    for f in FilteredElementCollector(doc).OfClass(SelectionFilterElement):
+        try:
+            if f.Name.startswith(HIGHLIGHT_FILTER_PREFIX):
+                stale.append(f.Id)
+        except Exception:
+            pass
+    for fid in stale:
+        try:
+            doc.Delete(fid)
+        except Exception:
+            pass
+    return len(stale)
+
+
+class ViewHighlighter(object):
+    """
+    Destaque temporário de um conjunto de elementos numa vista.
+
+    Com muitos elementos usa um SelectionFilterElement com os ids e um único
+    SetFilterOverrides na vista: trocar o conjunto é um SetElementIds e limpar é
+    apagar o filtro, sem override por elemento nem redesenho de cada um. Poucos
+    elementos (ou vista cujo modelo trava os filtros) seguem no override por
+    elemento, como antes.
+
+    Todos os métodos que alteram o modelo exigem uma transação aberta.
+
+        hl = ViewHighlighter(doc, view, highlight_overrides(doc))
+        hl.show(ids)   # substitui o destaque atual
+        hl.clear()
+    """
+
+    def __init__(self, doc, view, overrides, min_filter_count=HIGHLIGHT_FILTER_MIN):
+        self.doc = doc
+        self.view = view
+        self.overrides = overrides
+        self.min_filter_count = min_filter_count
+        self._filter_id = None
+        self._element_ids = []   # ids com override por elemento
+        self._purged = False
+
+    @property
+    def active(self):
+        return self._filter_id is not None or bool(self._element_ids)
+
+    def show(self, element_ids):
+        element_ids = list(element_ids)
+        if len(element_ids) >= self.min_filter_count and self._show_filter(element_ids):
+            self._clear_elements()
+            return
+        self._clear_filter()
+        self._show_elements(element_ids)
+
+    def clear(self):
+        self._clear_filter()
+        self._clear_elements()
+
+    def forget_element_overrides(self):
+        """Deixa de controlar os overrides por elemento (ex.: viraram pintura permanente)."""
+        self._element_ids = []
+
+    # -- filtro ---------------------------------------------------------------
+
+    def _show_filter(self, element_ids):
+        ids = List[ElementId](element_ids)
+        try:
+            if self._filter_id is not None:
+                sfe = self.doc.GetElement(self._filter_id)
+                if sfe is not None:
+                    sfe.SetElementIds(ids)
+                    return True
+                self._filter_id = None
+
+            if not self._purged:
+                remove_stale_highlight_filters(self.doc)
+                self._purged = True
+            name = HIGHLIGHT_FILTER_PREFIX + uuid.uuid4().hex[:8]
+            sfe = SelectionFilterElement.Create(self.doc, name)
+            sfe.SetElementIds(ids)
+            try:
+                self.view.AddFilter(sfe.Id)
+                self.view.SetFilterOverrides(sfe.Id, self.overrides)
+            except Exception:
+                # Vista com modelo controlando filtros: volta ao override por elemento
+                self.doc.Delete(sfe.Id)
+                return False
+            self._filter_id = sfe.Id
+            return True
+        except Exception:
+            return False
+
+    def _clear_filter(self):
+        if self._filter_id is None:
+            return
+        try:
+            self.doc.Delete(self._filter_id)   # remove da vista junto
+        except Exception:
+            pass
+        self._filter_id = None
+
+    # -- por elemento ---------------------------------------------------------
+
+    def _show_elements(self, element_ids):
+        keep = set(e.IntegerValue for e in element_ids)
+        blank = OverrideGraphicSettings()
+        for eid in self._element_ids:
+            if eid.IntegerValue not in keep:
+                try:
+                    self.view.SetElementOverrides(eid, blank)
+                except Exception:
+                    pass
+        for eid in element_ids:
+            try:
+                self.view.SetElementOverrides(eid, self.overrides)
+            except Exception:
+                pass
+        self._element_ids = element_ids
+
+    def _clear_elements(self):
+        blank = OverrideGraphicSettings()
+        for eid in self._element_ids:
+            try:
+                self.view.SetElementOverrides(eid, blank)
+            except Exception:
+                pass
+        self._element_ids = []
+
+
+# =============================================================================
+#  ESQUEMA DE PARÂMETROS
+# =============================================================================
+
+# Definição de um parâmetro como aparece nos elementos de um (categoria, tipo).
+# spec é o ForgeTypeId do tipo de dado (None em versões sem GetDataType);
+# is_type indica que o parâmetro vem do tipo do elemento, não dele mesmo.
+ParamInfo = namedtuple(
+    "ParamInfo",
+    ["name", "id", "definition", "storage_type", "read_only", "spec", "measurable", "is_type"],
+)
+
+# AppDomain: sobrevive entre execuções dos botões (cada uma roda num engine novo)
+_SCHEMA_KEYS = ("LF_ParamSchemaCache", "LF_ParamSchema_DocChanged", "LF_ParamSchema_DocClosing")
+
+
+def _document_key(doc):
+    try:
+        return doc.PathName or doc.Title
+    except Exception:
+        return ""
+
+
+def _param_info(p, is_type):
+    d = p.Definition
+    try:
+        spec = d.GetDataType()          # Revit 2022+
+    except Exception:
+        spec = None
+    measurable = False
+    if spec is not None:
+        try:
+            measurable = UnitUtils.IsMeasurableSpec(spec)
+        except Exception:
+            pass
+    return ParamInfo(d.Name, p.Id.IntegerValue, d, p.StorageType, p.IsReadOnly,
+                     spec, measurable, is_type)
+
+
+class ParameterSchemaCache(object):
+    """
+    Parâmetros disponíveis por (categoria, tipo) de um documento.
+
+    Elementos do mesmo tipo expõem os mesmos parâmetros, então cada par é lido
+    uma vez (Parameters da instância + do tipo) e os pickers montam suas listas
+    a partir do esquema em vez de varrer amostras de elementos a cada abertura.
+    O esquema é descartado quando parâmetros do projeto ou famílias mudam.
+
+        cache = get_schema_cache(doc)
+        nomes = cache.names(amostra, lambda i: not i.read_only)
+        info = cache.merged(amostra).get(u"Comentários")
+    """
+
+    def __init__(self):
+        self._schemas = {}      # (cat_int, type_int, el_is_type) -> {nome: ParamInfo}
+        self._param_ids = set() # ids (>0) de parâmetros vistos, para tratar exclusões
+
+    def __len__(self):
+        return len(self._schemas)
+
+    def clear(self):
+        self._schemas = {}
+        self._param_ids = set()
+
+    @staticmethod
+    def _key(el):
+        try:
+            cat_int = el.Category.Id.IntegerValue if el.Category else -1
+        except Exception:
+            cat_int = -1
+        type_id = el.GetTypeId()
+        if type_id is None or type_id == ElementId.InvalidElementId:
+            # O próprio elemento é um tipo (ou não tem tipo): esquema dele mesmo
+            return (cat_int, el.Id.IntegerValue, True)
+        return (cat_int, type_id.IntegerValue, False)
+
+    def schema(self, el):
+        """{nome: ParamInfo} de instância e tipo do elemento; a instância prevalece."""
+        key = self._key(el)
+        schema = self._schemas.get(key)
+        if schema is not None:
+            return schema
+
+        schema = {}
+        if not key[2]:
+            try:
+                el_type = el.Document.GetElement(el.GetTypeId())
+            except Exception:
+                el_type = None
+            if el_type is not None:
+                self._read(el_type.Parameters, True, schema)
+        self._read(el.Parameters, False, schema)
+        self._schemas[key] = schema
+        return schema
+
+    def _read(self, parameters, is_type, schema):
+        for p in parameters:
+            try:
+                info = _param_info(p, is_type)
+            except Exception:
+                continue
+            schema[info.name] = info
+            if info.id > 0:
+                self._param_ids.add(info.id)
+
+    def merged(self, elements):
+        """Esquemas dos (categoria, tipo) distintos dos elementos, unidos por nome."""
+        merged = {}
+        seen = set()
+        for el in elements:
+            try:
+                key = self._key(el)
+                if key in seen:
+                    continue
+                seen.add(key)
+                for name, info in self.schema(el).items():
+                    merged.setdefault(name, info)
+            except Exception:
+                continue
+        return merged
+
+    def names(self, elements, predicate=None):
+        """Nomes de parâmetro ordenados, opcionalmente filtrados por predicate(ParamInfo)."""
+        merged = self.merged(elements)
+        if predicate is None:
+            return sorted(merged)
+        return sorted(name for name, info in merged.items() if predicate(info))
+
+    def on_changed(self, doc, added_ids, modified_ids, deleted_ids):
+        """Descarta o que DocumentChanged pode ter tornado obsoleto."""
+        if not self._schemas:
+            return
+        type_ints = set(k[1] for k in self._schemas)
+        gone = set()
+        for eid in deleted_ids:
+            el_int = eid.IntegerValue
+            if el_int in self._param_ids:
+                self.clear()
+                return
+            if el_int in type_ints:
+                gone.add(el_int)
+        for key in [k for k in self._schemas if k[1] in gone]:
+            del self._schemas[key]
+
+        changed = List[ElementId]()
+        for eid in added_ids:
+            changed.Add(eid)
+        for eid in modified_ids:
+            changed.Add(eid)
+        if changed.Count == 0:
+            return
+        # Parâmetro de projeto/compartilhado criado ou alterado, ou família carregada
+        schema_filter = LogicalOrFilter(ElementClassFilter(ParameterElement),
+                                        ElementClassFilter(Family))
+        for el in FilteredElementCollector(doc, changed).WherePasses(schema_filter):
+            if el.GetType().Name != "GlobalParameter":
+                self.clear()
+                return
+
+
+def _document_changed_handler(data_key):
+    def on_document_changed(sender, args):
+        caches = key = None
+        try:
+            caches = System.AppDomain.CurrentDomain.GetData(data_key)
+            if not caches:
+                return
+            doc = args.GetDocument()
+            key = _document_key(doc)
+            cache = caches.get(key)
+            if cache is not None:
+                cache.on_changed(doc, args.GetAddedElementIds(), args.GetModifiedElementIds(),
+                                 args.GetDeletedElementIds())
+        except Exception:
+            # Atualização incremental falhou no meio: o cache ficaria inconsistente
+            # pelo resto da sessão. Descarta para ser reconstruído no próximo uso.
+            try:
+                if caches and key is not None:
+                    caches.pop(key, None)
+            except Exception:
+                pass
+    return on_document_changed
+
+
+def _document_closing_handler(data_key):
+    def on_document_closing(sender, args):
+        try:
+            caches = System.AppDomain.CurrentDomain.GetData(data_key)
+            if caches:
+                caches.pop(_document_key(args.Document), None)
+        except Exception:
+            pass
+    return on_document_closing
+
+
+def _ensure_tracking(app, keys):
+    """Registra (uma vez por sessão) os handlers que invalidam o cache de keys[0]."""
+    from Autodesk.Revit.DB.Events import DocumentChangedEventArgs, DocumentClosingEventArgs
+    data_key, changed_key, closing_key = keys
+    domain = System.AppDomain.CurrentDomain
+    if domain.GetData(changed_key) is None:
+        h = System.EventHandler[DocumentChangedEventArgs](_document_changed_handler(data_key))
+        app.DocumentChanged += h
+        domain.SetData(changed_key, h)
+    if domain.GetData(closing_key) is None:
+        h = System.EventHandler[DocumentClosingEventArgs](_document_closing_handler(data_key))
+        app.DocumentClosing += h
+        domain.SetData(closing_key, h)
+
+
+def _document_cache(doc, keys, factory):
+    """
+    Cache do documento guardado no AppDomain, compartilhado entre os botões da sessão.
+    Sem como registrar os eventos, devolve um cache só desta execução.
+    """
+    try:
+        _ensure_tracking(doc.Application, keys)
+    except Exception:
+        return factory()
+    domain = System.AppDomain.CurrentDomain
+    caches = domain.GetData(keys[0])
+    if caches is None:
+        caches = {}
+        domain.SetData(keys[0], caches)
+    key = _document_key(doc)
+    cache = caches.get(key)
+    if cache is None:
+        cache = caches[key] = factory()
+    return cache
+
+
+def get_schema_cache(doc):
+    """ParameterSchemaCache do documento, compartilhado entre os botões da sessão."""
+    return _document_cache(doc, _SCHEMA_KEYS, ParameterSchemaCache)
+
+
+# =============================================================================
+#  CATÁLOGO ELÉTRICO (SISTEMAS DE DISTRIBUIÇÃO, TENSÕES, FIAÇÃO)
+# =============================================================================
+
+# Volts -> unidade interna de potencial elétrico
+VOLT_INTERNAL = 10.7639104167
+
+# Folga nas faixas min/máx dos VoltageType (~5 V, em unidades internas)
+VOLTAGE_RANGE_TOLERANCE = 55
+
+# Folga (V) ao casar a tensão nominal ou o nome de um VoltageType
+VOLTAGE_TYPE_TOLERANCE = 2
+
+_CATALOG_KEYS = ("LF_ElectricalCatalog", "LF_ElectricalCatalog_DocChanged",
+                 "LF_ElectricalCatalog_DocClosing")
+
+# volts: tensão nominal (VALUE, senão MIN/MAX) em V; min/max em unidades internas
+VoltageEntry = namedtuple("VoltageEntry", ["element", "name", "volts", "min", "max", "name_numbers"])
+
+# lg/ll: VoltageEntry de fase-neutro/fase-fase (ou None); phase: AsInteger do parâmetro de fases
+DistSysEntry = namedtuple("DistSysEntry", ["element", "name", "phase", "lg", "ll"])
+
+
+def _bip(name):
+    try:
+        return getattr(BuiltInParameter, name)
+    except AttributeError:
+        return None
+
+
+def _element_name(el):
+    try:
+        return el.Name or u""
+    except Exception:
+        try:
+            p = el.get_Parameter(BuiltInParameter.SYMBOL_NAME_PARAM)
+            return (p.AsString() if p else None) or u""
+        except Exception:
+            return u""
+
+
+def _double_param(el, bip):
+    if bip is None:
+        return None
+    try:
+        p = el.get_Parameter(bip)
+        if p and p.HasValue:
+            return p.AsDouble()
+    except Exception:
+        pass
+    return None
+
+
+class ElectricalCatalog(object):
+    """
+    DistributionSysType, VoltageType e WireType de um documento, lidos uma vez e
+    indexados por tensão, fase e nome.
+
+    Criação de circuitos em lote consulta o catálogo por circuito em vez de abrir
+    um coletor e reler as faixas de tensão a cada chamada. Tudo é descartado
+    quando um desses tipos é criado, alterado ou apagado.
+
+        catalog = get_electrical_catalog(doc)
+        dist_id = catalog.dist_sys_for_voltage(220)
+        vt = catalog.voltage_type(127)
+    """
+
+    def __init__(self, doc):
+        self._doc = doc
+        self.clear()
+
+    def clear(self):
+        self._voltages = None       # {id_int: VoltageEntry}, na ordem do coletor
+        self._systems = None        # [DistSysEntry]
+        self._wires = None          # OrderedDict nome -> WireType
+        self._ids = set()           # ids de todos os tipos indexados
+        self._dist_by_volts = {}    # volts -> ElementId | None
+        self._vt_by_volts = {}      # volts -> VoltageType | None
+
+    # ── Índices (montados sob demanda) ────────────────────────────────────
+
+    def _voltage_index(self):
+        if self._voltages is None:
+            bips = [_bip(n) for n in ("RBS_ELEC_VOLTAGE_VALUE", "RBS_ELEC_VOLTAGE_MIN_PARAM",
+                                      "RBS_ELEC_VOLTAGE_MAX_PARAM")]
+            voltages = OrderedDict()
+            for vt in FilteredElementCollector(self._doc).OfClass(VoltageType):
+                values = [_double_param(vt, b) for b in bips]
+                nominal = next((v for v in values if v is not None), None)
+                name = _element_name(vt)
+                voltages[vt.Id.IntegerValue] = VoltageEntry(
+                    vt, name,
+                    int(round(nominal / VOLT_INTERNAL)) if nominal is not None else None,
+                    values[1], values[2],
+                    tuple(int(x) for x in re.findall(r"\d+", name)))
+                self._ids.add(vt.Id.IntegerValue)
+            self._voltages = voltages
+        return self._voltages
+
+    def _system_index(self):
+        if self._systems is None:
+            voltages = self._voltage_index()
+            phase_bip = _bip("RBS_ELEC_DISTRIBUTION_SYS_PHASE_PARAM")
+            lg_bip = _bip("RBS_ELEC_DISTRIBUTION_SYS_VOLTAGE_L_G_PARAM")
+            ll_bip = _bip("RBS_ELEC_DISTRIBUTION_SYS_VOLTAGE_L_L_PARAM")
+            systems = []
+            for ds in FilteredElementCollector(self._doc).OfClass(DistributionSysType):
+                phase = None
+                try:
+                    p = ds.get_Parameter(phase_bip) if phase_bip is not None else None
+                    if p:
+                        phase = p.AsInteger()
+                except Exception:
+                    pass
+                refs = []
+                for bip in (lg_bip, ll_bip):
+                    entry = None
+                    try:
+                        p = ds.get_Parameter(bip) if bip is not None else None
+                        if p and p.HasValue:
+                            entry = voltages.get(p.AsElementId().IntegerValue)
+                    except Exception:
+                        pass
+                    refs.append(entry)
+                systems.append(DistSysEntry(ds, _element_name(ds), phase, refs[0], refs[1]))
+                self._ids.add(ds.Id.IntegerValue)
+            self._systems = systems
+        return self._systems
+
+    def _wire_index(self):
+        if self._wires is None:
+            wires = OrderedDict()
+            for wt in FilteredElementCollector(self._doc).OfClass(WireType):
+                wires.setdefault(_element_name(wt), wt)
+                self._ids.add(wt.Id.IntegerValue)
+            self._wires = wires
+        return self._wires
+
+    # ── Consultas ─────────────────────────────────────────────────────────
+
+    def voltage_types(self):
+        """[VoltageEntry] na ordem do coletor."""
+        return list(self._voltage_index().values())
+
+    def dist_systems(self, phase=None):
+        """[DistSysEntry], opcionalmente só os da fase (AsInteger) pedida."""
+        systems = self._system_index()
+        if phase is None:
+            return list(systems)
+        return [s for s in systems if s.phase == phase]
+
+    def dist_system(self, element_id):
+        """DistSysEntry do DistributionSysType com esse ElementId, ou None."""
+        el_int = element_id.IntegerValue
+        for s in self._system_index():
+            if s.element.Id.IntegerValue == el_int:
+                return s
+        return None
+
+    def dist_systems_by_name(self):
+        """OrderedDict nome -> DistributionSysType (primeiro de cada nome)."""
+        by_name = OrderedDict()
+        for s in self._system_index():
+            if s.name:
+                by_name.setdefault(s.name, s.element)
+        return by_name
+
+    def dist_sys_for_voltage(self, volts):
+        """
+        ElementId do primeiro DistributionSysType cuja faixa fase-neutro ou
+        fase-fase cobre volts (com VOLTAGE_RANGE_TOLERANCE), ou None.
+        """
+        key = round(float(volts), 1)
+        if key in self._dist_by_volts:
+            return self._dist_by_volts[key]
+        v_internal = key * VOLT_INTERNAL
+        found = None
+        for s in self._system_index():
+            for entry in (s.lg, s.ll):
+                if entry is None or entry.min is None or entry.max is None:
+                    continue
+                if (entry.min - VOLTAGE_RANGE_TOLERANCE) <= v_internal <= (entry.max + VOLTAGE_RANGE_TOLERANCE):
+                    found = s.element.Id
+                    break
+            if found is not None:
+                break
+        self._dist_by_volts[key] = found
+        return found
+
+    def voltage_type(self, volts):
+        """
+        Primeiro VoltageType com tensão nominal a até VOLTAGE_TYPE_TOLERANCE de
+        volts, ou cujo nome contenha esse número (ex.: "Fase-Neutro 220V").
+        """
+        target = int(round(float(volts)))
+        if target in self._vt_by_volts:
+            return self._vt_by_volts[target]
+        found = None
+        for entry in self._voltage_index().values():
+            if entry.volts and abs(entry.volts - target) <= VOLTAGE_TYPE_TOLERANCE:
+                found = entry.element
+                break
+            if any(abs(n - target) <= VOLTAGE_TYPE_TOLERANCE for n in entry.name_numbers):
+                found = entry.element
+                break
+        self._vt_by_volts[target] = found
+        return found
+
+    def wire_types(self):
+        """OrderedDict nome -> WireType."""
+        return OrderedDict(self._wire_index())
+
+    def wire_type(self, name):
+        return self._wire_index().get(name)
+
+    # ── Invalidação ───────────────────────────────────────────────────────
+
+    def on_changed(self, doc, added_ids, modified_ids, deleted_ids):
+        """Descarta o catálogo se um tipo elétrico indexado (ou novo) mudou."""
+        if self._voltages is None and self._systems is None and self._wires is None:
+            return
+        for ids in (deleted_ids, modified_ids):
+            for eid in ids:
+                if eid.IntegerValue in self._ids:
+                    self.clear()
+                    return
+        added = List[ElementId]()
+        for eid in added_ids:
+            added.Add(eid)
+        if added.Count == 0:
+            return
+        catalog_filter = LogicalOrFilter(List[ElementFilter]([
+            ElementClassFilter(DistributionSysType), ElementClassFilter(VoltageType),
+            ElementClassFilter(WireType)]))
+        if FilteredElementCollector(doc, added).WherePasses(catalog_filter).GetElementCount():
+            self.clear()
+
+
+def get_electrical_catalog(doc):
+    """ElectricalCatalog do documento, compartilhado entre os botões da sessão."""
+    return _document_cache(doc, _CATALOG_KEYS, lambda: ElectricalCatalog(doc))
+
+
+# =============================================================================
+#  REDE ELÉTRICA (QUADROS, CIRCUITOS, MEMBROS, ALIMENTADORES)
+# =============================================================================
+
+_NETWORK_KEYS = ("LF_ElectricalNetwork", "LF_ElectricalNetwork_DocChanged",
+                 "LF_ElectricalNetwork_DocClosing")
+
+# panel: id do BaseEquipment (ou None); members: ids dos elementos do circuito
+CircuitNode = namedtuple("CircuitNode", ["id", "panel", "members", "power"])
+
+
+def _id_int(element_or_id):
+    try:
+        return element_or_id.IntegerValue
+    except AttributeError:
+        return element_or_id.Id.IntegerValue
+
+
+class ElectricalNetwork(object):
+    """
+    Grafo quadro → circuito → membros de um documento, montado numa passada
+    pelos ElectricalSystem e atualizado por circuito a cada DocumentChanged.
+
+    Guarda só ids; os métodos devolvem elementos atuais via doc.GetElement.
+    Alterações de uma transação ainda aberta só aparecem depois do commit.
+
+        net = get_electrical_network(doc)
+        circuito = net.circuit_of(luminaria)
+        alimentador = net.feeder_of(quadro)
+        for q in net.downstream_panels(quadro): ...
+    """
+
+    def __init__(self, doc):
+        self._doc = doc
+        self._built = False
+        self._circuits = {}     # circ_int -> CircuitNode
+        self._by_member = {}    # el_int -> set(circ_int)
+        self._by_panel = {}     # panel_int -> set(circ_int)
+        self._equipment = set() # ids de Electrical Equipment vistos como membro
+
+    def __len__(self):
+        self._ensure()
+        return len(self._circuits)
+
+    def clear(self):
+        self._built = False
+        self._circuits = {}
+        self._by_member = {}
+        self._by_panel = {}
+        self._equipment = set()
+
+    # ── Montagem ──────────────────────────────────────────────────────────
+
+    def _ensure(self):
+        if not self._built:
+            for es in FilteredElementCollector(self._doc).OfClass(ElectricalSystem):
+                self._add(es)
+            self._built = True
+
+    def _add(self, es):
+        circ_int = es.Id.IntegerValue
+        panel_int = None
+        try:
+            base = es.BaseEquipment
+            if base is not None:
+                panel_int = base.Id.IntegerValue
+        except Exception:
+            pass
+        members = []
+        try:
+            for el in (es.Elements or []):
+                el_int = el.Id.IntegerValue
+                members.append(el_int)
+                try:
+                    if el.Category and el.Category.Id.IntegerValue == int(BuiltInCategory.OST_ElectricalEquipment):
+                        self._equipment.add(el_int)
+                except Exception:
+                    pass
+        except Exception:
+            pass
+        try:
+            power = es.SystemType == ElectricalSystemType.PowerCircuit
+        except Exception:
+            power = False
+        node = CircuitNode(circ_int, panel_int, tuple(members), power)
+        self._circuits[circ_int] = node
+        for el_int in node.members:
+            self._by_member.setdefault(el_int, set()).add(circ_int)
+        if panel_int is not None:
+            self._by_panel.setdefault(panel_int, set()).add(circ_int)
+
+    def _remove(self, circ_int):
+        node = self._circuits.pop(circ_int, None)
+        if node is None:
+            return
+        for el_int in node.members:
+            circs = self._by_member.get(el_int)
+            if circs is not None:
+                circs.discard(circ_int)
+                if not circs:
+                    del self._by_member[el_int]
+        if node.panel is not None:
+            circs = self._by_panel.get(node.panel)
+            if circs is not None:
+                circs.discard(circ_int)
+                if not circs:
+                    del self._by_panel[node.panel]
+
+    def _elements(self, ints):
+        result = []
+        for i in sorted(ints):
+            el = self._doc.GetElement(ElementId(i))
+            if el is not None:
+                result.append(el)
+        return result
+
+    # ── Consultas ─────────────────────────────────────────────────────────
+
+    def node(self, circuit):
+        """CircuitNode do circuito (ElectricalSystem ou ElementId), ou None."""
+        self._ensure()
+        return self._circuits.get(_id_int(circuit))
+
+    def circuits_of(self, element):
+        """Circuitos que têm o elemento como membro."""
+        self._ensure()
+        return self._elements(self._by_member.get(_id_int(element), ()))
+
+    def circuit_of(self, element):
+        """Primeiro circuito (menor id) do elemento, ou None."""
+        circuits = self.circuits_of(element)
+        return circuits[0] if circuits else None
+
+    def circuits_from(self, panel):
+        """Circuitos cujo BaseEquipment é o quadro."""
+        self._ensure()
+        return self._elements(self._by_panel.get(_id_int(panel), ()))
+
+    def feeder_of(self, panel):
+        """Circuito que alimenta o quadro (tem o quadro como membro), ou None."""
+        return self.circuit_of(panel)
+
+    def is_panel(self, element):
+        """Quadro com circuitos próprios ou Electrical Equipment membro de algum circuito."""
+        self._ensure()
+        el_int = _id_int(element)
+        return el_int in self._by_panel or el_int in self._equipment
+
+    def feeds_panel(self, circuit):
+        """True se algum membro do circuito é quadro de outros circuitos."""
+        node = self.node(circuit)
+        return bool(node) and any(m in self._by_panel for m in node.members)
+
+    def downstream_panels(self, panel):
+        """Quadros alimentados diretamente por circuitos deste quadro."""
+        self._ensure()
+        ints = set()
+        for circ_int in self._by_panel.get(_id_int(panel), ()):
+            for m in self._circuits[circ_int].members:
+                if m in self._by_panel or m in self._equipment:
+                    ints.add(m)
+        return self._elements(ints)
+
+    def unassigned_circuits(self):
+        """Circuitos de força sem quadro."""
+        self._ensure()
+        return self._elements(n.id for n in self._circuits.values() if n.power and n.panel is None)
+
+    # ── Atualização incremental ───────────────────────────────────────────
+
+    def on_changed(self, doc, added_ids, modified_ids, deleted_ids):
+        """Relê só os ElectricalSystem criados/alterados e tira os apagados."""
+        if not self._built:
+            return
+        for eid in deleted_ids:
+            self._remove(eid.IntegerValue)
+            self._equipment.discard(eid.IntegerValue)
+        changed = List[ElementId]()
+        for eid in added_ids:
+            changed.Add(eid)
+        for eid in modified_ids:
+            changed.Add(eid)
+        if changed.Count == 0:
+            return
+        for es in FilteredElementCollector(doc, changed).OfClass(ElectricalSystem):
+            self._remove(es.Id.IntegerValue)
+            self._add(es)
+
+
+def get_electrical_network(doc):
+    """ElectricalNetwork do documento, compartilhado entre os botões da sessão."""
+    return _document_cache(doc, _NETWORK_KEYS, lambda: ElectricalNetwork(doc))
+
+
+# =============================================================================
+#  ÍNDICE DE AMBIENTES (ROOMS / SPACES)
+# =============================================================================
+
+# Folga vertical (pés) ao comparar a cota do ponto com a faixa do ambiente
+ROOM_Z_TOLERANCE = 0.01
+
+
+class _RoomEntry(object):
+    __slots__ = ("name", "rank", "loops", "xmin", "ymin", "xmax", "ymax", "zmin", "zmax")
+
+    def contains(self, x, y, z):
+        if z < self.zmin - ROOM_Z_TOLERANCE or z > self.zmax + ROOM_Z_TOLERANCE:
+            return False
+        if x < self.xmin or x > self.xmax or y < self.ymin or y > self.ymax:
+            return False
+        # Par-ímpar sobre todos os loops: furos (loops internos) ficam de fora
+        inside = False
+        for loop in self.loops:
+            n = len(loop)
+            x1, y1 = loop[n - 1]
+            for i in range(n):
+                x2, y2 = loop[i]
+                if (y1 > y) != (y2 > y):
+                    if x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+                        inside = not inside
+                x1, y1 = x2, y2
+        return inside
+
+
+class RoomIndex(object):
+    """
+    Ambientes (Rooms) e Espaços (Spaces) do modelo e dos vínculos carregados,
+    já em coordenadas do hospedeiro, para achar em qual ambiente um ponto cai
+    sem GetRoomAtPoint/GetSpaceAtPoint por ponto e por vínculo.
+
+    Cada ambiente vira os polígonos do contorno (arcos tesselados) mais a faixa
+    de cota do seu BoundingBox, distribuídos numa grade 2D. A consulta testa só
+    os ambientes da célula do ponto (ponto-em-polígono).
+
+    A prioridade repete a busca antiga: hospedeiro antes dos vínculos (na ordem
+    do coletor), Room antes de Space.
+
+        idx = RoomIndex(doc)
+        idx.name_at([pt, pt_deslocado])
+    """
+
+    def __init__(self, doc, include_links=True, cell_size=10.0):
+        self.cell_size = float(cell_size)
+        self._grid = {}     # (cx, cy) -> [_RoomEntry]
+        self._count = 0
+        self._add_document(doc, None, 0)
+        if include_links:
+            links = FilteredElementCollector(doc).OfClass(RevitLinkInstance).ToElements()
+            for i, link in enumerate(links):
+                try:
+                    link_doc = link.GetLinkDocument()
+                    if link_doc is not None:
+                        self._add_document(link_doc, link.GetTransform(), i + 1)
+                except Exception:
+                    continue
+
+    def __len__(self):
+        return self._count
+
+    def _add_document(self, doc, transform, source_rank):
+        options = SpatialElementBoundaryOptions()
+        final_phase = self._final_phase_id(doc)
+        for kind_rank, bic in enumerate((BuiltInCategory.OST_Rooms, BuiltInCategory.OST_MEPSpaces)):
+            collector = FilteredElementCollector(doc).OfCategory(bic).WhereElementIsNotElementType()
+            for spatial in collector:
+                if not self._in_final_model(spatial, final_phase):
+                    continue
+                try:
+                    entry = self._entry(spatial, options, transform)
+                except Exception:
+                    entry = None
+                if entry is not None:
+                    entry.rank = (source_rank, kind_rank)
+                    self._insert(entry)
+
+    @staticmethod
+    def _final_phase_id(doc):
+        """Id da última fase do documento (a que GetRoomAtPoint sem fase usa)."""
+        try:
+            phases = doc.Phases
+            if phases.Size > 0:
+                return phases.get_Item(phases.Size - 1).Id
+        except Exception:
+            pass
+        return None
+
+    @staticmethod
+    def _in_final_model(spatial, final_phase):
+        """
+        Só ambientes da fase final e do modelo principal ou da opção primária,
+        como GetRoomAtPoint: ambientes de fases anteriores ou de opções
+        secundárias se sobrepõem aos vigentes e dariam o nome errado.
+        """
+        try:
+            option = spatial.DesignOption
+            if option is not None and not option.IsPrimary:
+                return False
+        except Exception:
+            pass
+        if final_phase is None:
+            return True
+        try:
+            p = spatial.get_Parameter(BuiltInParameter.ROOM_PHASE)
+            if p is not None and p.HasValue:
+                return _id_int(p.AsElementId()) == _id_int(final_phase)
+        except Exception:
+            pass
+        return True
+
+    @staticmethod
+    def _entry(spatial, options, transform):
+        try:
+            if spatial.Area <= 0:
+                return None     # não colocado ou sem contorno fechado
+        except Exception:
+            pass
+        p = spatial.get_Parameter(BuiltInParameter.ROOM_NAME)
+        name = p.AsString() if p else None
+        if not name:
+            return None
+        bb = spatial.get_BoundingBox(None)
+        if bb is None:
+            return None
+        segments = spatial.GetBoundarySegments(options)
+        if not segments:
+            return None
+
+        def to_host(pt):
+            return transform.OfPoint(pt) if transform is not None else pt
+
+        loops = []
+        for loop in segments:
+            pts = []
+            for seg in loop:
+                tess = seg.GetCurve().Tessellate()
+                for j in range(tess.Count - 1):   # o último ponto é o início do próximo
+                    q = to_host(tess[j])
+                    pts.append((q.X, q.Y))
+            if len(pts) >= 3:
+                loops.append(pts)
+        if not loops:
+            return None
+
+        entry = _RoomEntry()
+        entry.name = name
+        entry.loops = loops
+        xs = [x for loop in loops for x, _ in loop]
+        ys = [y for loop in loops for _, y in loop]
+        entry.xmin, entry.xmax = min(xs), max(xs)
+        entry.ymin, entry.ymax = min(ys), max(ys)
+        z1, z2 = to_host(bb.Min).Z, to_host(bb.Max).Z
+        entry.zmin, entry.zmax = min(z1, z2), max(z1, z2)
+        return entry
+
+    def _insert(self, entry):
+        cs = self.cell_size
+        for cx in range(int(entry.xmin // cs), int(entry.xmax // cs) + 1):
+            for cy in range(int(entry.ymin // cs), int(entry.ymax // cs) + 1):
+                self._grid.setdefault((cx, cy), []).append(entry)
+        self._count += 1
+
+    def entries_at(self, pt):
+        """Ambientes que contêm o ponto (coordenadas do hospedeiro), por prioridade."""
+        cs = self.cell_size
+        found = [e for e in self._grid.get((int(pt.X // cs), int(pt.Y // cs)), ())
+                 if e.contains(pt.X, pt.Y, pt.Z)]
+        found.sort(key=lambda e: e.rank)
+        return found
+
+    def name_at(self, points):
+        """
+        Nome do ambiente para a lista de pontos candidatos: o de maior prioridade
+        (hospedeiro, depois cada vínculo), e dentro dela o primeiro ponto que cai
+        em algum ambiente. None se nenhum ponto cai em ambiente.
+        """
+        best = None
+        for i, pt in enumerate(points):
+            found = self.entries_at(pt)
+            if not found:
+                continue
+            key = (found[0].rank[0], i, found[0].rank[1])
+            if best is None or key < best[0]:
+                best = (key, found[0].name)
+        return best[1] if best is not None else None
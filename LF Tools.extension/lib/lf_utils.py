@@ -10,7 +10,7 @@ Para utilitários que precisam da Revit API, use lf_revit.py
 
 Uso nos scripts:
     from lf_utils import DebugLogger, get_script_config, save_script_config
-    from lf_utils import slugify, truncate, flatten, chunk, deep_merge
+    from lf_utils import slugify, truncate, flatten, chunk, deep_merge, LRUCache
     from lf_utils import format_meters, parse_bool, safe_int, safe_float
     from lf_utils import now_str, elapsed_str, Timer
 """
@@ -22,6 +22,7 @@ import time
 import json
 import math
 import traceback
+from collections import OrderedDict
 
 
 # =============================================================================
@@ -554,6 +555,53 @@ def deep_merge(base, override):
     return result
 
 
+class LRUCache(object):
+    """
+    Cache limitado que descarta a entrada usada há mais tempo ao encher
+    (em vez de limpar tudo de uma vez).
+
+    Uso:
+        cache = LRUCache(maxsize=5000)
+        val = cache.get(chave)
+        if val is None:
+            val = calcular(...)
+            cache.put(chave, val)
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = max(1, int(maxsize))
+        self._data   = OrderedDict()
+        self.hits    = 0
+        self.misses  = 0
+
+    def get(self, key, default=None):
+        try:
+            value = self._data.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data[key] = value  # reinserir = marcar como mais recente
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._data.pop(key, None)
+        self._data[key] = value
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        return self._data.pop(key, default)
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+
 # =============================================================================
 #  UTILITÁRIOS DE MEDIDAS / CONVERSÃO
 # =============================================================================
@@ -10,10 +10,11 @@ import hashlib
 import re
 import os
 import operator
+import sys
 import time
 from warnings import warn
 from datetime import datetime
-from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED, LargeZipFile
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED, ZIP_STORED, LargeZipFile
 from struct import unpack
 
 from .compatibility import int_types, num_types, str_types, force_unicode
@@ -42,6 +43,14 @@ from .exceptions import UnsupportedImageFormat
 from .exceptions import FileCreateError
 from .exceptions import FileSizeError
 
+# Per-file compression levels in zipfile are only available in Python 3.7+.
+ZIP_HAS_COMPRESSLEVEL = sys.version_info >= (3, 7)
+
+# 'fast' compression profile: parts smaller than this are stored, larger ones
+# use the cheapest deflate level (or are stored if levels aren't supported).
+FAST_STORE_LIMIT = 64 * 1024
+FAST_COMPRESS_LEVEL = 1
+
 
 class Workbook(xmlwriter.XMLwriter):
     """
@@ -93,6 +102,12 @@ class Workbook(xmlwriter.XMLwriter):
         else:
             self.allow_zip64 = False
 
+        # Zip compression profile: 'deflate' (default), 'fast' or 'store'.
+        self.compression = options.get('compression', 'deflate') or 'deflate'
+        if self.compression not in ('deflate', 'fast', 'store'):
+            warn("Unknown compression '%s', using 'deflate'." % self.compression)
+            self.compression = 'deflate'
+
         self.worksheet_meta = WorksheetMeta()
         self.selected = 0
         self.fileclosed = 0
@@ -719,14 +734,19 @@ class Workbook(xmlwriter.XMLwriter):
                 # Set sub-file timestamp to Excel's timestamp of 1/1/1980.
                 zipinfo = ZipInfo(xml_filename, (1980, 1, 1, 0, 0, 0))
 
-                # Copy compression type from parent ZipFile.
-                zipinfo.compress_type = xlsx_file.compression
-
                 if is_binary:
-                    xlsx_file.writestr(zipinfo, os_filename.getvalue())
+                    data = os_filename.getvalue()
                 else:
-                    xlsx_file.writestr(zipinfo,
-                                       os_filename.getvalue().encode('utf-8'))
+                    data = os_filename.getvalue().encode('utf-8')
+
+                compress_type, level = self._get_part_compression(
+                    len(data), is_binary)
+                zipinfo.compress_type = compress_type
+
+                if level is not None:
+                    xlsx_file.writestr(zipinfo, data, compress_type, level)
+                else:
+                    xlsx_file.writestr(zipinfo, data)
             else:
                 # The sub-files are tempfiles on disk, i.e, not in memory.
 
@@ -735,8 +755,16 @@ class Workbook(xmlwriter.XMLwriter):
                 timestamp = time.mktime((1980, 1, 31, 0, 0, 0, 0, 0, -1))
                 os.utime(os_filename, (timestamp, timestamp))
 
+                compress_type, level = self._get_part_compression(
+                    os.path.getsize(os_filename), is_binary)
+
                 try:
-                    xlsx_file.write(os_filename, xml_filename)
+                    if level is not None:
+                        xlsx_file.write(os_filename, xml_filename,
+                                        compress_type, level)
+                    else:
+                        xlsx_file.write(os_filename, xml_filename,
+                                        compress_type)
                     os.remove(os_filename)
                 except LargeZipFile as e:
                     # Close open temp files on zipfile.LargeZipFile exception.
@@ -746,6 +774,22 @@ class Workbook(xmlwriter.XMLwriter):
 
         xlsx_file.close()
 
+    def _get_part_compression(self, size, is_binary):
+        # Return the (compress_type, compresslevel) for a package part. A
+        # level of None means the zipfile default.
+        if self.compression == 'store':
+            return ZIP_STORED, None
+
+        if self.compression == 'fast':
+            # Small parts and already compressed media aren't worth deflating.
+            if is_binary or size < FAST_STORE_LIMIT:
+                return ZIP_STORED, None
+            if ZIP_HAS_COMPRESSLEVEL:
+                return ZIP_DEFLATED, FAST_COMPRESS_LEVEL
+            return ZIP_STORED, None
+
+        return ZIP_DEFLATED, None
+
     def _add_sheet(self, name, worksheet_class=None):
         # Utility for shared code in add_worksheet() and add_chartsheet().
 
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark dos perfis de compressão do xlsxwriter embutido (lib/xlsxwriter).
+
+Gera abas sintéticas parecidas com o export do To Excel (ElementId + colunas de
+texto/número) e compara, para cada perfil ('deflate', 'fast', 'store'), o tempo
+total, o tempo só do close() (serialização XML + zip) e o tamanho do arquivo.
+
+Uso (CPython ou IronPython, da raiz do repositório):
+    python benchmarks/bench_xlsx_compression.py [linhas] [abas]
+Padrão: 100000 linhas, 1 aba.
+"""
+from __future__ import print_function, unicode_literals
+
+import codecs
+import os
+import sys
+import time
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'LF Tools.extension', 'lib'))
+
+import xlsxwriter  # noqa: E402
+
+# Python 2 com saída redirecionada (pipe/arquivo) não tem encoding: o print de
+# unicode cairia em ascii. Força UTF-8 para a saída ser igual nos dois runtimes.
+if sys.version_info[0] < 3 and getattr(sys.stdout, 'encoding', None) is None:
+    sys.stdout = codecs.getwriter('utf-8')(sys.stdout)
+
+PROFILES = ('deflate', 'fast', 'store')
+NIVEIS = ['Térreo', '1º Pavimento', '2º Pavimento', 'Cobertura']
+CATEGORIAS = ['Luminária', 'Tomada', 'Interruptor', 'Quadro', 'Eletroduto']
+
+
+def write_workbook(path, profile, rows, sheets):
+    """Escreve o workbook sintético e retorna (tempo total, tempo do close)."""
+    t0 = time.time()
+    workbook = xlsxwriter.Workbook(path, {
+        'constant_memory': True,
+        'use_zip64': True,
+        'compression': profile,
+    })
+    fmt_id = workbook.add_format({'locked': True, 'font_color': '#95B3D7', 'italic': True})
+    fmt_unlock = workbook.add_format({'locked': False})
+    headers = ['ElementId', 'Nome', 'Categoria', 'Nível', 'Comprimento [m]',
+               'Potência [W]', 'Circuito', 'Comentários']
+
+    for s in range(sheets):
+        ws = workbook.add_worksheet('Tabela %d' % (s + 1))
+        ws.write_row(0, 0, headers)
+        for r in range(1, rows + 1):
+            eid = 100000 + s * rows + r
+            ws.write(r, 0, str(eid), fmt_id)
+            ws.write(r, 1, 'Elemento %d' % (r % 5000), fmt_unlock)
+            ws.write(r, 2, CATEGORIAS[r % len(CATEGORIAS)], fmt_unlock)
+            ws.write(r, 3, NIVEIS[r % len(NIVEIS)], fmt_unlock)
+            ws.write(r, 4, (r % 977) * 0.137, fmt_unlock)
+            ws.write(r, 5, 100 * (r % 23), fmt_unlock)
+            ws.write(r, 6, 'QD-%02d.%d' % (r % 12, r % 40), fmt_unlock)
+            ws.write(r, 7, '' if r % 3 else 'Revisar', fmt_unlock)
+
+    t1 = time.time()
+    workbook.close()
+    t2 = time.time()
+    return t2 - t0, t2 - t1
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    sheets = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    tmpdir = tempfile.mkdtemp(prefix='lf_xlsx_bench_')
+
+    print('%d linhas x %d aba(s)' % (rows, sheets))
+    print('%-8s %10s %10s %12s' % ('perfil', 'total (s)', 'close (s)', 'tamanho (MB)'))
+    results = {}
+    for profile in PROFILES:
+        path = os.path.join(tmpdir, 'bench_%s.xlsx' % profile)
+        total, close = write_workbook(path, profile, rows, sheets)
+        size = os.path.getsize(path) / (1024.0 * 1024.0)
+        results[profile] = (total, close, size)
+        print('%-8s %10.2f %10.2f %12.2f' % (profile, total, close, size))
+        os.remove(path)
+    os.rmdir(tmpdir)
+
+    base_total, base_close, base_size = results['deflate']
+    for profile in PROFILES[1:]:
+        total, close, size = results[profile]
+        print('%s vs deflate: close %.1fx mais rápido, total %.1fx, arquivo %.1fx maior' % (
+            profile, base_close / max(close, 1e-6), base_total / max(total, 1e-6),
+            size / max(base_size, 1e-6)))
+
+
+if __name__ == '__main__':
+    main()